@@ -0,0 +1,191 @@
+import json
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .models import CustomerActivity, DailyActivitySummary
+from .rollups import sale_day
+
+BUFFER_KEY = "analytics:activity:buffer"
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class MemoryBuffer:
+    """Per-process buffer; events are lost if the process dies before a flush, so only use it in development."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.events = []
+        self.oldest = None
+
+    def push(self, events):
+        with self.lock:
+            if not self.events:
+                self.oldest = time.monotonic()
+            self.events.extend(events)
+            return len(self.events)
+
+    def age(self):
+        with self.lock:
+            return time.monotonic() - self.oldest if self.events else 0
+
+    def pop(self, count):
+        with self.lock:
+            taken, self.events = self.events[:count], self.events[count:]
+            if self.events:
+                self.oldest = time.monotonic()
+            return taken
+
+    def requeue(self, events):
+        """Put popped events back at the front, e.g. after a failed write."""
+        with self.lock:
+            if not self.events:
+                self.oldest = time.monotonic()
+            self.events[:0] = events
+
+
+class RedisBuffer:
+    """Buffer shared by every web process and the Celery worker, stored as a Redis list of JSON events."""
+
+    def __init__(self, url):
+        import redis
+        self.client = redis.Redis.from_url(url)
+
+    def push(self, events):
+        pipeline = self.client.pipeline()
+        pipeline.rpush(BUFFER_KEY, *[json.dumps(event) for event in events])
+        # Remember when the buffer last went from empty to non-empty
+        pipeline.set(f"{BUFFER_KEY}:oldest", time.time(), nx=True)
+        return pipeline.execute()[0]
+
+    def age(self):
+        oldest = self.client.get(f"{BUFFER_KEY}:oldest")
+        return time.time() - float(oldest) if oldest else 0
+
+    def pop(self, count):
+        pipeline = self.client.pipeline()  # MULTI/EXEC, so two flushers never take the same events
+        pipeline.lrange(BUFFER_KEY, 0, count - 1)
+        pipeline.ltrim(BUFFER_KEY, count, -1)
+        pipeline.delete(f"{BUFFER_KEY}:oldest")
+        taken = pipeline.execute()[0]
+        if self.client.llen(BUFFER_KEY):
+            self.client.set(f"{BUFFER_KEY}:oldest", time.time(), nx=True)
+        return [json.loads(event) for event in taken]
+
+    def requeue(self, events):
+        pipeline = self.client.pipeline()
+        # LPUSH inserts one at a time, so push in reverse to keep the original order at the head
+        pipeline.lpush(BUFFER_KEY, *[json.dumps(event) for event in reversed(events)])
+        pipeline.set(f"{BUFFER_KEY}:oldest", time.time(), nx=True)
+        pipeline.execute()
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            url = _setting("ANALYTICS_ACTIVITY_BUFFER_URL", "")
+            _buffer = RedisBuffer(url) if url else MemoryBuffer()
+        return _buffer
+
+
+def record_activities(customer_id, events):
+    """
+    Buffer a batch of `{"action", "timestamp"}` events for `customer_id`.
+
+    The buffer is written to the database once it holds ANALYTICS_ACTIVITY_FLUSH_SIZE
+    events or its oldest event is ANALYTICS_ACTIVITY_FLUSH_INTERVAL seconds old;
+    a periodic task flushes whatever is left. Returns the number of events flushed now.
+    """
+    now = timezone.now().isoformat()
+    buffer = get_buffer()
+    size = buffer.push([
+        {
+            "customer_id": customer_id,
+            "action": event["action"],
+            "timestamp": event["timestamp"].isoformat() if event.get("timestamp") else now,
+        }
+        for event in events
+    ])
+    if size >= _setting("ANALYTICS_ACTIVITY_FLUSH_SIZE", 500) or buffer.age() >= _setting(
+        "ANALYTICS_ACTIVITY_FLUSH_INTERVAL", 5
+    ):
+        return flush_activity_buffer()
+    return 0
+
+
+def flush_activity_buffer(batch_size=None):
+    """
+    Write every buffered event with bulk_create, batch_size rows at a time. Returns the number written.
+    A batch whose write fails goes back into the buffer before the error is raised.
+    """
+    batch_size = batch_size or _setting("ANALYTICS_ACTIVITY_FLUSH_SIZE", 500)
+    buffer = get_buffer()
+    written = 0
+    while True:
+        events = buffer.pop(batch_size)
+        if not events:
+            return written
+        try:
+            CustomerActivity.objects.bulk_create([
+                CustomerActivity(
+                    customer_id=event["customer_id"], action=event["action"], timestamp=parse_datetime(event["timestamp"])
+                )
+                for event in events
+            ])
+        except Exception:
+            # Keep the events for the next flush instead of dropping them
+            buffer.requeue(events)
+            raise
+        written += len(events)
+
+
+def downsample_activities(retention_days=None):
+    """
+    Fold raw events older than the retention window into DailyActivitySummary
+    counts and delete them, one day per transaction. Returns the number of raw
+    events removed.
+    """
+    if retention_days is None:
+        retention_days = _setting("ANALYTICS_ACTIVITY_RETENTION_DAYS", 90)
+    cutoff = timezone.localdate() - timedelta(days=retention_days)
+    old = CustomerActivity.objects.filter(timestamp__date__lt=cutoff)
+
+    removed = 0
+    for day in old.dates("timestamp", "day"):
+        with transaction.atomic():
+            events = CustomerActivity.objects.filter(timestamp__date=day)
+            counts = Counter()
+            last_id = 0
+            for event_id, customer_id, action, timestamp in events.values_list(
+                "id", "customer_id", "action", "timestamp"
+            ).iterator():
+                counts[(sale_day(timestamp), customer_id, action)] += 1
+                last_id = max(last_id, event_id)
+
+            # Late events for an already summarised day are added to the existing counts
+            summaries = DailyActivitySummary.objects.filter(day__in={key[0] for key in counts})
+            for summary in summaries:
+                counts[(summary.day, summary.customer_id, summary.action)] += summary.count
+            summaries.delete()
+            DailyActivitySummary.objects.bulk_create(
+                [
+                    DailyActivitySummary(day=summary_day, customer_id=customer_id, action=action, count=count)
+                    for (summary_day, customer_id, action), count in counts.items()
+                ],
+                batch_size=1000,
+            )
+            # Only delete what was counted, not events flushed in the meantime
+            removed += events.filter(id__lte=last_id).delete()[0]
+    return removed
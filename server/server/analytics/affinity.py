@@ -0,0 +1,102 @@
+import heapq
+import math
+from collections import Counter, defaultdict
+from itertools import combinations
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from ecommerce.models import OrderItem, ProductAffinity
+from .models import Sale
+
+# Bumped after every run so cached related-product responses are refreshed
+AFFINITY_VERSION_KEY = "ecommerce:affinity:version"
+# Baskets larger than this are truncated so one bulk buyer can't blow up the pair count
+MAX_BASKET_SIZE = 50
+
+
+def sale_baskets(window_days=1, chunk_size=5000):
+    """Yield sets of product ids bought by the same customer within the same `window_days` window."""
+    window = window_days * 86400
+    rows = (
+        Sale.objects.filter(customer__isnull=False)
+        .order_by('customer_id', 'timestamp')
+        .values_list('customer_id', 'timestamp', 'product_id')
+        .iterator(chunk_size=chunk_size)
+    )
+    current_key, basket = None, set()
+    for customer_id, timestamp, product_id in rows:
+        key = (customer_id, int(timestamp.timestamp() // window))
+        if key != current_key:
+            if basket:
+                yield basket
+            current_key, basket = key, set()
+        basket.add(product_id)
+    if basket:
+        yield basket
+
+
+def order_baskets(chunk_size=5000):
+    """Yield the set of product ids in each order."""
+    rows = OrderItem.objects.order_by('order_id').values_list('order_id', 'product_id').iterator(chunk_size=chunk_size)
+    current_order, basket = None, set()
+    for order_id, product_id in rows:
+        if order_id != current_order:
+            if basket:
+                yield basket
+            current_order, basket = order_id, set()
+        basket.add(product_id)
+    if basket:
+        yield basket
+
+
+def count_co_purchases(baskets):
+    """
+    Count baskets per product and per product pair.
+    Only pairs that actually occur are stored, so memory grows with real co-purchases, not catalog size squared.
+    """
+    item_counts = Counter()
+    pair_counts = Counter()
+    for basket in baskets:
+        items = sorted(basket)[:MAX_BASKET_SIZE]
+        item_counts.update(items)
+        if len(items) > 1:
+            pair_counts.update(combinations(items, 2))
+    return item_counts, pair_counts
+
+
+def top_neighbours(item_counts, pair_counts, top_k=10, min_co_purchases=2):
+    """Return {product_id: [(related_id, co_purchases, score), ...]} ranked by cosine similarity."""
+    neighbours = defaultdict(list)
+    for (a, b), together in pair_counts.items():
+        if together < min_co_purchases:
+            continue
+        score = together / math.sqrt(item_counts[a] * item_counts[b])
+        neighbours[a].append((score, together, b))
+        neighbours[b].append((score, together, a))
+    return {
+        product_id: [(related, together, score) for score, together, related in heapq.nlargest(top_k, candidates)]
+        for product_id, candidates in neighbours.items()
+    }
+
+
+def compute_product_affinity(source='sales', window_days=1, top_k=10, min_co_purchases=2, batch_size=1000):
+    """
+    Rebuild the ProductAffinity table from sales (grouped per customer and time window) or orders.
+    Returns the number of affinity rows written.
+    """
+    baskets = order_baskets() if source == 'orders' else sale_baskets(window_days)
+    item_counts, pair_counts = count_co_purchases(baskets)
+    neighbours = top_neighbours(item_counts, pair_counts, top_k, min_co_purchases)
+
+    rows = [
+        ProductAffinity(
+            product_id=product_id, related_product_id=related, rank=rank, co_purchases=together, score=score
+        )
+        for product_id, ranked in neighbours.items()
+        for rank, (related, together, score) in enumerate(ranked, start=1)
+    ]
+    with transaction.atomic():
+        ProductAffinity.objects.all().delete()
+        ProductAffinity.objects.bulk_create(rows, batch_size=batch_size)
+    cache.set(AFFINITY_VERSION_KEY, timezone.now().timestamp(), timeout=None)
+    return len(rows)
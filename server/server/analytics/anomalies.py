@@ -0,0 +1,187 @@
+from datetime import datetime, time, timedelta
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+from ecommerce.models import Category, Product
+from .models import HourlySalesRollup, SalesAnomaly
+from .series import daily_product_matrix, group_rows
+
+# EWMA smoothing factor for the baseline, and the number of past buckets the robust scale is taken from
+EWMA_ALPHA = 0.3
+MAD_WINDOW = 28
+# Buckets needed before the baseline settles, on top of the MAD window
+WARMUP = 28
+# Days of recent buckets (re)checked on every run
+DAILY_LOOKBACK = 7
+HOURLY_LOOKBACK = 2
+# Series expecting fewer orders than this per bucket are too sparse to judge
+MIN_ORDERS = 5
+# Deviations smaller than this share of the baseline never count, even on very regular series
+MIN_RELATIVE_SCALE = 0.1
+
+
+def _threshold():
+    return getattr(settings, "ANALYTICS_ANOMALY_Z_THRESHOLD", 3.5)
+
+
+def ewma_baseline(matrix, alpha=EWMA_ALPHA):
+    """Expected value of every bucket from the EWMA of the buckets before it, for all rows at once."""
+    expected = np.empty_like(matrix, dtype=np.float64)
+    level = matrix[:, 0].astype(np.float64)
+    expected[:, 0] = level
+    for t in range(1, matrix.shape[1]):
+        expected[:, t] = level
+        level = alpha * matrix[:, t] + (1 - alpha) * level
+    return expected
+
+
+def robust_scores(matrix, lookback, window=MAD_WINDOW, alpha=EWMA_ALPHA, floor=None):
+    """
+    Score the last `lookback` buckets of every row against its EWMA baseline.
+
+    The residual of each bucket is standardised by the median and MAD of the
+    residuals of the `window` buckets before it, so earlier outliers don't
+    inflate the scale; `floor` optionally bounds the scale from below.
+    Returns (z scores, expected values) for those buckets.
+    """
+    expected = ewma_baseline(matrix, alpha)
+    residuals = matrix - expected
+    total = matrix.shape[1]
+    history = sliding_window_view(residuals[:, :-1], window, axis=1)[:, total - lookback - window:total - window]
+    median = np.median(history, axis=-1)
+    mad = np.median(np.abs(history - median[..., None]), axis=-1)
+    recent_expected = expected[:, -lookback:]
+    scale = np.maximum.reduce([1.4826 * mad, MIN_RELATIVE_SCALE * np.abs(recent_expected), np.full_like(mad, 1e-9)])
+    if floor is not None:
+        scale = np.maximum(scale, floor(recent_expected))
+    return (residuals[:, -lookback:] - median) / scale, recent_expected
+
+
+def _flag(series, orders, revenue, lookback, bucket_start, complete=None):
+    """
+    Yield anomaly dicts for every series (row) and recent bucket whose orders or
+    revenue score crosses the threshold. bucket_start(row, column) gives the
+    bucket's start time, `complete` optionally masks out unfinished buckets.
+    """
+    threshold = _threshold()
+    # Order counts are at least Poisson noisy, and revenue inherits that noise
+    order_z, order_expected = robust_scores(orders, lookback, floor=lambda expected: np.sqrt(np.maximum(expected, 1)))
+    noise = np.sqrt(np.maximum(order_expected, 1))
+    revenue_z, revenue_expected = robust_scores(revenue, lookback, floor=lambda expected: np.abs(expected) / noise)
+    dense = order_expected >= MIN_ORDERS
+    if complete is not None:
+        dense &= complete
+    for metric, z, expected, values in (
+        ("orders", order_z, order_expected, orders[:, -lookback:]),
+        ("revenue", revenue_z, revenue_expected, revenue[:, -lookback:]),
+    ):
+        for row, column in zip(*np.nonzero(dense & (np.abs(z) >= threshold))):
+            yield {
+                **series[row],
+                "metric": metric,
+                "bucket_start": bucket_start(row, column),
+                "value": float(values[row, column]),
+                "expected": float(expected[row, column]),
+                "z_score": float(z[row, column]),
+                "direction": "spike" if z[row, column] > 0 else "drop",
+            }
+
+
+def _daily_anomalies(end):
+    days = WARMUP + MAD_WINDOW + DAILY_LOOKBACK
+    product_ids, category_ids, start, matrices = daily_product_matrix(days, end, fields=("revenue", "order_count"))
+    if not product_ids.size:
+        return []
+    revenue, orders = matrices["revenue"], matrices["order_count"]
+    names = dict(Product.objects.filter(id__in=product_ids.tolist()).values_list("id", "name"))
+    category_names = dict(Category.objects.values_list("id", "name"))
+    labels, category_orders = group_rows(orders, category_ids)
+    _, category_revenue = group_rows(revenue, category_ids)
+    known = labels >= 0
+
+    series = (
+        [{"series": "total", "scope": "total", "label": "All sales"}]
+        + [
+            {"series": f"category:{category_id}", "scope": "category", "category_id": int(category_id),
+             "label": category_names.get(int(category_id), "")}
+            for category_id in labels[known]
+        ]
+        + [
+            {"series": f"product:{product_id}", "scope": "product", "product_id": int(product_id),
+             "label": names.get(int(product_id), "")}
+            for product_id in product_ids
+        ]
+    )
+    orders = np.vstack([orders.sum(axis=0, keepdims=True), category_orders[known], orders])
+    revenue = np.vstack([revenue.sum(axis=0, keepdims=True), category_revenue[known], revenue])
+    bucket_starts = [
+        timezone.make_aware(datetime.combine(start + timedelta(days=offset), time.min))
+        for offset in range(days - DAILY_LOOKBACK, days)
+    ]
+    return [
+        {**anomaly, "granularity": "day"}
+        for anomaly in _flag(series, orders, revenue, DAILY_LOOKBACK, lambda row, column: bucket_starts[column])
+    ]
+
+
+def _hourly_anomalies(end):
+    """
+    Total sales per hour from the hourly rollup, compared with the same hour on
+    earlier days so the daily cycle isn't flagged.
+    """
+    days = WARMUP + MAD_WINDOW + HOURLY_LOOKBACK
+    start = end - timedelta(days=days - 1)
+    start_at = timezone.make_aware(datetime.combine(start, time.min))
+    rows = (
+        HourlySalesRollup.objects.filter(hour__gte=start_at)
+        .values("hour")
+        .annotate(orders=Sum("order_count"), revenue=Sum("revenue"))
+        .order_by()
+    )
+    # One row per hour of day, one column per day
+    orders = np.zeros((24, days), dtype=np.float64)
+    revenue = np.zeros((24, days), dtype=np.float64)
+    for row in rows:
+        local = timezone.localtime(row["hour"])
+        offset = (local.date() - start).days
+        if 0 <= offset < days:
+            orders[local.hour, offset] += row["orders"]
+            revenue[local.hour, offset] += float(row["revenue"])
+
+    def bucket_start(hour, column):
+        day = start + timedelta(days=days - HOURLY_LOOKBACK + int(column))
+        return timezone.make_aware(datetime.combine(day, time(hour=int(hour))))
+
+    # Only judge hours that have finished
+    current_hour = timezone.localtime().replace(minute=0, second=0, microsecond=0)
+    complete = np.array([
+        [bucket_start(hour, column) < current_hour for column in range(HOURLY_LOOKBACK)] for hour in range(24)
+    ])
+    series = [{"series": "total", "scope": "total", "label": "All sales"}] * 24
+    return [
+        {**anomaly, "granularity": "hour"}
+        for anomaly in _flag(series, orders, revenue, HOURLY_LOOKBACK, bucket_start, complete)
+    ]
+
+
+def detect_sales_anomalies():
+    """
+    Re-check the recent daily (total, per category, per product) and hourly
+    (total) sales series and store the anomalies found. Anomalies previously
+    stored for the re-checked buckets are replaced. Returns the number stored.
+    """
+    today = timezone.localdate()
+    # Today is still in progress, so the daily series ends yesterday
+    daily = _daily_anomalies(today - timedelta(days=1))
+    hourly = _hourly_anomalies(today)
+
+    daily_from = timezone.make_aware(datetime.combine(today - timedelta(days=DAILY_LOOKBACK), time.min))
+    hourly_from = timezone.make_aware(datetime.combine(today - timedelta(days=HOURLY_LOOKBACK - 1), time.min))
+    with transaction.atomic():
+        SalesAnomaly.objects.filter(granularity="day", bucket_start__gte=daily_from).delete()
+        SalesAnomaly.objects.filter(granularity="hour", bucket_start__gte=hourly_from).delete()
+        SalesAnomaly.objects.bulk_create([SalesAnomaly(**anomaly) for anomaly in daily + hourly], batch_size=1000)
+    return len(daily) + len(hourly)
@@ -0,0 +1,104 @@
+import time
+from django.conf import settings
+from django.core.cache import cache
+
+# One generation per data source, bumped by writes to it. Every cache key carries the generations
+# of the sources its endpoint reads, so a write only makes the entries it can change stale.
+GENERATION_KEY = "analytics:generation:{}"
+SOURCES = ("sales", "products", "inventory", "users")
+ENDPOINT_SOURCES = {
+    "sales_dashboard": ("sales", "products"),
+    "customer_dashboard": ("sales", "users"),
+    "customer_cohorts": ("sales", "users"),
+    "sales_timeseries": ("sales",),
+    "order_distribution": ("sales",),
+    "inventory_velocity": ("sales", "products", "inventory"),
+    "predicted_low_stock": ("products",),
+}
+STATS_KEY = "analytics:stats:{}"
+# How long a request waits for another request that is already computing the same entry
+LOCK_TIMEOUT = 30
+POLL_INTERVAL = 0.05
+
+
+def _ttl():
+    return getattr(settings, "ANALYTICS_CACHE_TTL", 300)
+
+
+def _count(name):
+    key = STATS_KEY.format(name)
+    if not cache.add(key, 1, timeout=None):
+        cache.incr(key)
+
+
+def current_generations(sources=SOURCES):
+    keys = {source: GENERATION_KEY.format(source) for source in sources}
+    generations = cache.get_many(keys.values())
+    for key in keys.values():
+        if key not in generations:
+            # Seed from the clock so a lost key can never bring back entries from an earlier generation
+            cache.add(key, time.time_ns(), timeout=None)
+            generations[key] = cache.get(key)
+    return {source: generations[key] for source, key in keys.items()}
+
+
+def invalidate_dashboards(*sources):
+    """Make every cached entry reading any of `sources` (by default all of them) stale."""
+    for source in sources or SOURCES:
+        try:
+            cache.incr(GENERATION_KEY.format(source))
+        except ValueError:
+            current_generations([source])
+
+
+def cached_result(endpoint, params, compute):
+    """
+    Return the cached result for `endpoint`/`params`, computing it on a miss.
+
+    Concurrent misses for the same key are coalesced: the first request takes a
+    lock and computes, the others wait for its result instead of recomputing.
+    """
+    generations = current_generations(ENDPOINT_SOURCES.get(endpoint, SOURCES))
+    key = f"analytics:{endpoint}:{'.'.join(map(str, generations.values()))}:{params}"
+    value = cache.get(key)
+    if value is not None:
+        _count("hits")
+        return value
+
+    lock_key = f"{key}:lock"
+    acquired = cache.add(lock_key, 1, timeout=LOCK_TIMEOUT)
+    if not acquired:
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(POLL_INTERVAL)
+            value = cache.get(key)
+            if value is not None:
+                _count("coalesced")
+                return value
+            if cache.get(lock_key) is None:
+                break  # The other request failed; compute it ourselves
+
+    try:
+        value = compute()
+        cache.set(key, value, timeout=_ttl())
+    finally:
+        if acquired:
+            cache.delete(lock_key)
+    _count("misses")
+    return value
+
+
+def cache_stats():
+    stats = cache.get_many([STATS_KEY.format(name) for name in ("hits", "misses", "coalesced")])
+    hits = stats.get(STATS_KEY.format("hits"), 0)
+    misses = stats.get(STATS_KEY.format("misses"), 0)
+    coalesced = stats.get(STATS_KEY.format("coalesced"), 0)
+    lookups = hits + misses + coalesced
+    return {
+        "hits": hits,
+        "misses": misses,
+        "coalesced": coalesced,
+        "hit_rate": (hits + coalesced) / lookups * 100 if lookups else 0,
+        "generations": current_generations(),
+        "ttl": _ttl(),
+    }
@@ -0,0 +1,90 @@
+from collections import defaultdict
+from datetime import date, datetime
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import Count
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from .models import Sale
+
+# Closed months never change, so their cells are kept for a little longer than a month
+CLOSED_COHORTS_TIMEOUT = 60 * 60 * 24 * 32
+
+
+def _month(value):
+    if isinstance(value, datetime):
+        value = timezone.localtime(value).date()
+    return date(value.year, value.month, 1)
+
+
+def _months_between(start, end):
+    return (end.year - start.year) * 12 + end.month - start.month
+
+
+def _cohort_sizes(users):
+    rows = (
+        users.annotate(cohort=TruncMonth('date_joined'))
+        .values('cohort').annotate(customers=Count('id')).order_by()
+    )
+    return {_month(row['cohort']): row['customers'] for row in rows}
+
+
+def _active_cells(sales):
+    """Map (cohort month, activity month) to distinct active customers with one grouped query."""
+    rows = (
+        sales.filter(customer__isnull=False)
+        .annotate(cohort=TruncMonth('customer__date_joined'), month=TruncMonth('timestamp'))
+        .values('cohort', 'month')
+        .annotate(customers=Count('customer', distinct=True))
+        .order_by()
+    )
+    return {(_month(row['cohort']), _month(row['month'])): row['customers'] for row in rows}
+
+
+def _closed_cohorts(current_month):
+    """Cohort sizes and activity cells for every month before `current_month`, computed once per month."""
+    key = f"analytics:cohorts:closed:{current_month:%Y-%m}"
+    closed = cache.get(key)
+    if closed is None:
+        month_start = timezone.make_aware(datetime.combine(current_month, datetime.min.time()))
+        closed = {
+            "sizes": _cohort_sizes(User.objects.filter(date_joined__lt=month_start)),
+            "cells": _active_cells(Sale.objects.filter(timestamp__lt=month_start)),
+        }
+        cache.set(key, closed, timeout=CLOSED_COHORTS_TIMEOUT)
+    return closed
+
+
+def cohort_retention(months=12):
+    """
+    Build a signup-month x months-since-signup retention matrix for the last `months` cohorts.
+
+    Months that have already ended are cached per calendar month, so only the
+    current month's activity is queried on each call.
+    """
+    current_month = _month(timezone.now())
+    month_start = timezone.make_aware(datetime.combine(current_month, datetime.min.time()))
+
+    closed = _closed_cohorts(current_month)
+    sizes = dict(closed["sizes"])
+    sizes.update(_cohort_sizes(User.objects.filter(date_joined__gte=month_start)))
+    cells = dict(closed["cells"])
+    cells.update(_active_cells(Sale.objects.filter(timestamp__gte=month_start)))
+    activity = defaultdict(dict)
+    for (cohort, month), customers in cells.items():
+        activity[cohort][_months_between(cohort, month)] = customers
+
+    cohorts = []
+    for cohort in sorted(sizes):
+        age = _months_between(cohort, current_month)
+        if age >= months:
+            continue
+        active = [activity[cohort].get(offset, 0) for offset in range(age + 1)]
+        size = sizes[cohort]
+        cohorts.append({
+            "cohort": f"{cohort:%Y-%m}",
+            "customers": size,
+            "active_customers": active,
+            "retention_rate": [round(count / size * 100, 2) if size else 0 for count in active],
+        })
+    return {"months": months, "cohorts": cohorts}
@@ -0,0 +1,20 @@
+import json
+from channels.generic.websocket import AsyncWebsocketConsumer
+from .live import DASHBOARD_GROUP
+
+
+class AnalyticsDashboardConsumer(AsyncWebsocketConsumer):
+    """Pushes batched sales / order deltas to open dashboards so they don't have to poll."""
+
+    async def connect(self):
+        if self.scope["user"].is_anonymous:
+            await self.close(code=4003)
+            return
+        await self.channel_layer.group_add(DASHBOARD_GROUP, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        await self.channel_layer.group_discard(DASHBOARD_GROUP, self.channel_name)
+
+    async def analytics_delta(self, event):
+        await self.send(text_data=json.dumps({"type": "delta", "delta": event["delta"]}))
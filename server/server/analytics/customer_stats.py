@@ -0,0 +1,87 @@
+from django.db.models import Count, Max, Min, Sum
+from .metrics import HIGH_SPEND_THRESHOLD, MODERATE_SPEND_THRESHOLD
+from .models import CustomerStats, Sale
+
+STAT_FIELDS = ['lifetime_spend', 'order_count', 'total_quantity', 'first_purchase_at', 'last_purchase_at', 'segment']
+
+
+def spend_segment(lifetime_spend, order_count):
+    """Return the spend tier label for a customer's lifetime totals."""
+    if not order_count:
+        return ''
+    if lifetime_spend >= HIGH_SPEND_THRESHOLD:
+        return 'high_spenders'
+    if lifetime_spend >= MODERATE_SPEND_THRESHOLD:
+        return 'moderate_spenders'
+    return 'low_spenders'
+
+
+def _stats_values(row):
+    values = {
+        'lifetime_spend': row['lifetime_spend'] or 0,
+        'order_count': row['order_count'],
+        'total_quantity': row['total_quantity'] or 0,
+        'first_purchase_at': row['first_purchase_at'],
+        'last_purchase_at': row['last_purchase_at'],
+    }
+    values['segment'] = spend_segment(values['lifetime_spend'], values['order_count'])
+    return values
+
+
+def _aggregate_sales(sales):
+    return sales.aggregate(
+        lifetime_spend=Sum('total_price'),
+        order_count=Count('id'),
+        total_quantity=Sum('quantity'),
+        first_purchase_at=Min('timestamp'),
+        last_purchase_at=Max('timestamp'),
+    )
+
+
+def refresh_customer_stats(user_id):
+    """Recompute one customer's stats row from their own (indexed) sales."""
+    if user_id is None:
+        return
+    values = _stats_values(_aggregate_sales(Sale.objects.filter(customer_id=user_id)))
+    CustomerStats.objects.update_or_create(user_id=user_id, defaults=values)
+
+
+def reconcile_customer_stats(batch_size=1000):
+    """
+    Compare every stats row against the raw sales and fix any drift.
+    Returns the number of rows created, updated or deleted.
+    """
+    existing = {
+        stats.user_id: stats
+        for stats in CustomerStats.objects.only('user_id', *STAT_FIELDS)
+    }
+    grouped = (
+        Sale.objects.filter(customer__isnull=False)
+        .values('customer_id')
+        .annotate(
+            lifetime_spend=Sum('total_price'),
+            order_count=Count('id'),
+            total_quantity=Sum('quantity'),
+            first_purchase_at=Min('timestamp'),
+            last_purchase_at=Max('timestamp'),
+        )
+        .order_by()
+    )
+
+    to_create, to_update = [], []
+    for row in grouped.iterator(chunk_size=batch_size):
+        values = _stats_values(row)
+        stats = existing.pop(row['customer_id'], None)
+        if stats is None:
+            to_create.append(CustomerStats(user_id=row['customer_id'], **values))
+        elif any(getattr(stats, field) != value for field, value in values.items()):
+            for field, value in values.items():
+                setattr(stats, field, value)
+            to_update.append(stats)
+
+    # Rows left over belong to customers whose sales are all gone
+    stale = [user_id for user_id, stats in existing.items() if stats.order_count]
+    CustomerStats.objects.bulk_create(to_create, batch_size=batch_size)
+    CustomerStats.objects.bulk_update(to_update, STAT_FIELDS, batch_size=batch_size)
+    CustomerStats.objects.filter(user_id__in=stale).delete()
+    return len(to_create) + len(to_update) + len(stale)
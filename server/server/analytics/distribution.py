@@ -0,0 +1,158 @@
+import math
+from collections import Counter
+from datetime import timedelta
+import numpy as np
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from .models import DailySalesSketch, Sale
+from .rollups import sale_day
+
+# Log-bucket sketch: every value is reported within 1% of its true value, and
+# sketches merge by adding counts, so any window is a sum of daily sketches
+RELATIVE_ACCURACY = 0.01
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+# Order values below one cent share the lowest bucket
+MIN_VALUE = 0.01
+PERCENTILES = (50, 90, 99)
+# Sketch rows per day; a sale always lands in shard `sale id % SKETCH_SHARDS`
+SKETCH_SHARDS = 16
+
+
+def value_bucket(value):
+    return math.ceil(math.log(max(float(value), MIN_VALUE), GAMMA))
+
+
+def bucket_value(index):
+    """Representative value of a bucket, within RELATIVE_ACCURACY of anything stored in it."""
+    return 2 * GAMMA ** index / (GAMMA + 1)
+
+
+def _add(counts, key, amount):
+    key = str(key)
+    counts[key] = counts.get(key, 0) + amount
+    if counts[key] <= 0:
+        del counts[key]
+
+
+def apply_sale_to_sketch(sale_id, timestamp, total_price, quantity, sign=1):
+    """
+    Add (sign=1) or remove (sign=-1) a single sale from its day's sketch. Only
+    the sale's shard row is locked, so concurrent sales rarely wait on each other.
+    """
+    day, shard = sale_day(timestamp), sale_id % SKETCH_SHARDS
+    with transaction.atomic():
+        sketch = DailySalesSketch.objects.select_for_update().filter(day=day, shard=shard).first()
+        if sketch is None:
+            if sign < 0:
+                return
+            try:
+                # Savepoint so a concurrent insert of the same shard doesn't break the outer transaction
+                with transaction.atomic():
+                    sketch = DailySalesSketch.objects.create(day=day, shard=shard)
+            except IntegrityError:
+                sketch = DailySalesSketch.objects.select_for_update().get(day=day, shard=shard)
+        _add(sketch.order_values, value_bucket(total_price), sign)
+        _add(sketch.basket_sizes, quantity, sign)
+        sketch.order_count = max(0, sketch.order_count + sign)
+        if not sketch.order_count:
+            sketch.delete()
+            return
+        sketch.save(update_fields=["order_values", "basket_sizes", "order_count"])
+
+
+def rebuild_daily_sketches(since=None, batch_size=5000):
+    """
+    Recompute the daily sketches from the raw Sale table.
+    If `since` (a date) is given only days on or after it are rebuilt.
+    Returns the number of sketch rows written.
+    """
+    sales = Sale.objects.all()
+    sketches = DailySalesSketch.objects.all()
+    if since is not None:
+        sales = sales.filter(timestamp__date__gte=since)
+        sketches = sketches.filter(day__gte=since)
+
+    shards = {}
+    for sale_id, timestamp, total_price, quantity in sales.values_list(
+        "id", "timestamp", "total_price", "quantity"
+    ).iterator(chunk_size=batch_size):
+        values, sizes = shards.setdefault((sale_day(timestamp), sale_id % SKETCH_SHARDS), (Counter(), Counter()))
+        values[str(value_bucket(total_price))] += 1
+        sizes[str(quantity)] += 1
+
+    with transaction.atomic():
+        sketches.delete()
+        DailySalesSketch.objects.bulk_create(
+            [
+                DailySalesSketch(
+                    day=day, shard=shard, order_values=dict(values), basket_sizes=dict(sizes),
+                    order_count=sum(sizes.values()),
+                )
+                for (day, shard), (values, sizes) in shards.items()
+            ],
+            batch_size=batch_size,
+        )
+    return len(shards)
+
+
+def _merge(sketches):
+    merged = Counter()
+    for counts in sketches:
+        merged.update({int(key): count for key, count in counts.items()})
+    keys = np.array(sorted(merged), dtype=np.int64)
+    return keys, np.array([merged[key] for key in keys.tolist()], dtype=np.int64)
+
+
+def _percentiles(keys, counts):
+    if not counts.sum():
+        return {f"p{p}": None for p in PERCENTILES}
+    cumulative = np.cumsum(counts)
+    # Nearest-rank percentile: the first key whose cumulative count reaches the rank
+    ranks = np.ceil(np.array(PERCENTILES) / 100 * cumulative[-1])
+    positions = np.searchsorted(cumulative, ranks)
+    return {f"p{p}": int(keys[position]) for p, position in zip(PERCENTILES, positions)}
+
+
+def _value_histogram(keys, counts, buckets):
+    """Collapse the sketch into `buckets` log-spaced ranges between the smallest and largest value."""
+    if not counts.sum():
+        return []
+    edges = np.unique(np.linspace(keys[0] - 1, keys[-1], buckets + 1).round().astype(np.int64))
+    totals = np.bincount(np.searchsorted(edges, keys, side="left") - 1, weights=counts, minlength=len(edges) - 1)
+    return [
+        {"lower": round(GAMMA ** int(lower), 2), "upper": round(GAMMA ** int(upper), 2), "count": int(total)}
+        for lower, upper, total in zip(edges[:-1], edges[1:], totals)
+    ]
+
+
+def order_distribution(time_period, buckets=10):
+    """
+    Order value and basket size distribution over the last `time_period` days,
+    merged from the daily sketch shards without reading individual sales.
+    """
+    start_day = sale_day(timezone.now() - timedelta(days=time_period))
+    rows = list(
+        DailySalesSketch.objects.filter(day__gte=start_day).values_list("order_values", "basket_sizes", "order_count")
+    )
+    value_keys, value_counts = _merge(row[0] for row in rows)
+    size_keys, size_counts = _merge(row[1] for row in rows)
+
+    value_percentiles = {
+        name: None if index is None else round(bucket_value(index), 2)
+        for name, index in _percentiles(value_keys, value_counts).items()
+    }
+    return {
+        "orders": sum(row[2] for row in rows),
+        "order_value": {
+            **value_percentiles,
+            "relative_accuracy": RELATIVE_ACCURACY,
+            "histogram": _value_histogram(value_keys, value_counts, buckets),
+        },
+        "basket_size": {
+            **_percentiles(size_keys, size_counts),
+            "mean": float(np.average(size_keys, weights=size_counts)) if size_counts.sum() else None,
+            "histogram": [
+                {"size": int(size), "count": int(count)} for size, count in zip(size_keys, size_counts)
+            ],
+        },
+    }
@@ -0,0 +1,178 @@
+import io
+from datetime import timedelta
+from pathlib import Path
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+from django.db import transaction
+from django.utils import timezone
+from ecommerce.models import Order, OrderItem
+from .models import CustomerActivity, ExportCheckpoint, Sale
+
+TIMESTAMP = pa.timestamp('us', tz='UTC')
+MONEY = pa.decimal128(14, 2)
+
+# Per dataset: queryset, the timestamp column that drives partitioning / incremental exports, and the columns
+DATASETS = {
+    'sales': {
+        'queryset': lambda: Sale.objects.all(),
+        'timestamp': 'timestamp',
+        'columns': [
+            ('id', pa.int64()), ('product_id', pa.int64()), ('customer_id', pa.int64()),
+            ('quantity', pa.int64()), ('total_price', MONEY), ('timestamp', TIMESTAMP),
+        ],
+    },
+    'activities': {
+        'queryset': lambda: CustomerActivity.objects.all(),
+        'timestamp': 'timestamp',
+        'columns': [
+            ('id', pa.int64()), ('customer_id', pa.int64()), ('action', pa.string()), ('timestamp', TIMESTAMP),
+        ],
+    },
+    'orders': {
+        'queryset': lambda: Order.objects.all(),
+        'timestamp': 'created_at',
+        'columns': [
+            ('id', pa.int64()), ('user_id', pa.int64()), ('total_price', MONEY), ('status', pa.string()),
+            ('shipping_address', pa.string()), ('created_at', TIMESTAMP), ('updated_at', TIMESTAMP),
+        ],
+    },
+    'order_items': {
+        'queryset': lambda: OrderItem.objects.all(),
+        'timestamp': 'order__created_at',
+        'columns': [
+            ('id', pa.int64()), ('order_id', pa.int64()), ('product_id', pa.int64()),
+            ('quantity', pa.int64()), ('price', MONEY), ('order__created_at', TIMESTAMP),
+        ],
+    },
+}
+FORMATS = ('parquet', 'arrow')
+# Incremental exports re-read this far before the checkpoint: a row can commit after a run has passed
+# its timestamp (the timestamp is set before the transaction ends). Rows already exported are skipped by id.
+EXPORT_OVERLAP = timedelta(minutes=10)
+
+
+def dataset_schema(dataset):
+    return pa.schema([(name.replace('__', '_'), arrow_type) for name, arrow_type in DATASETS[dataset]['columns']])
+
+
+def iter_record_batches(dataset, since=None, until=None, chunk_size=50000):
+    """
+    Yield Arrow record batches of `dataset` rows in timestamp order.
+    Rows are read with .iterator(), which uses a server-side cursor on PostgreSQL, so memory stays flat.
+    """
+    config = DATASETS[dataset]
+    timestamp = config['timestamp']
+    names = [name for name, _ in config['columns']]
+    schema = dataset_schema(dataset)
+
+    rows = config['queryset']()
+    if since is not None:
+        rows = rows.filter(**{f'{timestamp}__gt': since})
+    if until is not None:
+        rows = rows.filter(**{f'{timestamp}__lte': until})
+    rows = rows.order_by(timestamp, 'id').values_list(*names).iterator(chunk_size=chunk_size)
+
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield _record_batch(chunk, schema)
+            chunk = []
+    if chunk:
+        yield _record_batch(chunk, schema)
+
+
+def _record_batch(rows, schema):
+    columns = list(zip(*rows))
+    return pa.RecordBatch.from_arrays(
+        [pa.array(column, type=field.type) for column, field in zip(columns, schema)], schema=schema
+    )
+
+
+def _partition_days(batch, timestamp_column):
+    """Split a batch into (day, slice) runs; batches are sorted by timestamp so each day is contiguous."""
+    local = batch.column(timestamp_column).cast(pa.timestamp('us', tz=timezone.get_current_timezone_name()))
+    days = pc.local_timestamp(local).cast(pa.date32())
+    ordinals = days.cast(pa.int32()).to_numpy(zero_copy_only=False)
+    starts = np.flatnonzero(np.diff(ordinals, prepend=ordinals[0] - 1))
+    for start, end in zip(starts, [*starts[1:], len(ordinals)]):
+        yield days[int(start)].as_py(), batch.slice(int(start), int(end - start))
+
+
+def export_dataset(dataset, output_dir, file_format='parquet', since=None, incremental=True, chunk_size=50000):
+    """
+    Write `dataset` under output_dir/<dataset>/date=YYYY-MM-DD/ as Parquet or Arrow IPC files.
+
+    With `incremental` (and no explicit `since`) only rows not written by earlier
+    runs are exported: each run re-reads EXPORT_OVERLAP before the checkpoint to
+    pick up late commits and skips the ids the previous run already wrote there.
+    Returns the number of rows exported.
+    """
+    until = timezone.now()
+    checkpoint = ExportCheckpoint.objects.filter(dataset=dataset).first()
+    exported_ids = pa.array([], type=pa.int64())
+    if since is None and incremental and checkpoint is not None:
+        since = checkpoint.last_exported_at - EXPORT_OVERLAP
+        exported_ids = pa.array(checkpoint.recent_ids, type=pa.int64())
+    overlap_start = pa.scalar(until - EXPORT_OVERLAP, type=TIMESTAMP)
+
+    schema = dataset_schema(dataset)
+    timestamp_column = DATASETS[dataset]['timestamp'].replace('__', '_')
+    run_id = until.strftime('%Y%m%dT%H%M%S%f')  # Unique per run, so a run never overwrites another's files
+    extension = 'parquet' if file_format == 'parquet' else 'arrow'
+
+    current_day, writer = None, None
+    exported = 0
+    recent_ids = []
+    try:
+        for batch in iter_record_batches(dataset, since, until, chunk_size):
+            # Every row read inside the next run's overlap window is exported by now, by this run or an earlier one
+            in_overlap = pc.greater(batch.column(timestamp_column), overlap_start)
+            recent_ids.extend(pc.filter(batch.column('id'), in_overlap).to_pylist())
+            batch = batch.filter(pc.invert(pc.is_in(batch.column('id'), value_set=exported_ids)))
+            if not batch.num_rows:
+                continue
+            for day, rows in _partition_days(batch, timestamp_column):
+                if day != current_day:
+                    # Rows arrive in timestamp order, so a finished day is never written to again
+                    if writer is not None:
+                        writer.close()
+                    partition = Path(output_dir) / dataset / f'date={day.isoformat()}'
+                    partition.mkdir(parents=True, exist_ok=True)
+                    path = str(partition / f'part-{run_id}.{extension}')
+                    writer = pq.ParquetWriter(path, schema) if file_format == 'parquet' else ipc.new_file(path, schema)
+                    current_day = day
+                writer.write_batch(rows)
+                exported += rows.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+
+    with transaction.atomic():
+        ExportCheckpoint.objects.update_or_create(
+            dataset=dataset,
+            defaults={'last_exported_at': until, 'rows_exported': exported, 'recent_ids': recent_ids},
+        )
+    return exported
+
+
+def arrow_stream(dataset, since=None, until=None, chunk_size=50000):
+    """Yield `dataset` as an Arrow IPC stream, one encoded record batch at a time."""
+    sink = io.BytesIO()
+    writer = ipc.new_stream(sink, dataset_schema(dataset))
+
+    def drain():
+        data = sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+        return data
+
+    yield drain()  # Schema message
+    for batch in iter_record_batches(dataset, since, until, chunk_size):
+        writer.write_batch(batch)
+        yield drain()
+    writer.close()
+    yield drain()
@@ -0,0 +1,124 @@
+from datetime import timedelta
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from ecommerce.models import Product
+from .models import DemandForecast
+from .series import daily_product_matrix
+
+# Smoothing factors for level and trend, and the trend damping per day ahead
+ALPHA = 0.2
+BETA = 0.05
+PHI = 0.9
+HISTORY_DAYS = 90
+HORIZON_DAYS = 90
+FORECAST_FIELDS = [
+    "level", "trend", "forecast_daily_units", "mean_absolute_error",
+    "stock_at_forecast", "days_until_stockout", "projected_stockout_date",
+]
+
+
+def _lead_days():
+    return getattr(settings, "ANALYTICS_LOW_STOCK_LEAD_DAYS", 14)
+
+
+def damped_holt(matrix, alpha=ALPHA, beta=BETA, phi=PHI):
+    """
+    Fit damped-trend exponential smoothing to every row of a (series x days) matrix at once.
+    Returns the final level, trend and the mean absolute one-day-ahead error per row.
+    """
+    level = matrix[:, 0].astype(np.float64)
+    trend = np.zeros_like(level)
+    error = np.zeros_like(level)
+    for t in range(1, matrix.shape[1]):
+        forecast = level + phi * trend
+        error += np.abs(matrix[:, t] - forecast)
+        previous = level
+        level = alpha * matrix[:, t] + (1 - alpha) * forecast
+        trend = beta * (level - previous) + (1 - beta) * phi * trend
+    return level, trend, error / max(matrix.shape[1] - 1, 1)
+
+
+def forecast_path(level, trend, horizon=HORIZON_DAYS, phi=PHI):
+    """(series x horizon) daily demand forecasts; demand never goes negative."""
+    damping = np.cumsum(phi ** np.arange(1, horizon + 1))
+    return np.clip(level[:, None] + trend[:, None] * damping[None, :], 0, None)
+
+
+def days_until_stockout(stock, path):
+    """
+    Fractional days until cumulative forecast demand uses up `stock`, or NaN
+    when it lasts beyond the forecast horizon. Vectorized over all series.
+    """
+    cumulative = np.cumsum(path, axis=1)
+    stock = np.maximum(stock.astype(np.float64), 0)
+    runs_out = cumulative >= stock[:, None]
+    day = runs_out.argmax(axis=1)
+    rows = np.arange(path.shape[0])
+    # Interpolate inside the day the stock runs out
+    before = np.where(day > 0, cumulative[rows, day - 1], 0)
+    within = np.divide(stock - before, path[rows, day], out=np.zeros_like(stock), where=path[rows, day] > 0)
+    return np.where(runs_out.any(axis=1), day + within, np.nan)
+
+
+def forecast_demand(history_days=HISTORY_DAYS, horizon_days=HORIZON_DAYS, batch_size=1000):
+    """
+    Fit every product's daily unit sales in one vectorized pass and store the
+    forecasts and projected stock-out dates. Returns the number of products.
+    """
+    today = timezone.localdate()
+    # Today isn't over yet, so the history ends yesterday
+    product_ids, _, _, matrices = daily_product_matrix(history_days, today - timedelta(days=1), fields=("quantity",))
+    if not product_ids.size:
+        return 0
+    stock_by_id = dict(Product.objects.values_list("id", "stock"))
+    stock = np.array([stock_by_id.get(int(product_id), 0) for product_id in product_ids], dtype=np.int64)
+
+    level, trend, error = damped_holt(matrices["quantity"])
+    path = forecast_path(level, trend, horizon_days)
+    stockout = days_until_stockout(stock, path)
+
+    forecasts = []
+    for index, product_id in enumerate(product_ids.tolist()):
+        days = None if np.isnan(stockout[index]) else float(stockout[index])
+        forecasts.append(DemandForecast(
+            product_id=product_id,
+            level=float(level[index]),
+            trend=float(trend[index]),
+            forecast_daily_units=float(path[index].mean()),
+            mean_absolute_error=float(error[index]),
+            stock_at_forecast=int(stock[index]),
+            days_until_stockout=days,
+            projected_stockout_date=today + timedelta(days=int(days)) if days is not None else None,
+        ))
+
+    with transaction.atomic():
+        DemandForecast.objects.bulk_create(
+            forecasts,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=["product"],
+            update_fields=FORECAST_FIELDS + ["computed_at"],
+        )
+    return len(forecasts)
+
+
+def predicted_low_stock(days=None, limit=50):
+    """
+    Products forecast to run out of stock within `days` (default: the restock lead time),
+    soonest first. Reads the nightly forecasts only.
+    """
+    days = _lead_days() if days is None else days
+    today = timezone.localdate()
+    rows = (
+        DemandForecast.objects.filter(projected_stockout_date__lte=today + timedelta(days=days))
+        .order_by("projected_stockout_date", "days_until_stockout", "product_id")
+        .values(
+            "product_id", "days_until_stockout", "projected_stockout_date", "forecast_daily_units",
+            "mean_absolute_error", "stock_at_forecast", "computed_at",
+            name=F("product__name"), sku=F("product__sku"), stock=F("product__stock"),
+        )[:limit]
+    )
+    return list(rows)
@@ -0,0 +1,138 @@
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import Case, ExpressionWrapper, F, FloatField, Q, Sum, When
+from django.utils import timezone
+from ecommerce.models import InventoryHistory, Product
+from .models import DailySalesRollup, ProductStockVelocity
+
+VELOCITY_WINDOWS = (7, 30, 90)
+VELOCITY_FIELDS = [
+    "units_sold_7d", "units_sold_30d", "units_sold_90d", "units_restocked_30d",
+    "avg_daily_units", "days_of_cover", "projected_stockout_date",
+]
+# Window (in days) behind avg_daily_units, days_of_cover and projected_stockout_date
+COVER_WINDOW_DAYS = 30
+# Stock lasting longer than this (ten years) gets no projected stock-out date
+STOCKOUT_HORIZON_DAYS = 3650
+
+
+def projected_stockout_date(today, days_of_cover):
+    if days_of_cover is None or days_of_cover > STOCKOUT_HORIZON_DAYS:
+        return None
+    return today + timedelta(days=int(days_of_cover))
+
+
+def _velocity_values(stock, sold, restocked, today):
+    avg_daily_units = sold[COVER_WINDOW_DAYS] / COVER_WINDOW_DAYS
+    days_of_cover = stock / avg_daily_units if avg_daily_units else None
+    return {
+        "units_sold_7d": sold[7],
+        "units_sold_30d": sold[30],
+        "units_sold_90d": sold[90],
+        "units_restocked_30d": restocked,
+        "avg_daily_units": avg_daily_units,
+        "days_of_cover": days_of_cover,
+        "projected_stockout_date": projected_stockout_date(today, days_of_cover),
+    }
+
+
+def _window_sums(today):
+    """Sum(quantity) aggregates for every velocity window, for use on rollup querysets."""
+    return {
+        f"sold_{days}": Sum("quantity", filter=Q(day__gt=today - timedelta(days=days)))
+        for days in VELOCITY_WINDOWS
+    }
+
+
+def refresh_product_velocity(product_id):
+    """Recompute one product's velocity from at most 90 of its rollup rows and its recent restocks."""
+    today = timezone.localdate()
+    product = Product.objects.filter(pk=product_id).values("stock").first()
+    if product is None:
+        return
+    sold = DailySalesRollup.objects.filter(
+        product_id=product_id, day__gt=today - timedelta(days=max(VELOCITY_WINDOWS))
+    ).aggregate(**_window_sums(today))
+    restocked = InventoryHistory.objects.filter(
+        product_id=product_id, change_type="add", timestamp__gte=timezone.now() - timedelta(days=COVER_WINDOW_DAYS)
+    ).aggregate(total=Sum("quantity_changed"))["total"] or 0
+
+    values = _velocity_values(
+        product["stock"], {days: sold[f"sold_{days}"] or 0 for days in VELOCITY_WINDOWS}, restocked, today
+    )
+    ProductStockVelocity.objects.update_or_create(product_id=product_id, defaults=values)
+
+
+def refresh_all_velocities(batch_size=1000):
+    """Recompute every product's velocity (the windows slide daily). Returns the number of products."""
+    today = timezone.localdate()
+    sold = {
+        row["product_id"]: row
+        for row in DailySalesRollup.objects.filter(day__gt=today - timedelta(days=max(VELOCITY_WINDOWS)))
+        .values("product_id").annotate(**_window_sums(today)).order_by()
+    }
+    restocked = dict(
+        InventoryHistory.objects.filter(
+            change_type="add", timestamp__gte=timezone.now() - timedelta(days=COVER_WINDOW_DAYS)
+        ).values("product_id").annotate(total=Sum("quantity_changed")).order_by().values_list("product_id", "total")
+    )
+
+    velocities = []
+    for product_id, stock in Product.objects.values_list("id", "stock").iterator(chunk_size=batch_size):
+        row = sold.get(product_id, {})
+        values = _velocity_values(
+            stock, {days: row.get(f"sold_{days}") or 0 for days in VELOCITY_WINDOWS}, restocked.get(product_id, 0), today
+        )
+        velocities.append(ProductStockVelocity(product_id=product_id, **values))
+
+    with transaction.atomic():
+        ProductStockVelocity.objects.bulk_create(
+            velocities,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=["product"],
+            update_fields=VELOCITY_FIELDS,
+        )
+    return len(velocities)
+
+
+def inventory_velocity(window=COVER_WINDOW_DAYS, limit=50):
+    """
+    Rank products by projected stock-out date for a 7, 30 or 90 day sales window.
+    Reads only the velocity table joined to the current stock.
+    """
+    units_sold = F(f"units_sold_{window}d")
+    rows = (
+        ProductStockVelocity.objects.annotate(
+            units_sold=units_sold,
+            stock=F("product__stock"),
+            days_of_cover_window=Case(
+                When(**{f"units_sold_{window}d__gt": 0}, then=ExpressionWrapper(
+                    F("product__stock") * 1.0 * window / units_sold, output_field=FloatField()
+                )),
+                default=None,
+                output_field=FloatField(),
+            ),
+        )
+        .filter(days_of_cover_window__isnull=False)
+        .order_by("days_of_cover_window", "product_id")
+        .values("product_id", "product__name", "product__sku", "stock", "units_sold",
+                "units_restocked_30d", "days_of_cover_window")[:limit]
+    )
+
+    today = timezone.localdate()
+    return [
+        {
+            "product_id": row["product_id"],
+            "name": row["product__name"],
+            "sku": row["product__sku"],
+            "stock": row["stock"],
+            "units_sold": row["units_sold"],
+            "units_restocked_30d": row["units_restocked_30d"],
+            "avg_daily_units": row["units_sold"] / window,
+            "turnover_rate": row["units_sold"] / row["stock"] if row["stock"] else None,
+            "days_of_cover": row["days_of_cover_window"],
+            "projected_stockout_date": projected_stockout_date(today, row["days_of_cover_window"]),
+        }
+        for row in rows
+    ]
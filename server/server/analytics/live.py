@@ -0,0 +1,116 @@
+import threading
+from collections import defaultdict
+from decimal import Decimal
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from ecommerce.models import Product
+
+DASHBOARD_GROUP = "analytics_dashboard"
+TOP_PRODUCTS = 10
+
+
+def _interval():
+    return getattr(settings, "ANALYTICS_LIVE_INTERVAL", 1.0)
+
+
+class DeltaBatcher:
+    """
+    Accumulate committed sales and orders and push them to the dashboard group
+    as one delta message per interval, however many rows were written.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.timer = None
+        self.reset()
+
+    def reset(self):
+        self.started_at = None
+        self.revenue = Decimal(0)
+        self.sales = 0
+        self.quantity = 0
+        self.products = defaultdict(lambda: {"quantity": 0, "revenue": Decimal(0)})
+        self.orders = 0
+        self.order_revenue = Decimal(0)
+
+    def _schedule(self):
+        if self.started_at is None:
+            self.started_at = timezone.now()
+        if self.timer is None:
+            self.timer = threading.Timer(_interval(), self._flush_on_timer)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def add_sale(self, product_id, quantity, revenue):
+        with self.lock:
+            self.revenue += revenue
+            self.sales += 1
+            self.quantity += quantity
+            product = self.products[product_id]
+            product["quantity"] += quantity
+            product["revenue"] += revenue
+            self._schedule()
+
+    def add_order(self, total_price):
+        with self.lock:
+            self.orders += 1
+            self.order_revenue += total_price
+            self._schedule()
+
+    def take(self):
+        """Return the pending delta (or None) and start a new batch."""
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            if self.started_at is None:
+                return None
+            top_products = sorted(self.products.items(), key=lambda item: item[1]["quantity"], reverse=True)
+            delta = {
+                "since": self.started_at.isoformat(),
+                "until": timezone.now().isoformat(),
+                # Decimals as strings, like the REST endpoints, and safe for any channel layer serializer
+                "revenue": str(self.revenue),
+                "order_count": self.sales,
+                "goods_sold": self.quantity,
+                "top_products": [
+                    {
+                        "product_id": product_id,
+                        "quantity": product["quantity"],
+                        "revenue": str(product["revenue"]),
+                    }
+                    for product_id, product in top_products[:TOP_PRODUCTS]
+                ],
+                "new_orders": self.orders,
+                "new_order_revenue": str(self.order_revenue),
+            }
+            self.reset()
+        # One name lookup per delta rather than one per sale, and outside the lock
+        names = dict(
+            Product.objects.filter(id__in=[product["product_id"] for product in delta["top_products"]])
+            .values_list("id", "name")
+        )
+        for product in delta["top_products"]:
+            product["name"] = names.get(product["product_id"], "")
+        return delta
+
+    def _flush_on_timer(self):
+        try:
+            self.flush()
+        finally:
+            # Every batch gets a new timer thread; don't leave its database connection open
+            connection.close()
+
+    def flush(self):
+        delta = self.take()
+        if delta is None:
+            return
+        channel_layer = get_channel_layer()
+        if channel_layer is not None:
+            async_to_sync(channel_layer.group_send)(DASHBOARD_GROUP, {"type": "analytics.delta", "delta": delta})
+
+
+batcher = DeltaBatcher()
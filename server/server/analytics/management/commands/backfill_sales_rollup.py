@@ -0,0 +1,31 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from analytics.distribution import rebuild_daily_sketches
+from analytics.rollups import rebuild_daily_rollups, rebuild_hourly_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily and hourly sales rollup and distribution sketch tables from raw sales'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=None,
+            help='Only rebuild the last N days (default: rebuild everything)',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        since = None
+        if options['days'] is not None:
+            since = timezone.localdate() - timedelta(days=options['days'])
+
+        written = rebuild_daily_rollups(since=since, batch_size=options['batch_size'])
+        hourly = rebuild_hourly_rollups(since=since, batch_size=options['batch_size'])
+        sketches = rebuild_daily_sketches(since=since, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully rebuilt {written} daily rollup rows, {hourly} hourly rollup rows '
+            f'and {sketches} daily sketches'
+        ))
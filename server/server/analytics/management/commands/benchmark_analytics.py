@@ -0,0 +1,160 @@
+import json
+from io import StringIO
+import platform
+import time
+import tracemalloc
+import django
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings, setup_databases, teardown_databases
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+from analytics.views import AnalyticsDashboard, CustomerDashboard, SegmentUsersView
+
+SEGMENTS = ["high_spenders", "moderate_spenders", "low_spenders", "active_users", "inactive_users", "at_risk_users"]
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the analytics endpoints against freshly seeded datasets of several sizes '
+        'and write a JSON report (runs in a throwaway database, never the configured one)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000],
+                            help='Number of sales to seed for each run')
+        parser.add_argument('--time-periods', type=int, nargs='+', default=[7, 30, 90, 365])
+        parser.add_argument('--repeat', type=int, default=10, help='Timed requests per endpoint and parameter')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--cached', action='store_true',
+                            help='Leave the dashboard cache enabled (default: clear it before every request)')
+        parser.add_argument('--output', default='analytics_benchmark.json')
+        parser.add_argument('--baseline', help='Earlier report to compare p50 latencies against')
+
+    def handle(self, *args, **options):
+        self.repeat = options['repeat']
+        self.cached = options['cached']
+        self.factory = APIRequestFactory()
+
+        results = []
+        for size in options['sizes']:
+            self.stdout.write(f'Seeding {size} sales...')
+            old_config = setup_databases(verbosity=0, interactive=False)
+            try:
+                call_command(
+                    'seed_analytics_data',
+                    users=max(100, size // 20),
+                    products=max(50, size // 1000),
+                    sales=size,
+                    activities=0,
+                    seed=options['seed'],
+                    stdout=StringIO(),
+                )
+                self.admin = User.objects.create_user('benchmark_admin', 'benchmark@example.com')
+                results.extend(self.run_size(size, options['time_periods']))
+            finally:
+                teardown_databases(old_config, verbosity=0)
+
+        report = {
+            "meta": {
+                "created_at": timezone.now().isoformat(),
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "database": connection.vendor,
+                "seed": options['seed'],
+                "repeat": self.repeat,
+                "cached": self.cached,
+            },
+            "results": results,
+        }
+        with open(options['output'], 'w') as output:
+            json.dump(report, output, indent=2, sort_keys=True)
+
+        if options['baseline']:
+            self.compare(results, options['baseline'])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {len(results)} benchmark results to {options['output']}"))
+
+    def cases(self, time_periods):
+        for time_period in time_periods:
+            yield "sales_dashboard", {"time_period": time_period}, AnalyticsDashboard.as_view(), "/analytics/sales/dashboard/", {}
+            yield "customer_dashboard", {"time_period": time_period}, CustomerDashboard.as_view(), "/analytics/customers/dashboard/", {}
+        for segment in SEGMENTS:
+            path = f"/analytics/customers/segment/{segment}/"
+            yield "segment_users", {"segment": segment}, SegmentUsersView.as_view(), path, {"segment_name": segment}
+            yield "segment_users_jsonl", {"segment": segment, "export": "jsonl"}, SegmentUsersView.as_view(), path, {"segment_name": segment}
+
+    def request(self, view, path, params, kwargs):
+        if not self.cached:
+            cache.clear()
+        query = {key: value for key, value in params.items() if key != "segment"}
+        request = self.factory.get(path, query)
+        force_authenticate(request, user=self.admin)
+        response = view(request, **kwargs)
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+        else:
+            response.render()
+        return response
+
+    def run_size(self, size, time_periods):
+        results = []
+        for endpoint, params, view, path, kwargs in self.cases(time_periods):
+            # Warm-up request, also used to count queries. It runs sequentially: parallel dashboard
+            # queries use worker-thread connections, which CaptureQueriesContext doesn't see
+            with override_settings(ANALYTICS_PARALLEL_QUERIES=False), CaptureQueriesContext(connection) as queries:
+                self.request(view, path, params, kwargs)
+
+            latencies = []
+            for _ in range(self.repeat):
+                start = time.perf_counter()
+                self.request(view, path, params, kwargs)
+                latencies.append((time.perf_counter() - start) * 1000)
+
+            # Memory is traced in a separate request because tracing slows everything down
+            tracemalloc.start()
+            self.request(view, path, params, kwargs)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+            result = {
+                "size": size,
+                "endpoint": endpoint,
+                "params": params,
+                "p50_ms": round(float(p50), 3),
+                "p90_ms": round(float(p90), 3),
+                "p99_ms": round(float(p99), 3),
+                "mean_ms": round(float(np.mean(latencies)), 3),
+                "queries": len(queries),
+                "peak_memory_kb": round(peak / 1024, 1),
+            }
+            results.append(result)
+            self.stdout.write(
+                f"{size:>9} {endpoint:<22} {json.dumps(params):<45} "
+                f"p50={result['p50_ms']:.1f}ms p99={result['p99_ms']:.1f}ms "
+                f"queries={result['queries']} peak={result['peak_memory_kb']:.0f}KB"
+            )
+        return results
+
+    def compare(self, results, baseline_path):
+        with open(baseline_path) as baseline_file:
+            baseline = {
+                (row["size"], row["endpoint"], json.dumps(row["params"], sort_keys=True)): row
+                for row in json.load(baseline_file)["results"]
+            }
+        self.stdout.write(f'Compared with {baseline_path}:')
+        for row in results:
+            previous = baseline.get((row["size"], row["endpoint"], json.dumps(row["params"], sort_keys=True)))
+            if previous is None or not previous["p50_ms"]:
+                continue
+            change = (row["p50_ms"] - previous["p50_ms"]) / previous["p50_ms"] * 100
+            self.stdout.write(
+                f"{row['size']:>9} {row['endpoint']:<22} {json.dumps(row['params']):<45} "
+                f"p50 {previous['p50_ms']:.1f}ms -> {row['p50_ms']:.1f}ms ({change:+.1f}%), "
+                f"queries {previous['queries']} -> {row['queries']}"
+            )
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from analytics.affinity import compute_product_affinity
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the "frequently bought together" product affinity table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', choices=['sales', 'orders'], default='sales',
+                            help='Build baskets from sales (per customer and window) or from order items')
+        parser.add_argument('--window-days', type=int, default=1,
+                            help='Sales by the same customer within this many days form one basket')
+        parser.add_argument('--top-k', type=int, default=10)
+        parser.add_argument('--min-co-purchases', type=int, default=2)
+
+    def handle(self, *args, **options):
+        written = compute_product_affinity(
+            source=options['source'],
+            window_days=options['window_days'],
+            top_k=options['top_k'],
+            min_co_purchases=options['min_co_purchases'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'Successfully wrote {written} product affinity rows'))
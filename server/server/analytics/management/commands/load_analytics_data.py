@@ -82,14 +82,16 @@ class Command(BaseCommand):
 
         # Create customer activity data
         actions = ["Purchase", "Signup", "Refund", "Login", "Product View"]
+        activities = []
         for _ in range(3000):  # Generate 3000 activity records
             user, _ = random.choice(users)
             action = random.choice(actions)
             timestamp = timezone.now() - timedelta(days=random.randint(0, 180))  # Use timezone-aware datetime
-            CustomerActivity.objects.create(
+            activities.append(CustomerActivity(
                 customer=user,
                 action=action,
                 timestamp=timestamp
-            )
+            ))
+        CustomerActivity.objects.bulk_create(activities, batch_size=1000)
 
         self.stdout.write(self.style.SUCCESS('Successfully loaded analytics data'))
\ No newline at end of file
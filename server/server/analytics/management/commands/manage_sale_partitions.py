@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from analytics.partitions import archive_sale_partitions, ensure_sale_partitions, is_partitioned
+
+
+class Command(BaseCommand):
+    help = 'Create upcoming monthly partitions of the sales table and optionally archive old ones (PostgreSQL)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, default=None,
+                            help='Create partitions up to this many months ahead (default: ANALYTICS_SALE_PARTITIONS_AHEAD)')
+        parser.add_argument('--archive-older-than', type=int, default=None, metavar='MONTHS',
+                            help='Detach partitions older than this many months into the analytics_archive schema. '
+                                 'Customer stats reconciliation and rollup rebuilds no longer see those sales.')
+
+    def handle(self, *args, **options):
+        if not is_partitioned():
+            self.stdout.write('The sales table is not partitioned on this database, nothing to do')
+            return
+
+        for name in ensure_sale_partitions(options['months_ahead']):
+            self.stdout.write(f'Created partition {name}')
+        if options['archive_older_than'] is not None:
+            for name in archive_sale_partitions(options['archive_older_than']):
+                self.stdout.write(f'Archived partition {name}')
+        self.stdout.write(self.style.SUCCESS('Successfully updated sales partitions'))
@@ -0,0 +1,192 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from auth_app.models import UserProfile
+from ecommerce.models import Category, Product
+from ecommerce.cache import invalidate_catalog
+from ecommerce.search import rebuild_search_index
+from analytics.models import Sale, CustomerActivity
+from analytics.cache import invalidate_dashboards
+from analytics.customer_stats import reconcile_customer_stats
+from analytics.distribution import rebuild_daily_sketches
+from analytics.inventory import refresh_all_velocities
+from analytics.rollups import rebuild_daily_rollups, rebuild_hourly_rollups
+
+ACTIONS = ["Product View", "Login", "Purchase", "Signup", "Refund"]
+ACTION_WEIGHTS = [0.6, 0.25, 0.1, 0.03, 0.02]
+CATEGORIES = ["Electronics", "Clothing", "Home", "Beauty", "Sports", "Books", "Toys", "Groceries"]
+# Relative sales volume per hour of day (quiet overnight, evening peak)
+HOURLY_WEIGHTS = np.array([
+    1, 1, 1, 1, 1, 2, 3, 5, 6, 7, 7, 8, 9, 8, 7, 7, 8, 9, 11, 12, 11, 8, 5, 2,
+], dtype=np.float64)
+
+
+class Command(BaseCommand):
+    help = 'Bulk-generate a large, reproducible analytics dataset for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--products', type=int, default=500)
+        parser.add_argument('--sales', type=int, default=1000000)
+        parser.add_argument('--activities', type=int, default=1000000)
+        parser.add_argument('--days', type=int, default=365, help='Spread the data over the last N days')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed, the same seed gives the same data')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--prefix', default='seed', help='Prefix for generated usernames and SKUs')
+
+    def handle(self, *args, **options):
+        # Sales and activities are drawn from the generated users and products, so both need at least one
+        for name in ('users', 'products', 'days', 'batch_size'):
+            if options[name] < 1:
+                raise CommandError(f"--{name.replace('_', '-')} must be at least 1")
+        for name in ('sales', 'activities'):
+            if options[name] < 0:
+                raise CommandError(f'--{name} must not be negative')
+
+        self.rng = np.random.default_rng(options['seed'])
+        self.batch_size = options['batch_size']
+        self.prefix = options['prefix']
+        # Anchor to the start of today so reruns on the same day produce identical rows
+        self.end = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        self.start = self.end - timedelta(days=options['days'])
+
+        user_ids, joined = self.create_users(options['users'])
+        product_ids, prices = self.create_products(options['products'])
+        self.create_sales(options['sales'], user_ids, joined, product_ids, prices)
+        self.create_activities(options['activities'], user_ids, joined)
+
+        # bulk_create skips the Product and Sale signals, so rebuild the derived tables in one pass
+        self.stdout.write('Rebuilding search index, daily and hourly rollups, sketches, customer stats and stock velocity...')
+        rebuild_search_index()
+        invalidate_catalog()
+        rebuild_daily_rollups(batch_size=self.batch_size)
+        rebuild_hourly_rollups(batch_size=self.batch_size)
+        rebuild_daily_sketches(batch_size=self.batch_size)
+        reconcile_customer_stats(batch_size=self.batch_size)
+        refresh_all_velocities(batch_size=self.batch_size)
+        invalidate_dashboards()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Successfully seeded {len(user_ids)} users, {len(product_ids)} products, "
+            f"{options['sales']} sales and {options['activities']} activities"
+        ))
+
+    def epoch_to_datetimes(self, seconds):
+        return [datetime.fromtimestamp(value, tz=dt_timezone.utc) for value in seconds.tolist()]
+
+    def timestamps_after(self, joined):
+        """Random timestamps between each joined time and the end, weighted towards recent days and busy hours."""
+        end = self.end.timestamp()
+        # Beta(2, 1) puts more activity closer to the present
+        seconds = joined + self.rng.beta(2, 1, size=joined.size) * (end - joined)
+        days = np.floor(seconds / 86400) * 86400
+        hours = self.rng.choice(24, size=joined.size, p=HOURLY_WEIGHTS / HOURLY_WEIGHTS.sum())
+        seconds = days + hours * 3600 + self.rng.integers(0, 3600, size=joined.size)
+        return np.clip(seconds, joined, end - 1)
+
+    def batches(self, total):
+        for offset in range(0, total, self.batch_size):
+            yield min(self.batch_size, total - offset)
+
+    def create_users(self, count):
+        self.stdout.write(f'Creating {count} users...')
+        start, end = self.start.timestamp(), self.end.timestamp()
+        # Signups grow over time: sqrt of a uniform sample skews towards recent dates
+        joined = start + np.sqrt(self.rng.random(count)) * (end - start)
+        first_id = User.objects.filter(username__startswith=f'{self.prefix}_user').count()
+
+        user_ids = []
+        for offset, size in enumerate(self.batches(count)):
+            base = offset * self.batch_size
+            dates = self.epoch_to_datetimes(joined[base:base + size])
+            users = [
+                User(
+                    username=f'{self.prefix}_user{first_id + base + i}',
+                    email=f'{self.prefix}_user{first_id + base + i}@example.com',
+                    password='!',  # Unusable password
+                    date_joined=dates[i],
+                )
+                for i in range(size)
+            ]
+            with transaction.atomic():
+                created = User.objects.bulk_create(users)
+                UserProfile.objects.bulk_create([UserProfile(user=user) for user in created])
+            user_ids.extend(user.id for user in created)
+        return np.array(user_ids, dtype=np.int64), joined
+
+    def create_products(self, count):
+        self.stdout.write(f'Creating {count} products...')
+        categories = [Category.objects.get_or_create(name=name)[0] for name in CATEGORIES]
+        # Log-normal prices: most items are cheap, a few are expensive
+        prices = np.round(np.clip(self.rng.lognormal(mean=3.5, sigma=0.9, size=count), 1, 5000), 2)
+        stock = self.rng.integers(0, 500, size=count)
+        category_index = self.rng.integers(0, len(categories), size=count)
+        first_id = Product.objects.filter(sku__startswith=f'{self.prefix}-SKU-').count()
+
+        product_ids = []
+        for offset, size in enumerate(self.batches(count)):
+            base = offset * self.batch_size
+            products = [
+                Product(
+                    name=f'{self.prefix.title()} Product {first_id + base + i}',
+                    description='Generated for analytics load testing',
+                    price=Decimal(str(prices[base + i])),
+                    stock=int(stock[base + i]),
+                    sku=f'{self.prefix}-SKU-{first_id + base + i}',
+                    category=categories[category_index[base + i]],
+                )
+                for i in range(size)
+            ]
+            product_ids.extend(product.id for product in Product.objects.bulk_create(products))
+        return np.array(product_ids, dtype=np.int64), prices
+
+    def create_sales(self, count, user_ids, joined, product_ids, prices):
+        self.stdout.write(f'Creating {count} sales...')
+        # Pareto-distributed customer activity and Zipf-like product popularity
+        customer_weights = self.rng.pareto(1.5, size=user_ids.size) + 1
+        customer_weights /= customer_weights.sum()
+        product_weights = 1 / np.arange(1, product_ids.size + 1) ** 1.1
+        product_weights /= product_weights.sum()
+        product_order = self.rng.permutation(product_ids.size)
+
+        created = 0
+        for size in self.batches(count):
+            customers = self.rng.choice(user_ids.size, size=size, p=customer_weights)
+            products = product_order[self.rng.choice(product_ids.size, size=size, p=product_weights)]
+            quantities = 1 + self.rng.poisson(0.8, size=size)
+            totals = np.round(prices[products] * quantities, 2)
+            timestamps = self.epoch_to_datetimes(self.timestamps_after(joined[customers]))
+            Sale.objects.bulk_create([
+                Sale(
+                    product_id=int(product_ids[products[i]]),
+                    customer_id=int(user_ids[customers[i]]),
+                    quantity=int(quantities[i]),
+                    total_price=Decimal(str(totals[i])),
+                    timestamp=timestamps[i],
+                )
+                for i in range(size)
+            ])
+            created += size
+            self.stdout.write(f'  {created}/{count} sales')
+
+    def create_activities(self, count, user_ids, joined):
+        self.stdout.write(f'Creating {count} activities...')
+        created = 0
+        for size in self.batches(count):
+            customers = self.rng.integers(0, user_ids.size, size=size)
+            actions = self.rng.choice(len(ACTIONS), size=size, p=ACTION_WEIGHTS)
+            timestamps = self.epoch_to_datetimes(self.timestamps_after(joined[customers]))
+            CustomerActivity.objects.bulk_create([
+                CustomerActivity(
+                    customer_id=int(user_ids[customers[i]]),
+                    action=ACTIONS[actions[i]],
+                    timestamp=timestamps[i],
+                )
+                for i in range(size)
+            ])
+            created += size
+            self.stdout.write(f'  {created}/{count} activities')
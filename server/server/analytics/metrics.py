@@ -0,0 +1,133 @@
+from datetime import timedelta
+from django.contrib.auth.models import User
+from django.db.models import Count, Exists, F, OuterRef, Q, Sum
+from django.utils.timezone import now
+from .models import CustomerStats, DailySalesRollup, Product, Sale
+from .parallel import run_queries
+from .rollups import sale_day
+
+# Spend tier boundaries shared by the dashboards and segmentation
+HIGH_SPEND_THRESHOLD = 1000
+MODERATE_SPEND_THRESHOLD = 500
+# Activity windows (in days) used for active / at-risk / churned customers
+ACTIVE_WINDOW_DAYS = 30
+CHURN_WINDOW_DAYS = 90
+
+
+def sales_dashboard_metrics(time_period):
+    """Compute every AnalyticsDashboard metric from the daily rollup and current stock."""
+    # Calculate the start date based on the time period
+    start_date = now() - timedelta(days=time_period)
+
+    # Sales Metrics (read from the daily rollup instead of scanning raw sales)
+    window = DailySalesRollup.objects.filter(day__gte=sale_day(start_date))
+    # The queries are independent of each other, so they may run concurrently
+    results = run_queries({
+        "totals": lambda: window.aggregate(
+            revenue=Sum('revenue'),
+            goods_sold=Sum('quantity'),
+            orders=Sum('order_count'),
+        ),
+        "top_selling_products": lambda: list(window.values('product__name').annotate(
+            total_sold=Sum('quantity')
+        ).order_by('-total_sold')[:10]),
+        "recent_sales": lambda: DailySalesRollup.objects.filter(
+            day__gte=sale_day(now() - timedelta(days=7))
+        ).aggregate(total=Sum('order_count'))['total'] or 0,
+        # Inventory Metrics
+        "low_stock_products": lambda: list(Product.objects.filter(stock__lte=10).values('name', 'stock')),
+        "total_inventory": lambda: Product.objects.aggregate(total=Sum('stock'))['total'] or 1,
+    })
+
+    totals = results['totals']
+    total_revenue = totals['revenue'] or 0
+    total_goods_sold = totals['goods_sold'] or 0
+    total_orders = totals['orders'] or 0
+    average_order_value = total_revenue / total_orders if total_orders > 0 else 0
+
+    # Units sold in the selected window per unit currently in stock
+    inventory_turnover_rate = total_goods_sold / results['total_inventory']
+
+    return {
+        "total_revenue": total_revenue,
+        "total_goods_sold": total_goods_sold,
+        "average_order_value": average_order_value,
+        "top_selling_products": results['top_selling_products'],
+        "recent_sales": results['recent_sales'],
+        "low_stock_products": results['low_stock_products'],
+        "inventory_turnover_rate": inventory_turnover_rate,
+    }
+
+
+def customer_dashboard_metrics(time_period):
+    """
+    Compute every CustomerDashboard metric.
+
+    All per-customer figures come from one pass over users joined to their
+    CustomerStats row, bucketed with conditional aggregation. Total revenue
+    (anonymous sales included), the top customers list and the activity timeline
+    are the only other queries, and the four may run concurrently.
+    """
+    current_time = now()
+    start_date = current_time - timedelta(days=time_period)
+    active_since = current_time - timedelta(days=ACTIVE_WINDOW_DAYS)
+    churn_before = current_time - timedelta(days=CHURN_WINDOW_DAYS)
+
+    results = run_queries({
+        "totals": lambda: User.objects.aggregate(
+            total_customers=Count('id'),
+            active_customers=Count('id', filter=Q(customer_stats__last_purchase_at__gte=start_date)),
+            new_customers=Count('id', filter=Q(date_joined__gte=start_date)),
+            repeat_customers=Count('id', filter=Q(customer_stats__order_count__gt=1)),
+            churned_customers=Count('id', filter=Q(customer_stats__first_purchase_at__lte=churn_before)),
+            high_spenders=Count('id', filter=Q(customer_stats__segment='high_spenders')),
+            moderate_spenders=Count('id', filter=Q(customer_stats__segment='moderate_spenders')),
+            low_spenders=Count('id', filter=Q(customer_stats__segment='low_spenders')),
+            active_users=Count('id', filter=Q(customer_stats__last_purchase_at__gte=active_since)),
+            # Any purchase between 90 and 30 days ago, whatever came after; an index probe per user
+            at_risk_users=Count('id', filter=Exists(Sale.objects.filter(
+                customer=OuterRef('pk'), timestamp__range=(churn_before, active_since)
+            ))),
+            # Average quantity over every (sale, sale of the same customer) pair
+            weighted_quantity=Sum(F('customer_stats__order_count') * F('customer_stats__total_quantity')),
+            weighted_purchases=Sum(F('customer_stats__order_count') * F('customer_stats__order_count')),
+        ),
+        "total_clv": lambda: DailySalesRollup.objects.aggregate(total=Sum('revenue'))['total'],
+        "top_clv_customers": lambda: list(CustomerStats.objects.order_by('-lifetime_spend').values(
+            username=F('user__username'), total_spent=F('lifetime_spend')
+        )[:10]),
+        "activity_timeline": lambda: [
+            {"timestamp__date": row['day'], "total_sales": row['total_sales']}
+            for row in DailySalesRollup.objects.filter(day__gte=sale_day(start_date))
+            .values('day').annotate(total_sales=Sum('order_count')).order_by('day')
+        ],
+    })
+
+    totals = results['totals']
+    total_customers = totals['total_customers']
+    retention_rate = (totals['repeat_customers'] / total_customers * 100) if total_customers > 0 else 0
+    churn_rate = (totals['churned_customers'] / total_customers * 100) if total_customers > 0 else 0
+    total_clv = results['total_clv'] or 0
+    average_clv = total_clv / total_customers if total_customers > 0 else 0
+    purchase_frequency = (
+        totals['weighted_quantity'] / totals['weighted_purchases'] if totals['weighted_purchases'] else 0
+    )
+
+    return {
+        "total_customers": total_customers,
+        "active_customers": totals['active_customers'],
+        "new_customers": totals['new_customers'],
+        "retention_rate": retention_rate,
+        "churn_rate": churn_rate,
+        "average_clv": average_clv,
+        "top_clv_customers": results['top_clv_customers'],
+        "high_spenders": totals['high_spenders'],
+        "moderate_spenders": totals['moderate_spenders'],
+        "low_spenders": totals['low_spenders'],
+        "active_users": totals['active_users'],
+        "inactive_users": total_customers - totals['active_users'],
+        "at_risk_users": totals['at_risk_users'],
+        "repeat_purchase_rate": retention_rate,
+        "purchase_frequency": purchase_frequency,
+        "activity_timeline": results['activity_timeline'],
+    }
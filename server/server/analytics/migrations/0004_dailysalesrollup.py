@@ -0,0 +1,46 @@
+# Generated by Django 5.1.5 on 2026-10-18 11:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_rollups(apps, schema_editor):
+    Sale = apps.get_model('analytics', 'Sale')
+    DailySalesRollup = apps.get_model('analytics', 'DailySalesRollup')
+    grouped = (
+        Sale.objects.annotate(day=TruncDate('timestamp'))
+        .values('day', 'product_id')
+        .annotate(quantity=Sum('quantity'), revenue=Sum('total_price'), order_count=Count('id'))
+        .order_by()
+    )
+    DailySalesRollup.objects.bulk_create(
+        (DailySalesRollup(**row) for row in grouped.iterator()), batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0003_alter_sale_product_delete_product'),
+        ('ecommerce', '0002_productimage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('quantity', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('order_count', models.PositiveIntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='ecommerce.product')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'product'), name='unique_daily_rollup_per_product')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
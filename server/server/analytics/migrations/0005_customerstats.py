@@ -0,0 +1,61 @@
+# Generated by Django 5.1.5 on 2026-10-18 11:35
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Sum
+
+
+def backfill_customer_stats(apps, schema_editor):
+    Sale = apps.get_model('analytics', 'Sale')
+    CustomerStats = apps.get_model('analytics', 'CustomerStats')
+    grouped = (
+        Sale.objects.filter(customer__isnull=False)
+        .values('customer_id')
+        .annotate(
+            lifetime_spend=Sum('total_price'),
+            order_count=Count('id'),
+            total_quantity=Sum('quantity'),
+            first_purchase_at=Min('timestamp'),
+            last_purchase_at=Max('timestamp'),
+        )
+        .order_by()
+    )
+    rows = []
+    for row in grouped.iterator():
+        spend = row['lifetime_spend']
+        if spend >= 1000:
+            segment = 'high_spenders'
+        elif spend >= 500:
+            segment = 'moderate_spenders'
+        else:
+            segment = 'low_spenders'
+        rows.append(CustomerStats(
+            user_id=row.pop('customer_id'), segment=segment, **row
+        ))
+    CustomerStats.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0004_dailysalesrollup'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='customer_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('lifetime_spend', models.DecimalField(db_index=True, decimal_places=2, default=0, max_digits=14)),
+                ('order_count', models.PositiveIntegerField(default=0)),
+                ('total_quantity', models.PositiveIntegerField(default=0)),
+                ('first_purchase_at', models.DateTimeField(blank=True, null=True)),
+                ('last_purchase_at', models.DateTimeField(blank=True, db_index=True, null=True)),
+                ('segment', models.CharField(blank=True, choices=[('high_spenders', 'High spenders'), ('moderate_spenders', 'Moderate spenders'), ('low_spenders', 'Low spenders')], db_index=True, max_length=20)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(backfill_customer_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.5 on 2026-10-18 11:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0005_customerstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customerstats',
+            name='frequency_score',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='customerstats',
+            name='monetary_score',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='customerstats',
+            name='recency_score',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='customerstats',
+            name='rfm_code',
+            field=models.CharField(blank=True, db_index=True, max_length=3),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.5 on 2026-10-18 11:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0006_customerstats_rfm_scores'),
+        ('ecommerce', '0003_productaffinity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductStockVelocity',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stock_velocity', serialize=False, to='ecommerce.product')),
+                ('units_sold_7d', models.PositiveIntegerField(default=0)),
+                ('units_sold_30d', models.PositiveIntegerField(default=0)),
+                ('units_sold_90d', models.PositiveIntegerField(default=0)),
+                ('units_restocked_30d', models.PositiveIntegerField(default=0)),
+                ('avg_daily_units', models.FloatField(default=0)),
+                ('days_of_cover', models.FloatField(blank=True, null=True)),
+                ('projected_stockout_date', models.DateField(blank=True, db_index=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.1.5 on 2026-10-18 11:52
+
+import math
+from collections import Counter
+from django.db import migrations, models
+from django.utils import timezone
+
+# Same bucketing as analytics.distribution at the time of this migration
+GAMMA = 1.01 / 0.99
+
+
+def backfill_sketches(apps, schema_editor):
+    Sale = apps.get_model('analytics', 'Sale')
+    DailySalesSketch = apps.get_model('analytics', 'DailySalesSketch')
+    days = {}
+    for timestamp, total_price, quantity in Sale.objects.values_list('timestamp', 'total_price', 'quantity').iterator():
+        values, sizes = days.setdefault(timezone.localtime(timestamp).date(), (Counter(), Counter()))
+        values[str(math.ceil(math.log(max(float(total_price), 0.01), GAMMA)))] += 1
+        sizes[str(quantity)] += 1
+    DailySalesSketch.objects.bulk_create(
+        [
+            DailySalesSketch(
+                day=day, order_values=dict(values), basket_sizes=dict(sizes), order_count=sum(sizes.values())
+            )
+            for day, (values, sizes) in days.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0008_exportcheckpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesSketch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True)),
+                ('order_values', models.JSONField(default=dict)),
+                ('basket_sizes', models.JSONField(default=dict)),
+                ('order_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(backfill_sketches, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.1.5 on 2026-10-18 11:55
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0009_dailysalessketch'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyActivitySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('action', models.CharField(max_length=255)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='customeractivity',
+            index=models.Index(fields=['customer', 'timestamp'], name='activity_customer_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customeractivity',
+            index=models.Index(fields=['action', 'timestamp'], name='activity_action_time_idx'),
+        ),
+        migrations.AddField(
+            model_name='dailyactivitysummary',
+            name='customer',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_activity', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='dailyactivitysummary',
+            index=models.Index(fields=['action', 'day'], name='activity_summary_action_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyactivitysummary',
+            constraint=models.UniqueConstraint(fields=('day', 'customer', 'action'), name='unique_daily_activity_summary'),
+        ),
+    ]
@@ -0,0 +1,137 @@
+# Generated by Django 5.1.5 on 2026-10-18 11:58
+
+from datetime import date
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+# Months of empty partitions created ahead of today; analytics.partitions keeps extending them
+MONTHS_AHEAD = 3
+
+# Both directions copy the whole sales table in the migration's single transaction, and the
+# opening RENAME holds an ACCESS EXCLUSIVE lock on analytics_sale until it commits: sales can be
+# neither read nor written meanwhile. Against PostgreSQL 16, 200k sales took about two seconds
+# each way, so plan a maintenance window in proportion to the table size. Covered by
+# analytics.tests.SalePartitionMigrationTests when the suite runs on PostgreSQL.
+
+
+def _month(day, offset=0):
+    index = day.year * 12 + day.month - 1 + offset
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _indexes_and_foreign_keys(schema_editor):
+    """
+    Index definitions (other than the primary key) and foreign keys of analytics_sale. The
+    definitions name analytics_sale, so they can be replayed as-is once the old table is dropped.
+    """
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT indexdef FROM pg_indexes WHERE tablename = 'analytics_sale' AND indexname != 'analytics_sale_pkey'"
+        )
+        index_definitions = [row[0] for row in cursor.fetchall()]
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = 'analytics_sale'::regclass AND contype = 'f'"
+        )
+        return index_definitions, cursor.fetchall()
+
+
+def partition_sales(apps, schema_editor):
+    """
+    Rebuild analytics_sale as a table range-partitioned by month on timestamp (PostgreSQL only).
+
+    Partitioned tables need the partition key in the primary key, so it becomes
+    (id, timestamp); ids still come from one sequence and stay unique. The
+    foreign keys and Django's field indexes are recreated under their old names.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    execute = schema_editor.execute
+    index_definitions, foreign_keys = _indexes_and_foreign_keys(schema_editor)
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('SELECT min("timestamp"), coalesce(max(id), 0) FROM analytics_sale')
+        first_sale, last_id = cursor.fetchone()
+
+    execute('ALTER TABLE analytics_sale RENAME TO analytics_sale_unpartitioned')
+    execute(
+        'CREATE TABLE analytics_sale (LIKE analytics_sale_unpartitioned INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+        'PARTITION BY RANGE ("timestamp")'
+    )
+    execute('CREATE SEQUENCE analytics_sale_partitioned_id_seq OWNED BY analytics_sale.id')
+    execute("SELECT setval('analytics_sale_partitioned_id_seq', %s + 1, false)", [last_id])
+    execute("ALTER TABLE analytics_sale ALTER COLUMN id SET DEFAULT nextval('analytics_sale_partitioned_id_seq')")
+    execute('ALTER TABLE analytics_sale ADD CONSTRAINT analytics_sale_pkey_partitioned PRIMARY KEY (id, "timestamp")')
+
+    # Rows outside every monthly partition (far past or future) land here instead of failing
+    execute('CREATE TABLE analytics_sale_default PARTITION OF analytics_sale DEFAULT')
+    today = timezone.localdate()
+    month = _month(timezone.localtime(first_sale).date() if first_sale else today)
+    while month <= _month(today, MONTHS_AHEAD):
+        execute(
+            f'CREATE TABLE analytics_sale_y{month.year:04d}m{month.month:02d} PARTITION OF analytics_sale '
+            'FOR VALUES FROM (%s) TO (%s)',
+            [month, _month(month, 1)],
+        )
+        month = _month(month, 1)
+
+    execute('INSERT INTO analytics_sale SELECT * FROM analytics_sale_unpartitioned')
+    execute('DROP TABLE analytics_sale_unpartitioned')
+    execute('ALTER TABLE analytics_sale RENAME CONSTRAINT analytics_sale_pkey_partitioned TO analytics_sale_pkey')
+    for definition in index_definitions:
+        execute(definition)
+    for name, definition in foreign_keys:
+        execute(f'ALTER TABLE analytics_sale ADD CONSTRAINT {name} {definition}')
+
+
+def unpartition_sales(apps, schema_editor):
+    """
+    Copy the attached partitions back into a plain analytics_sale table with an identity id.
+    Partitions archived into the analytics_archive schema are left there, not copied back.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    execute = schema_editor.execute
+    index_definitions, foreign_keys = _indexes_and_foreign_keys(schema_editor)
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('SELECT coalesce(max(id), 0) FROM analytics_sale')
+        last_id = cursor.fetchone()[0]
+
+    execute('ALTER TABLE analytics_sale RENAME TO analytics_sale_partitioned')
+    execute(
+        'CREATE TABLE analytics_sale (LIKE analytics_sale_partitioned INCLUDING CONSTRAINTS)'
+    )
+    execute(
+        'ALTER TABLE analytics_sale ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY '
+        f'(START WITH {int(last_id) + 1})'
+    )
+    execute('INSERT INTO analytics_sale SELECT * FROM analytics_sale_partitioned')
+    # Drops every attached partition and the partitioned table's sequence with it
+    execute('DROP TABLE analytics_sale_partitioned')
+    execute('ALTER TABLE analytics_sale ADD CONSTRAINT analytics_sale_pkey PRIMARY KEY (id)')
+    for definition in index_definitions:
+        execute(definition)
+    for name, definition in foreign_keys:
+        execute(f'ALTER TABLE analytics_sale ADD CONSTRAINT {name} {definition}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0010_activity_indexes_and_summary'),
+        ('ecommerce', '0003_productaffinity'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # Partition first so the new indexes are created on the partitioned table and every partition
+        migrations.RunPython(partition_sales, unpartition_sales),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['timestamp', 'product'], name='sale_time_product_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['customer', 'timestamp'], name='sale_customer_time_idx'),
+        ),
+    ]
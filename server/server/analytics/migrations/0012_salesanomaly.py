@@ -0,0 +1,37 @@
+# Generated by Django 5.1.5 on 2026-10-18 12:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0011_partition_sales'),
+        ('ecommerce', '0003_productaffinity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesAnomaly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('series', models.CharField(max_length=64)),
+                ('scope', models.CharField(choices=[('total', 'All sales'), ('category', 'Category'), ('product', 'Product')], max_length=10)),
+                ('label', models.CharField(max_length=255)),
+                ('granularity', models.CharField(choices=[('day', 'Day'), ('hour', 'Hour')], max_length=4)),
+                ('metric', models.CharField(choices=[('revenue', 'Revenue'), ('orders', 'Orders')], max_length=10)),
+                ('bucket_start', models.DateTimeField(db_index=True)),
+                ('value', models.FloatField()),
+                ('expected', models.FloatField()),
+                ('z_score', models.FloatField()),
+                ('direction', models.CharField(choices=[('spike', 'Spike'), ('drop', 'Drop')], max_length=5)),
+                ('detected_at', models.DateTimeField(auto_now=True)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='sales_anomalies', to='ecommerce.category')),
+                ('product', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='sales_anomalies', to='ecommerce.product')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('series', 'metric', 'granularity', 'bucket_start'), name='unique_sales_anomaly')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.5 on 2026-10-18 12:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0012_salesanomaly'),
+        ('ecommerce', '0003_productaffinity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DemandForecast',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='demand_forecast', serialize=False, to='ecommerce.product')),
+                ('level', models.FloatField(default=0)),
+                ('trend', models.FloatField(default=0)),
+                ('forecast_daily_units', models.FloatField(default=0)),
+                ('mean_absolute_error', models.FloatField(default=0)),
+                ('stock_at_forecast', models.IntegerField(default=0)),
+                ('days_until_stockout', models.FloatField(blank=True, null=True)),
+                ('projected_stockout_date', models.DateField(blank=True, db_index=True, null=True)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.5 on 2026-10-18 12:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0013_demandforecast'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exportcheckpoint',
+            name='recent_ids',
+            field=models.JSONField(default=list),
+        ),
+    ]
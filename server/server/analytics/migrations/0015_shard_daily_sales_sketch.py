@@ -0,0 +1,81 @@
+# Generated by Django 5.1.5 on 2026-10-18 12:22
+
+import math
+from collections import Counter
+from django.db import migrations, models
+from django.utils import timezone
+
+# Same bucketing and shard count as analytics.distribution at the time of this migration
+GAMMA = 1.01 / 0.99
+SKETCH_SHARDS = 16
+
+
+def shard_sketches(apps, schema_editor):
+    # Existing rows hold whole days in shard 0; rebuild them split by sale id
+    Sale = apps.get_model('analytics', 'Sale')
+    DailySalesSketch = apps.get_model('analytics', 'DailySalesSketch')
+    shards = {}
+    for sale_id, timestamp, total_price, quantity in Sale.objects.values_list(
+        'id', 'timestamp', 'total_price', 'quantity'
+    ).iterator():
+        key = (timezone.localtime(timestamp).date(), sale_id % SKETCH_SHARDS)
+        values, sizes = shards.setdefault(key, (Counter(), Counter()))
+        values[str(math.ceil(math.log(max(float(total_price), 0.01), GAMMA)))] += 1
+        sizes[str(quantity)] += 1
+    DailySalesSketch.objects.all().delete()
+    DailySalesSketch.objects.bulk_create(
+        [
+            DailySalesSketch(
+                day=day, shard=shard, order_values=dict(values), basket_sizes=dict(sizes),
+                order_count=sum(sizes.values()),
+            )
+            for (day, shard), (values, sizes) in shards.items()
+        ],
+        batch_size=1000,
+    )
+
+
+def merge_sketches(apps, schema_editor):
+    # Back to one row per day before the unique day constraint returns
+    DailySalesSketch = apps.get_model('analytics', 'DailySalesSketch')
+    days = {}
+    for sketch in DailySalesSketch.objects.iterator():
+        values, sizes = days.setdefault(sketch.day, (Counter(), Counter()))
+        values.update(sketch.order_values)
+        sizes.update(sketch.basket_sizes)
+    DailySalesSketch.objects.all().delete()
+    DailySalesSketch.objects.bulk_create(
+        [
+            DailySalesSketch(
+                day=day, shard=0, order_values=dict(values), basket_sizes=dict(sizes),
+                order_count=sum(sizes.values()),
+            )
+            for day, (values, sizes) in days.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0014_exportcheckpoint_recent_ids'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailysalessketch',
+            name='shard',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='dailysalessketch',
+            name='day',
+            field=models.DateField(db_index=True),
+        ),
+        migrations.AddConstraint(
+            model_name='dailysalessketch',
+            constraint=models.UniqueConstraint(fields=('day', 'shard'), name='unique_sketch_day_shard'),
+        ),
+        migrations.RunPython(shard_sketches, merge_sketches),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.1.5 on 2026-10-18 12:27
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import Mod, TruncHour
+
+# Same shard count as analytics.rollups at the time of this migration
+HOURLY_SHARDS = 16
+
+
+def backfill_hourly_rollups(apps, schema_editor):
+    Sale = apps.get_model('analytics', 'Sale')
+    HourlySalesRollup = apps.get_model('analytics', 'HourlySalesRollup')
+    grouped = (
+        Sale.objects.annotate(hour=TruncHour('timestamp'), shard=Mod('id', HOURLY_SHARDS))
+        .values('hour', 'shard')
+        .annotate(quantity=Sum('quantity'), revenue=Sum('total_price'), order_count=Count('id'))
+        .order_by()
+    )
+    HourlySalesRollup.objects.bulk_create((HourlySalesRollup(**row) for row in grouped.iterator()), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0015_shard_daily_sales_sketch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HourlySalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('shard', models.PositiveSmallIntegerField(default=0)),
+                ('quantity', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('order_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('hour', 'shard'), name='unique_hourly_rollup_shard')],
+            },
+        ),
+        migrations.RunPython(backfill_hourly_rollups, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils.timezone import now
-from ecommerce.models import Product
+from ecommerce.models import Category, Product
 
 class Sale(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='sales')
@@ -10,6 +10,13 @@ class Sale(models.Model):
     customer = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='sales') 
     timestamp = models.DateTimeField(default=now)
 
+    class Meta:
+        # On PostgreSQL the table is also range-partitioned by month on timestamp (migration 0011)
+        indexes = [
+            models.Index(fields=['timestamp', 'product'], name='sale_time_product_idx'),
+            models.Index(fields=['customer', 'timestamp'], name='sale_customer_time_idx'),
+        ]
+
     def __str__(self):
         return f"Sale of {self.product.name} ({self.quantity})"
 
@@ -24,5 +31,181 @@ class CustomerActivity(models.Model):
     action = models.CharField(max_length=255)  # e.g., "Purchase", "Signup", "Refund"
     timestamp = models.DateTimeField(default=now)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['customer', 'timestamp'], name='activity_customer_time_idx'),
+            models.Index(fields=['action', 'timestamp'], name='activity_action_time_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.customer.username} - {self.action}"
+
+class DailyActivitySummary(models.Model):
+    """Per-day event counts that raw CustomerActivity rows are downsampled into after the retention window."""
+    day = models.DateField()
+    customer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_activity')
+    action = models.CharField(max_length=255)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'customer', 'action'], name='unique_daily_activity_summary'),
+        ]
+        indexes = [models.Index(fields=['action', 'day'], name='activity_summary_action_idx')]
+
+    def __str__(self):
+        return f"{self.day} - {self.customer_id} {self.action} ({self.count})"
+
+class DailySalesRollup(models.Model):
+    """Per-day, per-product sales totals maintained from Sale writes."""
+    day = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='daily_rollups')
+    quantity = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    order_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'product'], name='unique_daily_rollup_per_product'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} - {self.product_id} ({self.quantity})"
+
+class HourlySalesRollup(models.Model):
+    """
+    Per-hour sales totals across all products, maintained from Sale writes. `hour` is
+    the start of the local hour; each hour is spread over shards (by sale id) so
+    concurrent sales don't wait on one row lock. Readers add the shards up.
+    """
+    hour = models.DateTimeField()
+    shard = models.PositiveSmallIntegerField(default=0)
+    quantity = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    order_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['hour', 'shard'], name='unique_hourly_rollup_shard'),
+        ]
+
+    def __str__(self):
+        return f"{self.hour} #{self.shard} ({self.order_count} orders)"
+
+class DailySalesSketch(models.Model):
+    """
+    Per-day mergeable distribution sketches of order value and basket size.
+    order_values maps log-bucket index -> count, basket_sizes maps quantity -> count.
+    Each day is spread over shards (by sale id) so concurrent sales don't wait on one row lock.
+    """
+    day = models.DateField(db_index=True)
+    shard = models.PositiveSmallIntegerField(default=0)
+    order_values = models.JSONField(default=dict)
+    basket_sizes = models.JSONField(default=dict)
+    order_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'shard'], name='unique_sketch_day_shard'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} #{self.shard} ({self.order_count} orders)"
+
+class CustomerStats(models.Model):
+    """Lifetime purchase totals per customer, maintained from Sale writes."""
+    SEGMENT_CHOICES = [
+        ('high_spenders', 'High spenders'),
+        ('moderate_spenders', 'Moderate spenders'),
+        ('low_spenders', 'Low spenders'),
+    ]
+
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='customer_stats')
+    lifetime_spend = models.DecimalField(max_digits=14, decimal_places=2, default=0, db_index=True)
+    order_count = models.PositiveIntegerField(default=0)
+    total_quantity = models.PositiveIntegerField(default=0)
+    first_purchase_at = models.DateTimeField(null=True, blank=True)
+    last_purchase_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    segment = models.CharField(max_length=20, choices=SEGMENT_CHOICES, blank=True, db_index=True)
+    # Recency / frequency / monetary quintile scores (1-5), refreshed by the RFM scoring job
+    recency_score = models.PositiveSmallIntegerField(null=True, blank=True)
+    frequency_score = models.PositiveSmallIntegerField(null=True, blank=True)
+    monetary_score = models.PositiveSmallIntegerField(null=True, blank=True)
+    rfm_code = models.CharField(max_length=3, blank=True, db_index=True)  # e.g. "545"
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user_id} - {self.segment or 'no purchases'}"
+
+class ProductStockVelocity(models.Model):
+    """Rolling sales velocity and stock cover per product, maintained from Sale and InventoryHistory writes."""
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='stock_velocity')
+    units_sold_7d = models.PositiveIntegerField(default=0)
+    units_sold_30d = models.PositiveIntegerField(default=0)
+    units_sold_90d = models.PositiveIntegerField(default=0)
+    units_restocked_30d = models.PositiveIntegerField(default=0)
+    avg_daily_units = models.FloatField(default=0)  # Over the last 30 days
+    days_of_cover = models.FloatField(null=True, blank=True)  # None when nothing sold in 30 days
+    projected_stockout_date = models.DateField(null=True, blank=True, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.product_id} - {self.days_of_cover} days of cover"
+
+class DemandForecast(models.Model):
+    """Nightly damped-trend exponential smoothing forecast of daily unit demand per product."""
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='demand_forecast')
+    level = models.FloatField(default=0)  # Smoothed daily units at the end of the history
+    trend = models.FloatField(default=0)  # Smoothed change in daily units per day
+    forecast_daily_units = models.FloatField(default=0)  # Average forecast daily demand over the horizon
+    mean_absolute_error = models.FloatField(default=0)  # Of the one-day-ahead forecasts over the history
+    stock_at_forecast = models.IntegerField(default=0)
+    days_until_stockout = models.FloatField(null=True, blank=True)  # None when stock outlasts the horizon
+    projected_stockout_date = models.DateField(null=True, blank=True, db_index=True)
+    computed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.product_id} - stock-out {self.projected_stockout_date}"
+
+class ExportCheckpoint(models.Model):
+    """High-water mark of the last columnar export of a dataset, used for incremental exports."""
+    dataset = models.CharField(max_length=50, unique=True)
+    last_exported_at = models.DateTimeField()
+    rows_exported = models.PositiveBigIntegerField(default=0)  # Rows written by the last run
+    # Ids of exported rows inside the overlap window before last_exported_at, skipped when the next run re-reads it
+    recent_ids = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.dataset} exported up to {self.last_exported_at}"
+
+class SalesAnomaly(models.Model):
+    """A day or hour whose sales deviated sharply from the rolling baseline of its series."""
+    SCOPE_CHOICES = [('total', 'All sales'), ('category', 'Category'), ('product', 'Product')]
+    GRANULARITY_CHOICES = [('day', 'Day'), ('hour', 'Hour')]
+    METRIC_CHOICES = [('revenue', 'Revenue'), ('orders', 'Orders')]
+    DIRECTION_CHOICES = [('spike', 'Spike'), ('drop', 'Drop')]
+
+    series = models.CharField(max_length=64)  # "total", "category:<id>" or "product:<id>"
+    scope = models.CharField(max_length=10, choices=SCOPE_CHOICES)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, null=True, blank=True, related_name='sales_anomalies')
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, null=True, blank=True, related_name='sales_anomalies')
+    label = models.CharField(max_length=255)
+    granularity = models.CharField(max_length=4, choices=GRANULARITY_CHOICES)
+    metric = models.CharField(max_length=10, choices=METRIC_CHOICES)
+    bucket_start = models.DateTimeField(db_index=True)
+    value = models.FloatField()
+    expected = models.FloatField()
+    z_score = models.FloatField()
+    direction = models.CharField(max_length=5, choices=DIRECTION_CHOICES)
+    detected_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['series', 'metric', 'granularity', 'bucket_start'], name='unique_sales_anomaly'
+            ),
+        ]
+
     def __str__(self):
-        return f"{self.customer.username} - {self.action}"
\ No newline at end of file
+        return f"{self.label} {self.metric} {self.direction} at {self.bucket_start}"
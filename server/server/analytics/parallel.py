@@ -0,0 +1,56 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+from django.conf import settings
+from django.db import close_old_connections, connection
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, "ANALYTICS_QUERY_WORKERS", 4),
+                thread_name_prefix="analytics-query",
+            )
+        return _executor
+
+
+def parallel_enabled():
+    """
+    Queries only run concurrently on a database that can serve them in parallel.
+
+    Each worker thread uses its own connection, so work inside an open
+    transaction (including TestCase) would not see uncommitted rows, and SQLite
+    serialises readers on a single file anyway.
+    """
+    return (
+        getattr(settings, "ANALYTICS_PARALLEL_QUERIES", True)
+        and connection.vendor != "sqlite"
+        and not connection.in_atomic_block
+    )
+
+
+def _run(query):
+    # Worker threads outlive requests, so manage their connections like a request would
+    close_old_connections()
+    try:
+        return query()
+    finally:
+        close_old_connections()
+
+
+def run_queries(queries):
+    """
+    Run a dict of independent `name -> callable` queries and return `name -> result`.
+
+    The callables run concurrently in a bounded thread pool when possible, so
+    the total latency approaches the slowest query instead of the sum of all.
+    """
+    if not parallel_enabled() or len(queries) < 2:
+        return {name: query() for name, query in queries.items()}
+    executor = _get_executor()
+    futures = {name: executor.submit(_run, query) for name, query in queries.items()}
+    return {name: future.result() for name, future in futures.items()}
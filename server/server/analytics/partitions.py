@@ -0,0 +1,116 @@
+import re
+from datetime import date
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+# Sales are range-partitioned by month on PostgreSQL (see migration 0011); other databases use a plain table
+SALE_TABLE = "analytics_sale"
+DEFAULT_PARTITION = f"{SALE_TABLE}_default"
+ARCHIVE_SCHEMA = "analytics_archive"
+PARTITION_NAME = re.compile(rf"^{SALE_TABLE}_y(\d{{4}})m(\d{{2}})$")
+
+
+def month_start(day, offset=0):
+    """First day of the month `offset` months after the month containing `day`."""
+    index = day.year * 12 + day.month - 1 + offset
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"{SALE_TABLE}_y{month.year:04d}m{month.month:02d}"
+
+
+def is_partitioned():
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)", [SALE_TABLE]
+        )
+        return cursor.fetchone() is not None
+
+
+def sale_partitions():
+    """Return the attached monthly partitions as {month: table name}."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = to_regclass(%s)",
+            [SALE_TABLE],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    partitions = {}
+    for name in names:
+        match = PARTITION_NAME.match(name)
+        if match:
+            partitions[date(int(match.group(1)), int(match.group(2)), 1)] = name
+    return partitions
+
+
+def create_partition(month):
+    """
+    Create and attach the partition for `month`.
+
+    Rows that already landed in the default partition for that month are moved
+    into the new partition first, otherwise attaching it would fail.
+    """
+    name = partition_name(month)
+    lower, upper = month_start(month), month_start(month, 1)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE TABLE "{name}" (LIKE "{SALE_TABLE}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'
+        )
+        cursor.execute(
+            f'WITH moved AS (DELETE FROM "{DEFAULT_PARTITION}" WHERE "timestamp" >= %s AND "timestamp" < %s '
+            f'RETURNING *) INSERT INTO "{name}" SELECT * FROM moved',
+            [lower, upper],
+        )
+        cursor.execute(
+            f'ALTER TABLE "{SALE_TABLE}" ATTACH PARTITION "{name}" FOR VALUES FROM (%s) TO (%s)',
+            [lower, upper],
+        )
+    return name
+
+
+def ensure_sale_partitions(months_ahead=None):
+    """Create any missing partitions from the current month to `months_ahead` months ahead. Returns their names."""
+    if not is_partitioned():
+        return []
+    if months_ahead is None:
+        months_ahead = getattr(settings, "ANALYTICS_SALE_PARTITIONS_AHEAD", 3)
+    existing = sale_partitions()
+    today = timezone.localdate()
+    created = []
+    for offset in range(months_ahead + 1):
+        month = month_start(today, offset)
+        if month not in existing:
+            created.append(create_partition(month))
+    return created
+
+
+def archive_sale_partitions(retention_months):
+    """
+    Detach partitions that ended more than `retention_months` months ago and move
+    them into the analytics_archive schema, out of every query on the sales table.
+    Returns the archived table names.
+
+    The rollups and sketches keep the aggregated history, but anything that
+    recomputes from raw sales (reconcile_customer_stats, rebuild_daily_rollups,
+    rebuild_hourly_rollups) only sees the retained months afterwards.
+    """
+    if not is_partitioned():
+        return []
+    cutoff = month_start(timezone.localdate(), -retention_months)
+    archived = []
+    with connection.cursor() as cursor:
+        cursor.execute(f'CREATE SCHEMA IF NOT EXISTS "{ARCHIVE_SCHEMA}"')
+        for month, name in sorted(sale_partitions().items()):
+            if month_start(month, 1) > cutoff:
+                continue
+            with transaction.atomic():
+                cursor.execute(f'ALTER TABLE "{SALE_TABLE}" DETACH PARTITION "{name}"')
+                cursor.execute(f'ALTER TABLE "{name}" SET SCHEMA "{ARCHIVE_SCHEMA}"')
+            archived.append(f"{ARCHIVE_SCHEMA}.{name}")
+    return archived
@@ -0,0 +1,53 @@
+import numpy as np
+from django.db import transaction
+from .models import CustomerStats
+
+RFM_QUANTILES = 5
+RFM_FIELDS = ['recency_score', 'frequency_score', 'monetary_score', 'rfm_code']
+
+
+def quantile_scores(values, quantiles=RFM_QUANTILES):
+    """
+    Score every value from 1 to `quantiles` by its rank, higher values scoring higher.
+    Tied values share the score of their lowest rank.
+    """
+    values = np.asarray(values)
+    if values.size == 0:
+        return np.empty(0, dtype=np.int64)
+    ranks = np.searchsorted(np.sort(values), values, side='left')
+    return 1 + ranks * quantiles // values.size
+
+
+def score_customers(batch_size=2000):
+    """
+    Compute RFM quintile scores for every purchasing customer and store them on CustomerStats.
+    Returns the number of customers scored.
+    """
+    rows = list(
+        CustomerStats.objects.filter(order_count__gt=0)
+        .values_list('user_id', 'last_purchase_at', 'order_count', 'lifetime_spend')
+        .iterator(chunk_size=batch_size)
+    )
+    if rows:
+        user_ids, last_purchases, order_counts, spends = zip(*rows)
+    else:
+        user_ids, last_purchases, order_counts, spends = (), (), (), ()
+
+    recency = quantile_scores(np.fromiter((ts.timestamp() for ts in last_purchases), dtype=np.float64, count=len(rows)))
+    frequency = quantile_scores(np.asarray(order_counts, dtype=np.int64))
+    monetary = quantile_scores(np.asarray(spends, dtype=np.float64))
+    codes = np.char.add(np.char.add(recency.astype(str), frequency.astype(str)), monetary.astype(str))
+
+    scored = [
+        CustomerStats(
+            user_id=user_id, recency_score=int(r), frequency_score=int(f), monetary_score=int(m), rfm_code=str(code)
+        )
+        for user_id, r, f, m, code in zip(user_ids, recency, frequency, monetary, codes)
+    ]
+    with transaction.atomic():
+        CustomerStats.objects.bulk_update(scored, RFM_FIELDS, batch_size=batch_size)
+        # Customers whose sales were all removed drop out of every RFM segment
+        CustomerStats.objects.filter(order_count=0).exclude(rfm_code='').update(
+            recency_score=None, frequency_score=None, monetary_score=None, rfm_code=''
+        )
+    return len(scored)
@@ -0,0 +1,134 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Mod, TruncDate, TruncHour
+from django.utils import timezone
+from .models import DailySalesRollup, HourlySalesRollup, Sale
+
+# Hourly rollup rows per hour; a sale always lands in shard `sale id % HOURLY_SHARDS`
+HOURLY_SHARDS = 16
+
+
+def sale_day(timestamp):
+    """Return the local calendar day a sale timestamp falls on."""
+    return timezone.localtime(timestamp).date()
+
+
+def sale_hour(timestamp):
+    """Return the start of the local hour a sale timestamp falls in."""
+    return timezone.localtime(timestamp).replace(minute=0, second=0, microsecond=0)
+
+
+def apply_sale_to_rollup(product_id, timestamp, quantity, revenue, sign=1):
+    """
+    Add (sign=1) or remove (sign=-1) a single sale from its day/product rollup row.
+    """
+    day = sale_day(timestamp)
+    changes = {
+        "quantity": F("quantity") + sign * quantity,
+        "revenue": F("revenue") + sign * revenue,
+        "order_count": F("order_count") + sign,
+    }
+    with transaction.atomic():
+        updated = DailySalesRollup.objects.filter(day=day, product_id=product_id).update(**changes)
+        if updated or sign < 0:
+            return
+        try:
+            # Savepoint so a concurrent insert of the same row doesn't break the outer transaction
+            with transaction.atomic():
+                DailySalesRollup.objects.create(
+                    day=day, product_id=product_id, quantity=quantity, revenue=revenue, order_count=1
+                )
+        except IntegrityError:
+            DailySalesRollup.objects.filter(day=day, product_id=product_id).update(**changes)
+
+
+def rebuild_daily_rollups(since=None, batch_size=1000):
+    """
+    Recompute rollup rows from the raw Sale table.
+    If `since` (a date) is given only days on or after it are rebuilt.
+    Returns the number of rollup rows written.
+    """
+    sales = Sale.objects.all()
+    rollups = DailySalesRollup.objects.all()
+    if since is not None:
+        sales = sales.filter(timestamp__date__gte=since)
+        rollups = rollups.filter(day__gte=since)
+
+    grouped = (
+        sales.annotate(day=TruncDate("timestamp"))
+        .values("day", "product_id")
+        .annotate(quantity=Sum("quantity"), revenue=Sum("total_price"), order_count=Count("id"))
+        .order_by()
+    )
+
+    written = 0
+    with transaction.atomic():
+        rollups.delete()
+        batch = []
+        for row in grouped.iterator(chunk_size=batch_size):
+            batch.append(DailySalesRollup(**row))
+            if len(batch) >= batch_size:
+                DailySalesRollup.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+        if batch:
+            DailySalesRollup.objects.bulk_create(batch)
+            written += len(batch)
+    return written
+
+
+def apply_sale_to_hourly_rollup(sale_id, timestamp, quantity, revenue, sign=1):
+    """Add (sign=1) or remove (sign=-1) a single sale from its hour's rollup shard."""
+    hour, shard = sale_hour(timestamp), sale_id % HOURLY_SHARDS
+    changes = {
+        "quantity": F("quantity") + sign * quantity,
+        "revenue": F("revenue") + sign * revenue,
+        "order_count": F("order_count") + sign,
+    }
+    with transaction.atomic():
+        updated = HourlySalesRollup.objects.filter(hour=hour, shard=shard).update(**changes)
+        if updated or sign < 0:
+            return
+        try:
+            # Savepoint so a concurrent insert of the same row doesn't break the outer transaction
+            with transaction.atomic():
+                HourlySalesRollup.objects.create(
+                    hour=hour, shard=shard, quantity=quantity, revenue=revenue, order_count=1
+                )
+        except IntegrityError:
+            HourlySalesRollup.objects.filter(hour=hour, shard=shard).update(**changes)
+
+
+def rebuild_hourly_rollups(since=None, batch_size=1000):
+    """
+    Recompute hourly rollup rows from the raw Sale table.
+    If `since` (a date) is given only hours on or after its start are rebuilt.
+    Returns the number of rollup rows written.
+    """
+    sales = Sale.objects.all()
+    rollups = HourlySalesRollup.objects.all()
+    if since is not None:
+        sales = sales.filter(timestamp__date__gte=since)
+        rollups = rollups.filter(hour__date__gte=since)
+
+    grouped = (
+        sales.annotate(hour=TruncHour("timestamp"), shard=Mod("id", HOURLY_SHARDS))
+        .values("hour", "shard")
+        .annotate(quantity=Sum("quantity"), revenue=Sum("total_price"), order_count=Count("id"))
+        .order_by()
+    )
+
+    written = 0
+    with transaction.atomic():
+        rollups.delete()
+        batch = []
+        for row in grouped.iterator(chunk_size=batch_size):
+            batch.append(HourlySalesRollup(**row))
+            if len(batch) >= batch_size:
+                HourlySalesRollup.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+        if batch:
+            HourlySalesRollup.objects.bulk_create(batch)
+            written += len(batch)
+    return written
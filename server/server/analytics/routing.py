@@ -0,0 +1,6 @@
+from django.urls import re_path
+from .consumers import AnalyticsDashboardConsumer
+
+websocket_urlpatterns = [
+    re_path(r'ws/analytics/dashboard/$', AnalyticsDashboardConsumer.as_asgi()),
+]
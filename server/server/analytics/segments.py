@@ -0,0 +1,62 @@
+import re
+from datetime import timedelta
+from django.contrib.auth.models import User
+from django.utils.timezone import now
+from .metrics import ACTIVE_WINDOW_DAYS, CHURN_WINDOW_DAYS
+
+SPEND_SEGMENTS = ('high_spenders', 'moderate_spenders', 'low_spenders')
+ACTIVITY_SEGMENTS = ('active_users', 'inactive_users', 'at_risk_users')
+# rfm:<recency><frequency><monetary>, each a score 1-5 or * for any score, e.g. rfm:5*5
+RFM_SEGMENT = re.compile(r'^rfm:([1-5*])([1-5*])([1-5*])$')
+# Rows fetched per keyset query when streaming or paging a segment
+SEGMENT_CHUNK_SIZE = 2000
+
+
+def segment_users(segment_name):
+    """
+    Return a User queryset for a named segment, or None if the name is unknown.
+    Every lookup is an indexed filter on CustomerStats.
+    """
+    current_time = now()
+    active_since = current_time - timedelta(days=ACTIVE_WINDOW_DAYS)
+
+    if segment_name in SPEND_SEGMENTS:
+        return User.objects.filter(customer_stats__segment=segment_name)
+    if segment_name == "active_users":
+        return User.objects.filter(customer_stats__last_purchase_at__gte=active_since)
+    if segment_name == "inactive_users":
+        return User.objects.exclude(customer_stats__last_purchase_at__gte=active_since)
+    if segment_name == "at_risk_users":
+        # Last purchase was between the churn and active windows
+        return User.objects.filter(customer_stats__last_purchase_at__range=(
+            current_time - timedelta(days=CHURN_WINDOW_DAYS), active_since
+        ))
+
+    match = RFM_SEGMENT.match(segment_name)
+    if match:
+        code = ''.join(match.groups())
+        if '*' not in code:
+            return User.objects.filter(customer_stats__rfm_code=code)
+        scores = zip(('recency_score', 'frequency_score', 'monetary_score'), match.groups())
+        return User.objects.filter(customer_stats__recency_score__isnull=False, **{
+            f'customer_stats__{field}': int(score) for field, score in scores if score != '*'
+        })
+    return None
+
+
+def segment_page(users, cursor=0, limit=SEGMENT_CHUNK_SIZE):
+    """
+    Return one keyset page of {"id", "email"} rows with ids greater than `cursor`,
+    plus the cursor for the next page (None on the last page).
+    """
+    rows = list(users.filter(id__gt=cursor).order_by('id').values('id', 'email')[:limit + 1])
+    next_cursor = rows[limit - 1]['id'] if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def iter_segment_rows(users, chunk_size=SEGMENT_CHUNK_SIZE):
+    """Yield every {"id", "email"} row of a segment, fetching one keyset chunk at a time."""
+    cursor = 0
+    while cursor is not None:
+        rows, cursor = segment_page(users, cursor, chunk_size)
+        yield from rows
@@ -22,4 +22,9 @@ class CustomerActivitySerializer(serializers.ModelSerializer):
 
     class Meta:
         model = CustomerActivity
-        fields = ['id', 'customer', 'action', 'timestamp']
\ No newline at end of file
+        fields = ['id', 'customer', 'action', 'timestamp']
+
+class ActivityEventSerializer(serializers.Serializer):
+    """One storefront event; the customer is always the authenticated user."""
+    action = serializers.CharField(max_length=255)
+    timestamp = serializers.DateTimeField(required=False)
@@ -0,0 +1,46 @@
+from datetime import timedelta
+import numpy as np
+from django.utils import timezone
+from ecommerce.models import Product
+from .models import DailySalesRollup
+
+ROLLUP_FIELDS = ("quantity", "revenue", "order_count")
+
+
+def daily_product_matrix(days, end=None, fields=ROLLUP_FIELDS):
+    """
+    Dense (products x days) matrices of daily rollup values, one per field, for
+    the `days` days ending on `end` (default today). Every product has a row,
+    days without sales are zero.
+
+    Returns (product_ids, category_ids, start_day, {field: matrix}); product and
+    category ids are aligned with the matrix rows, a missing category is -1.
+    """
+    end = end or timezone.localdate()
+    start = end - timedelta(days=days - 1)
+    products = np.array(list(Product.objects.order_by("id").values_list("id", "category_id")), dtype=object)
+    if products.size:
+        product_ids = products[:, 0].astype(np.int64)
+        category_ids = np.array([-1 if value is None else value for value in products[:, 1]], dtype=np.int64)
+    else:
+        product_ids = category_ids = np.empty(0, dtype=np.int64)
+
+    rows = list(
+        DailySalesRollup.objects.filter(day__gte=start, day__lte=end).values_list("product_id", "day", *fields)
+    )
+    matrices = {field: np.zeros((product_ids.size, days), dtype=np.float64) for field in fields}
+    if rows:
+        columns = list(zip(*rows))
+        row_index = np.searchsorted(product_ids, np.array(columns[0], dtype=np.int64))
+        day_index = np.fromiter(((day - start).days for day in columns[1]), dtype=np.int64, count=len(rows))
+        for field, values in zip(fields, columns[2:]):
+            np.add.at(matrices[field], (row_index, day_index), np.array(values, dtype=np.float64))
+    return product_ids, category_ids, start, matrices
+
+
+def group_rows(matrix, groups):
+    """Sum matrix rows by group label. Returns (labels, grouped matrix)."""
+    labels, inverse = np.unique(groups, return_inverse=True)
+    grouped = np.zeros((labels.size, matrix.shape[1]), dtype=matrix.dtype)
+    np.add.at(grouped, inverse, matrix)
+    return labels, grouped
@@ -0,0 +1,143 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.db import transaction
+from django.dispatch import receiver
+from django.contrib.auth.models import User
+from ecommerce.models import InventoryHistory, Order, Product
+from .models import Sale
+from .cache import invalidate_dashboards
+from .rollups import apply_sale_to_hourly_rollup, apply_sale_to_rollup
+from .distribution import apply_sale_to_sketch
+from .customer_stats import refresh_customer_stats
+from .inventory import refresh_product_velocity
+from .live import batcher
+
+
+@receiver(pre_save, sender=Sale)
+def remember_previous_sale(sender, instance, **kwargs):
+    # Keep the stored values so an edited sale can be moved out of its old rollup row
+    instance._previous_sale = None
+    if instance.pk:
+        instance._previous_sale = (
+            Sale.objects.filter(pk=instance.pk)
+            .values("product_id", "customer_id", "timestamp", "quantity", "total_price")
+            .first()
+        )
+
+
+@receiver(post_save, sender=Sale)
+def update_rollup_on_sale_save(sender, instance, **kwargs):
+    previous = getattr(instance, "_previous_sale", None)
+    if previous:
+        apply_sale_to_rollup(
+            previous["product_id"], previous["timestamp"], previous["quantity"], previous["total_price"], sign=-1
+        )
+    apply_sale_to_rollup(instance.product_id, instance.timestamp, instance.quantity, instance.total_price)
+
+
+@receiver(post_save, sender=Sale)
+def update_hourly_rollup_on_sale_save(sender, instance, **kwargs):
+    previous = getattr(instance, "_previous_sale", None)
+    if previous:
+        apply_sale_to_hourly_rollup(
+            instance.pk, previous["timestamp"], previous["quantity"], previous["total_price"], sign=-1
+        )
+    apply_sale_to_hourly_rollup(instance.pk, instance.timestamp, instance.quantity, instance.total_price)
+
+
+@receiver(post_delete, sender=Sale)
+def update_rollup_on_sale_delete(sender, instance, **kwargs):
+    apply_sale_to_rollup(instance.product_id, instance.timestamp, instance.quantity, instance.total_price, sign=-1)
+    apply_sale_to_hourly_rollup(instance.pk, instance.timestamp, instance.quantity, instance.total_price, sign=-1)
+
+
+@receiver(post_save, sender=Sale)
+def update_sketch_on_sale_save(sender, instance, **kwargs):
+    previous = getattr(instance, "_previous_sale", None)
+    if previous:
+        apply_sale_to_sketch(instance.pk, previous["timestamp"], previous["total_price"], previous["quantity"], sign=-1)
+    apply_sale_to_sketch(instance.pk, instance.timestamp, instance.total_price, instance.quantity)
+
+
+@receiver(post_delete, sender=Sale)
+def update_sketch_on_sale_delete(sender, instance, **kwargs):
+    apply_sale_to_sketch(instance.pk, instance.timestamp, instance.total_price, instance.quantity, sign=-1)
+
+
+@receiver(post_save, sender=Sale)
+def update_customer_stats_on_sale_save(sender, instance, **kwargs):
+    refresh_customer_stats(instance.customer_id)
+    previous = getattr(instance, "_previous_sale", None)
+    if previous and previous["customer_id"] != instance.customer_id:
+        refresh_customer_stats(previous["customer_id"])
+
+
+@receiver(post_delete, sender=Sale)
+def update_customer_stats_on_sale_delete(sender, instance, **kwargs):
+    refresh_customer_stats(instance.customer_id)
+
+
+@receiver(post_save, sender=Sale)
+@receiver(post_delete, sender=Sale)
+def invalidate_dashboards_on_sale_write(sender, **kwargs):
+    invalidate_dashboards("sales")
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_dashboards_on_product_write(sender, **kwargs):
+    invalidate_dashboards("products")
+
+
+@receiver(post_save, sender=InventoryHistory)
+@receiver(post_delete, sender=InventoryHistory)
+def invalidate_dashboards_on_inventory_write(sender, **kwargs):
+    invalidate_dashboards("inventory")
+
+
+@receiver(post_delete, sender=User)
+def invalidate_dashboards_on_user_delete(sender, **kwargs):
+    invalidate_dashboards("users")
+
+
+@receiver(post_save, sender=User)
+def invalidate_dashboards_on_user_save(sender, update_fields=None, **kwargs):
+    # Logins only touch last_login, which no dashboard reads
+    if update_fields and set(update_fields) <= {"last_login"}:
+        return
+    invalidate_dashboards("users")
+
+
+@receiver(post_save, sender=Sale)
+def update_velocity_on_sale_save(sender, instance, **kwargs):
+    refresh_product_velocity(instance.product_id)
+    previous = getattr(instance, "_previous_sale", None)
+    if previous and previous["product_id"] != instance.product_id:
+        refresh_product_velocity(previous["product_id"])
+
+
+@receiver(post_delete, sender=Sale)
+@receiver(post_save, sender=InventoryHistory)
+@receiver(post_delete, sender=InventoryHistory)
+def update_velocity_on_sale_delete_or_restock(sender, instance, **kwargs):
+    refresh_product_velocity(instance.product_id)
+
+
+@receiver(post_save, sender=Product)
+def update_velocity_on_stock_change(sender, instance, **kwargs):
+    refresh_product_velocity(instance.pk)
+
+
+@receiver(post_save, sender=Sale)
+def push_sale_to_live_dashboards(sender, instance, created, **kwargs):
+    if created:
+        # Only committed sales reach the dashboards; the batcher sends at most one message per interval
+        # Product names are looked up once per delta when it is sent, not per sale
+        product_id, quantity, revenue = instance.product_id, instance.quantity, instance.total_price
+        transaction.on_commit(lambda: batcher.add_sale(product_id, quantity, revenue))
+
+
+@receiver(post_save, sender=Order)
+def push_order_to_live_dashboards(sender, instance, created, **kwargs):
+    if created:
+        total_price = instance.total_price
+        transaction.on_commit(lambda: batcher.add_order(total_price))
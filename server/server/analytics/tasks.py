@@ -0,0 +1,67 @@
+from celery import shared_task
+from django.conf import settings
+from .activity import downsample_activities, flush_activity_buffer
+from .affinity import compute_product_affinity
+from .anomalies import detect_sales_anomalies
+from .customer_stats import reconcile_customer_stats
+from .forecasting import forecast_demand
+from .inventory import refresh_all_velocities
+from .partitions import archive_sale_partitions, ensure_sale_partitions
+from .rfm import score_customers
+
+
+@shared_task
+def reconcile_customer_stats_task():
+    """Periodically correct any drift between CustomerStats and raw sales."""
+    return reconcile_customer_stats()
+
+
+@shared_task
+def score_customers_rfm_task():
+    """Refresh the RFM quintile scores behind the rfm:<code> segments."""
+    return score_customers()
+
+
+@shared_task
+def compute_product_affinity_task():
+    """Rebuild the frequently-bought-together table behind store/products/<id>/related/."""
+    return compute_product_affinity()
+
+
+@shared_task
+def refresh_stock_velocity_task():
+    """Slide every product's sales velocity windows forward a day."""
+    return refresh_all_velocities()
+
+
+@shared_task
+def flush_activity_buffer_task():
+    """Write out buffered activity events that haven't reached the size threshold yet."""
+    return flush_activity_buffer()
+
+
+@shared_task
+def downsample_activities_task():
+    """Fold activity events past the retention window into daily summaries."""
+    return downsample_activities()
+
+
+@shared_task
+def manage_sale_partitions_task():
+    """Keep monthly sales partitions created ahead of time and archive expired ones when a retention is set."""
+    created = ensure_sale_partitions()
+    retention = getattr(settings, "ANALYTICS_SALE_RETENTION_MONTHS", None)
+    archived = archive_sale_partitions(retention) if retention else []
+    return {"created": created, "archived": archived}
+
+
+@shared_task
+def detect_sales_anomalies_task():
+    """Re-check the recent daily and hourly sales series for spikes and drops."""
+    return detect_sales_anomalies()
+
+
+@shared_task
+def forecast_demand_task():
+    """Refit every product's demand forecast and projected stock-out date."""
+    return forecast_demand()
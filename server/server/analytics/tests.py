@@ -1,3 +1,841 @@
-from django.test import TestCase
+import json
+import tempfile
+from io import StringIO
+import threading
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock, skipIf, skipUnless
+from asgiref.sync import sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.timezone import now
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from rest_framework.test import APIClient
+from ecommerce.models import InventoryHistory, Product
+from .activity import downsample_activities, flush_activity_buffer
+from .affinity import compute_product_affinity
+from .anomalies import detect_sales_anomalies
+from .cache import cache_stats, cached_result
+from .cohorts import cohort_retention
+from .distribution import rebuild_daily_sketches
+from .export import export_dataset
+from .forecasting import damped_holt, days_until_stockout, forecast_demand, forecast_path
+from .inventory import refresh_all_velocities
+from .live import batcher
+from .routing import websocket_urlpatterns
+from .customer_stats import reconcile_customer_stats
+from .models import ExportCheckpoint, Sale, SalesAnomaly, DailySalesRollup, DailySalesSketch, HourlySalesRollup, DailyActivitySummary, CustomerStats, CustomerActivity, ProductStockVelocity
+from .rfm import quantile_scores, score_customers
+from .timeseries import sales_timeseries
+from .metrics import customer_dashboard_metrics
+from .parallel import parallel_enabled, run_queries
+from .partitions import ensure_sale_partitions, is_partitioned, month_start, partition_name, sale_partitions
+from .rollups import rebuild_daily_rollups, rebuild_hourly_rollups, sale_day, sale_hour
 
-# Create your tests here.
+
+class AnalyticsTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user('analytics_admin', 'admin@example.com', 'adminpass123')
+        self.customer = User.objects.create_user('analytics_customer', 'customer@example.com', 'customerpass123')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+
+        self.mug = Product.objects.create(name='Mug', description='Mug', price=Decimal('10.00'), stock=5, sku='MUG-1')
+        self.shirt = Product.objects.create(name='Shirt', description='Shirt', price=Decimal('25.00'), stock=50, sku='SHIRT-1')
+
+    def make_sale(self, product, quantity, days_ago=0, customer=None):
+        return Sale.objects.create(
+            product=product,
+            quantity=quantity,
+            total_price=product.price * quantity,
+            customer=customer or self.customer,
+            timestamp=now() - timedelta(days=days_ago),
+        )
+
+
+class DailySalesRollupTests(AnalyticsTestCase):
+    def test_rollup_tracks_sale_writes(self):
+        sale = self.make_sale(self.mug, 2)
+        self.make_sale(self.mug, 3)
+
+        rollup = DailySalesRollup.objects.get(product=self.mug, day=sale_day(sale.timestamp))
+        self.assertEqual((rollup.quantity, rollup.revenue, rollup.order_count), (5, Decimal('50.00'), 2))
+
+        # Moving a sale to another day takes it out of the old row
+        sale.timestamp = now() - timedelta(days=3)
+        sale.save()
+        rollup.refresh_from_db()
+        self.assertEqual((rollup.quantity, rollup.order_count), (3, 1))
+        moved = DailySalesRollup.objects.get(product=self.mug, day=sale_day(sale.timestamp))
+        self.assertEqual((moved.quantity, moved.order_count), (2, 1))
+
+        sale.delete()
+        moved.refresh_from_db()
+        self.assertEqual((moved.quantity, moved.revenue, moved.order_count), (0, Decimal('0.00'), 0))
+
+    def test_rebuild_matches_incremental_rollup(self):
+        self.make_sale(self.mug, 2, days_ago=1)
+        self.make_sale(self.shirt, 1, days_ago=1)
+        self.make_sale(self.shirt, 4, days_ago=10)
+        expected = set(DailySalesRollup.objects.values_list('day', 'product_id', 'quantity', 'revenue', 'order_count'))
+
+        DailySalesRollup.objects.all().delete()
+        self.assertEqual(rebuild_daily_rollups(), 3)
+        rebuilt = set(DailySalesRollup.objects.values_list('day', 'product_id', 'quantity', 'revenue', 'order_count'))
+        self.assertEqual(rebuilt, expected)
+
+    def test_hourly_rollup_tracks_sale_writes(self):
+        sale = self.make_sale(self.mug, 2)
+        self.make_sale(self.shirt, 1)
+        self.make_sale(self.shirt, 4, days_ago=2)
+
+        def hourly_totals():
+            return {
+                row['hour']: (row['quantity'], row['revenue'], row['orders'])
+                for row in HourlySalesRollup.objects.values('hour').annotate(
+                    quantity=Sum('quantity'), revenue=Sum('revenue'), orders=Sum('order_count'),
+                ).filter(orders__gt=0)
+            }
+
+        self.assertEqual(hourly_totals()[sale_hour(sale.timestamp)][2], 2)
+
+        sale.timestamp = now() - timedelta(hours=5)
+        sale.save()
+        self.assertEqual(hourly_totals()[sale_hour(sale.timestamp)], (2, Decimal('20.00'), 1))
+
+        expected = hourly_totals()
+        HourlySalesRollup.objects.all().delete()
+        rebuild_hourly_rollups()
+        self.assertEqual(hourly_totals(), expected)
+
+        sale.delete()
+        self.assertNotIn(sale_hour(sale.timestamp), hourly_totals())
+
+    def test_sales_dashboard_reads_rollup(self):
+        self.make_sale(self.mug, 2, days_ago=1)
+        self.make_sale(self.shirt, 4, days_ago=2)
+        self.make_sale(self.shirt, 1, days_ago=60)
+
+        response = self.client.get(reverse('analytics_dashboard'), {'time_period': 30})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_revenue'], Decimal('120.00'))
+        self.assertEqual(response.data['total_goods_sold'], 6)
+        self.assertEqual(response.data['recent_sales'], 2)
+        self.assertEqual(response.data['top_selling_products'][0], {'product__name': 'Shirt', 'total_sold': 4})
+        self.assertEqual(response.data['low_stock_products'], [{'name': 'Mug', 'stock': 5}])
+
+
+class CustomerTestCase(AnalyticsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.moderate = User.objects.create_user('moderate_customer', 'moderate@example.com', 'moderatepass123')
+        self.low = User.objects.create_user('low_customer', 'low@example.com', 'lowpass123')
+        self.make_sale(self.shirt, 48, days_ago=1)  # 1200 -> high spender
+        self.make_sale(self.mug, 30, days_ago=40, customer=self.moderate)
+        self.make_sale(self.mug, 30, days_ago=100, customer=self.moderate)
+        self.make_sale(self.mug, 10, days_ago=5, customer=self.low)
+
+
+class CustomerDashboardTests(CustomerTestCase):
+    def test_customer_metrics(self):
+        response = self.client.get(reverse('customer_dashboard'), {'time_period': 30})
+        self.assertEqual(response.status_code, 200)
+        data = response.data
+        self.assertEqual(data['total_customers'], 4)
+        self.assertEqual(data['active_customers'], 2)
+        self.assertEqual(data['new_customers'], 4)
+        self.assertEqual(data['retention_rate'], 25.0)
+        self.assertEqual(data['churn_rate'], 25.0)
+        self.assertEqual(data['average_clv'], 475)
+        self.assertEqual(data['top_clv_customers'][0]['username'], 'analytics_customer')
+        self.assertEqual((data['high_spenders'], data['moderate_spenders'], data['low_spenders']), (1, 1, 1))
+        self.assertEqual((data['active_users'], data['inactive_users'], data['at_risk_users']), (2, 2, 1))
+        self.assertAlmostEqual(data['purchase_frequency'], 178 / 6)
+        self.assertEqual([row['total_sales'] for row in data['activity_timeline']], [1, 1])
+
+    def test_baseline_clv_and_at_risk_definitions(self):
+        # Anonymous sales count towards lifetime value, as they always did
+        Sale.objects.create(product=self.shirt, quantity=4, total_price=Decimal('100.00'))
+        # A purchase in the 30-90 day window keeps a customer at risk even after a recent one
+        self.make_sale(self.mug, 1, days_ago=60, customer=self.low)
+        data = customer_dashboard_metrics(30)
+        self.assertEqual(data['average_clv'], (1900 + 100 + 10) / 4)
+        self.assertEqual(data['at_risk_users'], 2)
+
+    def test_customer_metrics_query_count(self):
+        # One grouped pass, total revenue, the top customers list and the timeline
+        with self.assertNumQueries(4):
+            customer_dashboard_metrics(30)
+
+
+class CustomerSegmentTests(CustomerTestCase):
+    def segment_emails(self, segment_name):
+        response = self.client.get(reverse('segment-users', args=[segment_name]))
+        self.assertEqual(response.status_code, 200)
+        return sorted(row['email'] for row in response.data)
+
+    def test_segments_read_customer_stats(self):
+        self.assertEqual(self.segment_emails('high_spenders'), ['customer@example.com'])
+        self.assertEqual(self.segment_emails('moderate_spenders'), ['moderate@example.com'])
+        self.assertEqual(self.segment_emails('low_spenders'), ['low@example.com'])
+        self.assertEqual(self.segment_emails('active_users'), ['customer@example.com', 'low@example.com'])
+        self.assertEqual(self.segment_emails('inactive_users'), ['admin@example.com', 'moderate@example.com'])
+        self.assertEqual(self.segment_emails('at_risk_users'), ['moderate@example.com'])
+
+        response = self.client.get(reverse('segment-users', args=['big_spenders']))
+        self.assertEqual(response.status_code, 400)
+
+    def test_stats_follow_sale_deletes_and_reconcile_fixes_drift(self):
+        Sale.objects.filter(customer=self.low).first().delete()
+        stats = CustomerStats.objects.get(user=self.low)
+        self.assertEqual((stats.order_count, stats.segment, stats.last_purchase_at), (0, '', None))
+
+        # Queryset updates bypass signals, so the stats drift until reconciled
+        Sale.objects.filter(customer=self.moderate).update(total_price=Decimal('600.00'))
+        self.assertEqual(reconcile_customer_stats(), 1)
+        stats = CustomerStats.objects.get(user=self.moderate)
+        self.assertEqual((stats.lifetime_spend, stats.segment), (Decimal('1200.00'), 'high_spenders'))
+        self.assertEqual(reconcile_customer_stats(), 0)
+
+    def test_segment_streaming_and_keyset_pages(self):
+        url = reverse('segment-users', args=['inactive_users'])
+
+        response = self.client.get(url, {'export': 'jsonl'})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)['email'] for line in lines], ['admin@example.com', 'moderate@example.com'])
+
+        response = self.client.get(url, {'export': 'csv'})
+        rows = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(rows, ['id,email', f'{self.admin.id},admin@example.com', f'{self.moderate.id},moderate@example.com'])
+
+        first = self.client.get(url, {'limit': 1}).data
+        self.assertEqual([row['email'] for row in first['results']], ['admin@example.com'])
+        second = self.client.get(url, {'limit': 1, 'cursor': first['next_cursor']}).data
+        self.assertEqual([row['email'] for row in second['results']], ['moderate@example.com'])
+        self.assertIsNone(second['next_cursor'])
+
+
+class DashboardCacheTests(CustomerTestCase):
+    def test_dashboards_are_cached_until_a_write(self):
+        url = reverse('analytics_dashboard')
+        first = self.client.get(url, {'time_period': 30})
+        with self.assertNumQueries(0):
+            second = self.client.get(url, {'time_period': 30})
+        self.assertEqual(second.data, first.data)
+
+        self.make_sale(self.mug, 1)
+        third = self.client.get(url, {'time_period': 30})
+        self.assertEqual(third.data['total_goods_sold'], first.data['total_goods_sold'] + 1)
+
+        stats = self.client.get(reverse('dashboard_cache_stats')).data
+        self.assertEqual((stats['hits'], stats['misses']), (1, 2))
+
+    def test_writes_only_invalidate_the_endpoints_reading_them(self):
+        timeseries = reverse('sales_timeseries')
+        dashboard = reverse('analytics_dashboard')
+        self.client.get(timeseries)
+        self.client.get(dashboard)
+
+        # Sales series never read products or restocks
+        self.mug.stock = 7
+        self.mug.save()
+        InventoryHistory.objects.create(product=self.mug, change_type='add', quantity_changed=2)
+        with self.assertNumQueries(0):
+            self.client.get(timeseries)
+        self.assertEqual(self.client.get(dashboard).data['low_stock_products'], [{'name': 'Mug', 'stock': 7}])
+
+        self.make_sale(self.mug, 1)
+        points = self.client.get(timeseries).data['points']
+        self.assertEqual(sum(point['quantity'] for point in points), 48 + 10 + 1)
+
+    def test_dashboard_time_period_is_bounded(self):
+        for url in (reverse('analytics_dashboard'), reverse('customer_dashboard')):
+            for time_period in (0, -1, 3651, 10 ** 9):
+                self.assertEqual(self.client.get(url, {'time_period': time_period}).status_code, 400)
+            self.assertEqual(self.client.get(url, {'time_period': 'abc'}).status_code, 200)
+
+    def test_logins_do_not_invalidate(self):
+        url = reverse('customer_dashboard')
+        self.client.get(url)
+        self.admin.save(update_fields=['last_login'])
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+    def test_concurrent_misses_compute_once(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return {'value': 42}
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(cached_result('test', 1, compute)))
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{'value': 42}] * 4)
+        self.assertEqual(cache_stats()['coalesced'], 3)
+
+
+class ParallelQueryTests(TestCase):
+    def test_queries_run_concurrently(self):
+        def query(value):
+            time.sleep(0.2)
+            return value, threading.current_thread().name
+
+        start = time.monotonic()
+        with mock.patch('analytics.parallel.parallel_enabled', return_value=True):
+            results = run_queries({name: lambda name=name: query(name) for name in ('a', 'b', 'c')})
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertEqual({name: value for name, (value, _) in results.items()}, {'a': 'a', 'b': 'b', 'c': 'c'})
+        self.assertTrue(all(thread.startswith('analytics-query') for _, thread in results.values()))
+
+    def test_sequential_inside_a_transaction(self):
+        # Worker connections could not see this test's uncommitted rows
+        self.assertFalse(parallel_enabled())
+        self.assertEqual(run_queries({'a': lambda: threading.current_thread().name}), {'a': 'MainThread'})
+
+    def test_setting_forces_sequential_queries(self):
+        # The benchmark counts queries this way, since worker connections escape CaptureQueriesContext
+        server = mock.Mock(vendor='postgresql', in_atomic_block=False)
+        with mock.patch('analytics.parallel.connection', server):
+            self.assertTrue(parallel_enabled())
+            with override_settings(ANALYTICS_PARALLEL_QUERIES=False):
+                self.assertFalse(parallel_enabled())
+
+
+class CohortRetentionTests(AnalyticsTestCase):
+    def month_ago(self, months):
+        # Noon on the 1st of the month `months` before the current one
+        moment = now().replace(day=1, hour=12, minute=0, second=0, microsecond=0)
+        for _ in range(months):
+            moment = (moment - timedelta(days=1)).replace(day=1)
+        return moment
+
+    def test_cohort_matrix(self):
+        other = User.objects.create_user('cohort_customer', 'cohort@example.com', 'cohortpass123')
+        User.objects.filter(id__in=[self.customer.id, other.id]).update(date_joined=self.month_ago(2))
+        for customer, months in [(self.customer, 2), (self.customer, 0), (other, 1)]:
+            Sale.objects.create(
+                product=self.mug, quantity=1, total_price=self.mug.price,
+                customer=customer, timestamp=self.month_ago(months),
+            )
+
+        response = self.client.get(reverse('customer_cohorts'), {'months': 6})
+        self.assertEqual(response.status_code, 200)
+        first, current = response.data['cohorts']
+        self.assertEqual(first['customers'], 2)
+        self.assertEqual(first['active_customers'], [1, 1, 1])
+        self.assertEqual(first['retention_rate'], [50.0, 50.0, 50.0])
+        self.assertEqual((current['customers'], current['active_customers']), (1, [0]))
+
+        # Closed months come from the per-month cache; only the current month is queried again
+        with self.assertNumQueries(2):
+            cohort_retention(6)
+
+
+class RFMScoringTests(CustomerTestCase):
+    def test_quantile_scores_share_scores_on_ties(self):
+        self.assertEqual(quantile_scores([10, 20, 30, 40, 50]).tolist(), [1, 2, 3, 4, 5])
+        self.assertEqual(quantile_scores([1, 1, 1, 2, 9]).tolist(), [1, 1, 1, 4, 5])
+        self.assertEqual(quantile_scores([]).tolist(), [])
+
+    def test_rfm_segments(self):
+        self.assertEqual(score_customers(), 3)
+        codes = dict(CustomerStats.objects.values_list('user__username', 'rfm_code'))
+        # Most recent / single purchase / highest spend for the high spender
+        self.assertEqual(codes['analytics_customer'], '414')
+        self.assertEqual(codes['moderate_customer'], '142')
+        self.assertEqual(codes['low_customer'], '211')
+
+        response = self.client.get(reverse('segment-users', args=['rfm:414']))
+        self.assertEqual([row['email'] for row in response.data], ['customer@example.com'])
+        response = self.client.get(reverse('segment-users', args=['rfm:*1*']))
+        self.assertEqual(sorted(row['email'] for row in response.data), ['customer@example.com', 'low@example.com'])
+        response = self.client.get(reverse('segment-users', args=['rfm:61*']))
+        self.assertEqual(response.status_code, 400)
+
+
+class SalesTimeSeriesTests(AnalyticsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.make_sale(self.mug, 2, days_ago=0)
+        self.make_sale(self.shirt, 1, days_ago=0)
+        self.make_sale(self.mug, 3, days_ago=3)
+
+    def test_daily_series_is_gap_filled(self):
+        response = self.client.get(reverse('sales_timeseries'), {'time_period': 6, 'granularity': 'day'})
+        self.assertEqual(response.status_code, 200)
+        points = response.data['points']
+        self.assertEqual(len(points), 7)
+        self.assertEqual([point['orders'] for point in points], [0, 0, 0, 1, 0, 0, 2])
+        self.assertEqual(points[-1]['revenue'], Decimal('45.00'))
+        self.assertEqual(points[3]['quantity'], 3)
+
+    def test_coarse_and_hourly_buckets_cover_the_same_sales(self):
+        for granularity in ('hour', 'week', 'month'):
+            series = sales_timeseries(6, granularity)
+            self.assertEqual(sum(point['orders'] for point in series['points']), 3, granularity)
+        self.assertEqual(len(sales_timeseries(6, 'hour')['points']), 6 * 24 + 1)
+
+    def test_downsampling_limits_points(self):
+        series = sales_timeseries(365, 'day', max_points=50)
+        self.assertLessEqual(len(series['points']), 50)
+        self.assertEqual(series['buckets_per_point'], 8)
+        self.assertEqual(sum(point['quantity'] for point in series['points']), 6)
+
+        response = self.client.get(reverse('sales_timeseries'), {'granularity': 'minute'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_window_is_bounded(self):
+        for params in (
+            {'time_period': 10 ** 9},
+            {'time_period': -5},
+            {'time_period': 365, 'granularity': 'hour'},
+            {'time_period': 30, 'max_points': -1},
+        ):
+            response = self.client.get(reverse('sales_timeseries'), params)
+            self.assertEqual(response.status_code, 400, params)
+
+
+class OrderDistributionTests(AnalyticsTestCase):
+    def setUp(self):
+        super().setUp()
+        # Order values 10, 20, 25, 100, 100 and basket sizes 1, 2, 1, 4, 10
+        self.make_sale(self.mug, 1, days_ago=0)
+        self.make_sale(self.mug, 2, days_ago=1)
+        self.make_sale(self.shirt, 1, days_ago=2)
+        self.make_sale(self.shirt, 4, days_ago=2)
+        self.old = self.make_sale(self.mug, 10, days_ago=40)
+
+    def test_percentiles_merge_daily_sketches(self):
+        response = self.client.get(reverse('order_distribution'), {'time_period': 60})
+        self.assertEqual(response.status_code, 200)
+        values, sizes = response.data['order_value'], response.data['basket_size']
+        self.assertEqual(response.data['orders'], 5)
+        self.assertAlmostEqual(values['p50'], 25, delta=25 * 0.01)
+        self.assertAlmostEqual(values['p99'], 100, delta=100 * 0.01)
+        self.assertEqual(sum(bucket['count'] for bucket in values['histogram']), 5)
+        self.assertEqual((sizes['p50'], sizes['p90'], sizes['p99']), (2, 10, 10))
+        self.assertEqual(sizes['mean'], 3.6)
+
+        # The 30 day window only merges the recent days
+        recent = self.client.get(reverse('order_distribution'), {'time_period': 30}).data
+        self.assertEqual(recent['orders'], 4)
+        self.assertEqual(recent['basket_size']['p99'], 4)
+
+    def test_window_is_bounded(self):
+        url = reverse('order_distribution')
+        for time_period in (0, -5, 3651, 10 ** 9):
+            self.assertEqual(self.client.get(url, {'time_period': time_period}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'time_period': 3650}).status_code, 200)
+
+    def test_sketches_follow_deletes_and_match_rebuild(self):
+        self.old.delete()
+        columns = ('day', 'shard', 'order_values', 'basket_sizes', 'order_count')
+        incremental = list(DailySalesSketch.objects.order_by('day', 'shard').values_list(*columns))
+        # The two sales two days ago have consecutive ids, so they land in separate shards of the same day
+        self.assertEqual(len(incremental), 4)
+        self.assertEqual(len({row[0] for row in incremental}), 3)
+        rebuild_daily_sketches()
+        rebuilt = list(DailySalesSketch.objects.order_by('day', 'shard').values_list(*columns))
+        self.assertEqual(rebuilt, incremental)
+
+
+class LiveDashboardTests(AnalyticsTestCase):
+    def setUp(self):
+        super().setUp()
+        batcher.take()
+
+    def tearDown(self):
+        batcher.take()
+
+    def connect(self, user):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), '/ws/analytics/dashboard/')
+        communicator.scope['user'] = user
+        return communicator
+
+    def test_committed_sales_are_batched_into_one_delta(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.make_sale(self.mug, 2)
+            self.make_sale(self.shirt, 1)
+            self.make_sale(self.mug, 3)
+        with self.assertNumQueries(1):  # Product names for the whole delta
+            delta = batcher.take()
+        self.assertEqual((delta['order_count'], delta['goods_sold'], delta['revenue']), (3, 6, '75.00'))
+        self.assertEqual([product['name'] for product in delta['top_products']], ['Mug', 'Shirt'])
+        self.assertIsNone(batcher.take())
+
+    async def test_consumer_pushes_deltas(self):
+        communicator = self.connect(self.admin)
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        batcher.add_sale(self.mug.id, 2, Decimal('20.00'))
+        batcher.add_order(Decimal('20.00'))
+        await sync_to_async(batcher.flush)()
+        message = await communicator.receive_json_from()
+        self.assertEqual(message['delta']['revenue'], '20.00')
+        self.assertEqual(message['delta']['top_products'][0]['name'], 'Mug')
+        self.assertEqual(message['delta']['new_orders'], 1)
+        await communicator.disconnect()
+
+    async def test_anonymous_users_are_rejected(self):
+        connected, code = await self.connect(AnonymousUser()).connect()
+        self.assertFalse(connected)
+        self.assertEqual(code, 4003)
+
+
+class ActivityIngestionTests(AnalyticsTestCase):
+    def setUp(self):
+        super().setUp()
+        flush_activity_buffer()
+        self.client.force_authenticate(user=self.customer)
+
+    def test_events_are_buffered_and_bulk_written(self):
+        url = reverse('activity_ingest')
+        with self.settings(ANALYTICS_ACTIVITY_FLUSH_SIZE=5, ANALYTICS_ACTIVITY_FLUSH_INTERVAL=60):
+            response = self.client.post(url, {'events': [{'action': 'Login'}, {'action': 'Product View'}]}, format='json')
+            self.assertEqual(response.status_code, 202)
+            self.assertEqual(CustomerActivity.objects.count(), 0)
+
+            # Reaching the size threshold flushes everything in one insert
+            with self.assertNumQueries(1):
+                self.client.post(url, [{'action': 'Product View'}] * 3, format='json')
+        self.assertEqual(CustomerActivity.objects.filter(customer=self.customer).count(), 5)
+
+        response = self.client.post(url, {'events': [{'action': ''}]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(url, {'events': []}, format='json')
+        self.assertEqual(response.status_code, 400)
+        with mock.patch('analytics.views.ActivityEventSerializer') as serializer:
+            response = self.client.post(url, {'events': [{'action': 'Login'}] * 501}, format='json')
+        self.assertEqual(response.status_code, 400)
+        serializer.assert_not_called()
+
+    def test_failed_flush_keeps_the_events(self):
+        with self.settings(ANALYTICS_ACTIVITY_FLUSH_SIZE=100, ANALYTICS_ACTIVITY_FLUSH_INTERVAL=60):
+            self.client.post(reverse('activity_ingest'), [{'action': 'Login'}] * 2, format='json')
+        with mock.patch.object(CustomerActivity.objects, 'bulk_create', side_effect=RuntimeError('database down')):
+            with self.assertRaises(RuntimeError):
+                flush_activity_buffer()
+        self.assertEqual(flush_activity_buffer(), 2)
+        self.assertEqual(CustomerActivity.objects.count(), 2)
+
+    def test_old_events_are_downsampled(self):
+        old = now() - timedelta(days=100)
+        CustomerActivity.objects.bulk_create(
+            [CustomerActivity(customer=self.customer, action='Login', timestamp=old) for _ in range(3)]
+            + [CustomerActivity(customer=self.customer, action='Login', timestamp=now())]
+        )
+        self.assertEqual(downsample_activities(retention_days=90), 3)
+        # A late event for the same day is added to the existing summary
+        CustomerActivity.objects.create(customer=self.customer, action='Login', timestamp=old)
+        self.assertEqual(downsample_activities(retention_days=90), 1)
+
+        summary = DailyActivitySummary.objects.get()
+        self.assertEqual((summary.action, summary.count), ('Login', 4))
+        self.assertEqual(CustomerActivity.objects.count(), 1)
+
+
+class SalePartitionTests(TestCase):
+    def test_month_arithmetic_and_names(self):
+        self.assertEqual(month_start(date(2026, 11, 17), 2), date(2027, 1, 1))
+        self.assertEqual(month_start(date(2026, 1, 31), -1), date(2025, 12, 1))
+        self.assertEqual(partition_name(date(2027, 3, 1)), 'analytics_sale_y2027m03')
+
+    @skipIf(connection.vendor == 'postgresql', 'analytics_sale is partitioned on PostgreSQL')
+    def test_commands_are_noops_without_partitioning(self):
+        self.assertEqual(ensure_sale_partitions(), [])
+        out = StringIO()
+        call_command('manage_sale_partitions', archive_older_than=12, stdout=out)
+        self.assertIn('not partitioned', out.getvalue())
+
+
+@skipUnless(connection.vendor == 'postgresql', 'analytics_sale is only partitioned on PostgreSQL')
+class SalePartitionMigrationTests(TransactionTestCase):
+    """Migration 0011 only does anything on PostgreSQL; run the suite against it to cover both directions."""
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.migrate(targets)
+
+    def sale_count(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT count(*) FROM analytics_sale')
+            return cursor.fetchone()[0]
+
+    def test_partitioning_is_reversible(self):
+        customer = User.objects.create_user('partition_customer')
+        product = Product.objects.create(name='Lamp', description='Lamp', price=Decimal('5.00'), sku='PART-1')
+        Sale.objects.create(product=product, customer=customer, quantity=2, total_price=Decimal('10.00'))
+        self.assertTrue(is_partitioned())
+        leaves = MigrationExecutor(connection).loader.graph.leaf_nodes()
+        try:
+            self.migrate([('analytics', '0010_activity_indexes_and_summary')])
+            self.assertFalse(is_partitioned())
+            self.assertEqual(self.sale_count(), 1)
+        finally:
+            self.migrate(leaves)
+        self.assertTrue(is_partitioned())
+        self.assertEqual(self.sale_count(), 1)
+
+    def test_partitions_are_created_ahead(self):
+        months = set(sale_partitions())
+        today = timezone.localdate()
+        self.assertTrue({month_start(today, offset) for offset in range(4)} <= months)
+        self.assertEqual(ensure_sale_partitions(months_ahead=3), [])
+        self.assertEqual(ensure_sale_partitions(months_ahead=5), [
+            partition_name(month_start(today, 4)), partition_name(month_start(today, 5)),
+        ])
+        out = StringIO()
+        call_command('manage_sale_partitions', stdout=out)
+        self.assertIn('Successfully', out.getvalue())
+
+
+class SeedAnalyticsDataTests(TestCase):
+    def seed(self, prefix):
+        call_command(
+            'seed_analytics_data', users=20, products=5, sales=300, activities=50,
+            batch_size=64, seed=7, prefix=prefix, stdout=StringIO(),
+        )
+        sales = Sale.objects.filter(customer__username__startswith=prefix)
+        return sorted(sales.values_list('quantity', 'total_price', 'timestamp'))
+
+    def test_seed_is_reproducible_and_rebuilds_rollups(self):
+        first = self.seed('alpha')
+        self.assertEqual(len(first), 300)
+        self.assertEqual(CustomerActivity.objects.count(), 50)
+        self.assertEqual(
+            DailySalesRollup.objects.aggregate(total=Sum('quantity'))['total'],
+            Sale.objects.aggregate(total=Sum('quantity'))['total'],
+        )
+        self.assertEqual(CustomerStats.objects.aggregate(total=Sum('order_count'))['total'], 300)
+        self.assertEqual(DailySalesSketch.objects.aggregate(total=Sum('order_count'))['total'], 300)
+        self.assertEqual(ProductStockVelocity.objects.count(), 5)
+        self.assertEqual(self.seed('beta'), first)
+
+    def test_rejects_empty_users_or_products(self):
+        for options in ({'users': 0}, {'products': 0}):
+            with self.assertRaises(CommandError):
+                call_command('seed_analytics_data', sales=10, activities=10, stdout=StringIO(), **options)
+
+
+class ProductAffinityTests(AnalyticsTestCase):
+    def test_related_products_from_co_purchases(self):
+        cap = Product.objects.create(name='Cap', description='Cap', price=Decimal('8.00'), stock=20, sku='CAP-1')
+        others = [
+            User.objects.create_user(f'affinity_customer{i}', f'affinity{i}@example.com', 'affinitypass123')
+            for i in range(3)
+        ]
+        # Mug and shirt are bought together by every customer; the cap only once
+        for customer in others:
+            self.make_sale(self.mug, 1, customer=customer)
+            self.make_sale(self.shirt, 1, customer=customer)
+        self.make_sale(cap, 1, customer=others[0])
+        # Same customer, different day: not the same basket
+        self.make_sale(cap, 1, days_ago=5, customer=others[1])
+
+        self.assertEqual(compute_product_affinity(min_co_purchases=1), 6)
+
+        url = reverse('product-related', args=[self.mug.id])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['name'] for row in response.data], ['Shirt', 'Cap'])
+        self.assertEqual(response.data[0]['co_purchases'], 3)
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+        # Rerunning the job refreshes cached responses
+        compute_product_affinity(min_co_purchases=2)
+        self.assertEqual([row['name'] for row in self.client.get(url).data], ['Shirt'])
+        self.assertEqual(self.client.get(reverse('product-related', args=[9999])).status_code, 404)
+
+
+class SalesAnomalyTests(AnalyticsTestCase):
+    def setUp(self):
+        super().setUp()
+        # Two months of steady mug sales with some noise, then a spike yesterday
+        today = timezone.localdate()
+        orders = [5, 6, 4, 5, 7, 5, 4, 6] * 8
+        rows = [
+            DailySalesRollup(day=today - timedelta(days=offset + 2), product=self.mug,
+                             quantity=count, revenue=count * 10, order_count=count)
+            for offset, count in enumerate(orders)
+        ]
+        rows.append(DailySalesRollup(day=today - timedelta(days=1), product=self.mug,
+                                     quantity=40, revenue=400, order_count=40))
+        DailySalesRollup.objects.bulk_create(rows)
+
+    def test_spike_is_recorded_and_listed(self):
+        self.assertGreater(detect_sales_anomalies(), 0)
+        anomalies = SalesAnomaly.objects.filter(granularity='day', metric='orders')
+        self.assertEqual(sorted(anomalies.values_list('series', flat=True)), ['product:%d' % self.mug.id, 'total'])
+        spike = anomalies.get(scope='product')
+        self.assertEqual((spike.direction, spike.value), ('spike', 40))
+        self.assertAlmostEqual(spike.expected, 5.3, delta=1)
+
+        response = self.client.get(reverse('sales_anomalies'), {'scope': 'product', 'metric': 'orders'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({row['product_id'] for row in response.data}, {self.mug.id})
+        self.assertEqual(self.client.get(reverse('sales_anomalies'), {'scope': 'shop'}).status_code, 400)
+        for days in (0, -1, 3651, 10 ** 9):
+            self.assertEqual(self.client.get(reverse('sales_anomalies'), {'days': days}).status_code, 400)
+
+        # Re-running replaces the stored anomalies instead of duplicating them
+        count = SalesAnomaly.objects.count()
+        detect_sales_anomalies()
+        self.assertEqual(SalesAnomaly.objects.count(), count)
+
+
+class InventoryVelocityTests(AnalyticsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.make_sale(self.mug, 6, days_ago=2)  # 6 sold in 30 days, 5 in stock -> 25 days of cover
+        self.make_sale(self.shirt, 3, days_ago=1)
+        self.make_sale(self.shirt, 10, days_ago=60)  # Only inside the 90 day window
+
+    def test_velocity_is_maintained_incrementally(self):
+        velocity = ProductStockVelocity.objects.get(product=self.mug)
+        self.assertEqual((velocity.units_sold_7d, velocity.units_sold_30d, velocity.units_sold_90d), (6, 6, 6))
+        self.assertAlmostEqual(velocity.days_of_cover, 25.0)
+
+        InventoryHistory.objects.create(product=self.mug, change_type='add', quantity_changed=20)
+        self.mug.stock = 25
+        self.mug.save()
+        velocity.refresh_from_db()
+        self.assertEqual(velocity.units_restocked_30d, 20)
+        self.assertAlmostEqual(velocity.days_of_cover, 125.0)
+
+        ProductStockVelocity.objects.all().delete()
+        self.assertEqual(refresh_all_velocities(), 2)
+        self.assertEqual(ProductStockVelocity.objects.get(product=self.shirt).units_sold_90d, 13)
+
+    def test_inventory_endpoint_ranks_by_stockout(self):
+        response = self.client.get(reverse('inventory_velocity'), {'window': 30})
+        self.assertEqual(response.status_code, 200)
+        products = response.data['products']
+        # Mug: 5 in stock at 0.2/day -> 25 days; shirt: 50 in stock at 0.1/day -> 500 days
+        self.assertEqual([row['name'] for row in products], ['Mug', 'Shirt'])
+        for days in (0, 3651, 10 ** 9):
+            self.assertEqual(self.client.get(reverse('predicted_low_stock'), {'days': days}).status_code, 400)
+        self.assertAlmostEqual(products[0]['days_of_cover'], 25.0)
+        self.assertAlmostEqual(products[0]['turnover_rate'], 6 / 5)
+
+        products = self.client.get(reverse('inventory_velocity'), {'window': 90}).data['products']
+        self.assertAlmostEqual(products[1]['days_of_cover'], 50 * 90 / 13)
+        self.assertEqual(self.client.get(reverse('inventory_velocity'), {'window': 14}).status_code, 400)
+
+
+    def test_slow_movers_have_no_stockout_date(self):
+        # 100000 in stock at 1 a month would otherwise project past date.max
+        bulk = Product.objects.create(name='Bulk', description='Bulk', price=Decimal('1.00'), stock=100000, sku='BULK-1')
+        self.make_sale(bulk, 1, days_ago=3)
+        velocity = ProductStockVelocity.objects.get(product=bulk)
+        self.assertAlmostEqual(velocity.days_of_cover, 3000000.0)
+        self.assertIsNone(velocity.projected_stockout_date)
+        self.assertEqual(refresh_all_velocities(), 3)
+
+        response = self.client.get(reverse('inventory_velocity'), {'window': 90})
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.data['products'][-1]['projected_stockout_date'])
+
+class DemandForecastTests(AnalyticsTestCase):
+    def test_vectorized_model(self):
+        history = np.array([[4.0] * 30, [float(day) for day in range(30)]])
+        level, trend, error = damped_holt(history)
+        self.assertAlmostEqual(level[0], 4)
+        self.assertAlmostEqual(trend[0], 0)
+        self.assertAlmostEqual(error[0], 0)
+        self.assertGreater(trend[1], 0)
+
+        path = forecast_path(np.array([4.0, 0.0]), np.array([0.0, 0.0]), horizon=30)
+        days = days_until_stockout(np.array([10, 10]), path)
+        self.assertAlmostEqual(days[0], 2.5)
+        self.assertTrue(np.isnan(days[1]))
+
+    def test_predicted_low_stock_uses_demand_not_a_fixed_cutoff(self):
+        today = timezone.localdate()
+        bolt = Product.objects.create(name='Bolt', description='Bolt', price=Decimal('1.00'), stock=3, sku='BOLT-1')
+        rows = [
+            DailySalesRollup(day=today - timedelta(days=offset), product=self.mug, quantity=2, revenue=20, order_count=1)
+            for offset in range(1, 91)
+        ] + [
+            DailySalesRollup(day=today - timedelta(days=offset), product=self.shirt, quantity=1, revenue=25, order_count=1)
+            for offset in range(1, 91, 10)
+        ]
+        DailySalesRollup.objects.bulk_create(rows)
+        Product.objects.filter(pk=self.shirt.pk).update(stock=8)
+        self.assertEqual(forecast_demand(), 3)
+
+        response = self.client.get(reverse('predicted_low_stock'))
+        self.assertEqual(response.status_code, 200)
+        # Mug: 5 in stock at 2 a day; the shirt (8 at ~0.1 a day) lasts months and the unsold bolt never runs out
+        self.assertEqual([row['name'] for row in response.data['products']], ['Mug'])
+        self.assertAlmostEqual(response.data['products'][0]['days_until_stockout'], 2.5, delta=0.1)
+        self.assertIsNone(bolt.demand_forecast.projected_stockout_date)
+
+        products = self.client.get(reverse('predicted_low_stock'), {'days': 120}).data['products']
+        self.assertEqual([row['name'] for row in products], ['Mug', 'Shirt'])
+
+
+class ColumnarExportTests(AnalyticsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.make_sale(self.mug, 2, days_ago=3)
+        self.make_sale(self.shirt, 1, days_ago=3)
+        self.make_sale(self.mug, 4, days_ago=1)
+
+    def test_incremental_partitioned_parquet_export(self):
+        with tempfile.TemporaryDirectory() as output_dir:
+            self.assertEqual(export_dataset('sales', output_dir), 3)
+            table = pq.read_table(f'{output_dir}/sales')
+            self.assertEqual(sorted(table.column('quantity').to_pylist()), [1, 2, 4])
+            self.assertEqual(len(set(table.column('date').to_pylist())), 2)
+
+            # Only rows newer than the checkpoint are exported next time
+            self.make_sale(self.shirt, 7)
+            self.assertEqual(export_dataset('sales', output_dir), 1)
+            self.assertEqual(export_dataset('sales', output_dir), 0)
+            self.assertEqual(pq.read_table(f'{output_dir}/sales').num_rows, 4)
+
+            # A sale committed after the last run but timestamped before its checkpoint is still picked up, once
+            checkpoint = ExportCheckpoint.objects.get(dataset='sales').last_exported_at
+            late = self.make_sale(self.mug, 9)
+            Sale.objects.filter(pk=late.pk).update(timestamp=checkpoint - timedelta(minutes=1))
+            self.assertEqual(export_dataset('sales', output_dir), 1)
+            self.assertEqual(export_dataset('sales', output_dir), 0)
+            self.assertEqual(sorted(pq.read_table(f'{output_dir}/sales').column('quantity').to_pylist()), [1, 2, 4, 7, 9])
+
+    def test_arrow_stream_endpoint(self):
+        self.assertEqual(self.client.get(reverse('dataset_export', args=['sales'])).status_code, 403)
+        self.admin.is_staff = True
+        self.admin.save()
+        response = self.client.get(reverse('dataset_export', args=['sales']))
+        self.assertEqual(response.status_code, 200)
+        table = pa.ipc.open_stream(b''.join(response.streaming_content)).read_all()
+        self.assertEqual(table.num_rows, 3)
+        self.assertEqual(sum(table.column('total_price').to_pylist()), Decimal('85.00'))
+        self.assertEqual(self.client.get(reverse('dataset_export', args=['users'])).status_code, 400)
+        for since in ('yesterday', '2024-13-01T00:00:00'):
+            response = self.client.get(reverse('dataset_export', args=['sales']), {'since': since})
+            self.assertEqual(response.status_code, 400)
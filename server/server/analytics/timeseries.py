@@ -0,0 +1,98 @@
+import math
+from datetime import timedelta
+from django.db.models import F, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+from django.utils import timezone
+from .models import DailySalesRollup, HourlySalesRollup
+from .rollups import sale_day
+
+GRANULARITIES = ('hour', 'day', 'week', 'month')
+SERIES = ('revenue', 'quantity', 'orders')
+# Longest window served, and the longest at hourly granularity (every hour is zero-filled in Python)
+MAX_TIME_PERIOD = 3650
+MAX_HOURLY_TIME_PERIOD = 90
+
+
+def _bucket_start(value, granularity):
+    """Truncate a local datetime (hour) or date (day and coarser) to the start of its bucket."""
+    if granularity == 'hour':
+        return value.replace(minute=0, second=0, microsecond=0)
+    if granularity == 'week':
+        return value - timedelta(days=value.weekday())
+    if granularity == 'month':
+        return value.replace(day=1)
+    return value
+
+
+def _next_bucket(value, granularity):
+    if granularity == 'hour':
+        return value + timedelta(hours=1)
+    if granularity == 'week':
+        return value + timedelta(days=7)
+    if granularity == 'month':
+        return (value + timedelta(days=32)).replace(day=1)
+    return value + timedelta(days=1)
+
+
+def sales_timeseries(time_period, granularity='day', max_points=None):
+    """
+    Return revenue, quantity and order-count series over the last `time_period` days.
+
+    Every bucket in the window is present (empty buckets are zero-filled). When
+    `max_points` is given, consecutive buckets are summed together so that no
+    more than `max_points` points are returned.
+    """
+    current_time = timezone.localtime()
+    start_date = current_time - timedelta(days=time_period)
+
+    if granularity == 'hour':
+        rows = (
+            HourlySalesRollup.objects.filter(hour__gte=_bucket_start(start_date, 'hour'))
+            .values(bucket=F('hour'))
+            .annotate(revenue=Sum('revenue'), quantity=Sum('quantity'), orders=Sum('order_count'))
+        )
+        first, last = start_date, current_time
+    else:
+        rollups = DailySalesRollup.objects.filter(day__gte=sale_day(start_date))
+        trunc = {'week': TruncWeek, 'month': TruncMonth}.get(granularity)
+        grouped = rollups.annotate(bucket=trunc('day')).values('bucket') if trunc else rollups.values(bucket=F('day'))
+        rows = grouped.annotate(revenue=Sum('revenue'), quantity=Sum('quantity'), orders=Sum('order_count'))
+        first, last = sale_day(start_date), current_time.date()
+
+    totals = {}
+    for row in rows.order_by():
+        bucket = row['bucket']
+        if granularity == 'hour':
+            bucket = timezone.localtime(bucket)
+        totals[bucket] = row
+
+    points = []
+    bucket = _bucket_start(first, granularity)
+    end = _bucket_start(last, granularity)
+    while bucket <= end:
+        row = totals.get(bucket, {})
+        points.append({
+            "bucket": bucket,
+            "revenue": row.get('revenue') or 0,
+            "quantity": row.get('quantity') or 0,
+            "orders": row.get('orders') or 0,
+        })
+        bucket = _next_bucket(bucket, granularity)
+
+    buckets_per_point = 1
+    if max_points and len(points) > max_points:
+        buckets_per_point = math.ceil(len(points) / max_points)
+        points = [
+            {
+                "bucket": group[0]["bucket"],
+                **{series: sum(point[series] for point in group) for series in SERIES},
+            }
+            for group in (points[i:i + buckets_per_point] for i in range(0, len(points), buckets_per_point))
+        ]
+
+    return {
+        "granularity": granularity,
+        "time_period": time_period,
+        "buckets_per_point": buckets_per_point,
+        "points": points,
+    }
@@ -1,8 +1,30 @@
 from django.urls import path
-from .views import AnalyticsDashboard, CustomerDashboard, SegmentUsersView
+from .views import (
+    AnalyticsDashboard,
+    CustomerDashboard,
+    SegmentUsersView,
+    CohortRetentionView,
+    SalesTimeSeriesView,
+    OrderDistributionView,
+    InventoryVelocityView,
+    SalesAnomalyView,
+    PredictedLowStockView,
+    DashboardCacheStatsView,
+    DatasetExportView,
+    ActivityIngestView,
+)
 
 urlpatterns = [
     path('sales/dashboard/', AnalyticsDashboard.as_view(), name='analytics_dashboard'),
     path('customers/dashboard/', CustomerDashboard.as_view(), name='customer_dashboard'),
     path('customers/segment/<str:segment_name>/', SegmentUsersView.as_view(), name='segment-users'),
+    path('customers/cohorts/', CohortRetentionView.as_view(), name='customer_cohorts'),
+    path('sales/distribution/', OrderDistributionView.as_view(), name='order_distribution'),
+    path('timeseries/', SalesTimeSeriesView.as_view(), name='sales_timeseries'),
+    path('anomalies/', SalesAnomalyView.as_view(), name='sales_anomalies'),
+    path('inventory/', InventoryVelocityView.as_view(), name='inventory_velocity'),
+    path('inventory/predicted-low-stock/', PredictedLowStockView.as_view(), name='predicted_low_stock'),
+    path('cache/stats/', DashboardCacheStatsView.as_view(), name='dashboard_cache_stats'),
+    path('activity/', ActivityIngestView.as_view(), name='activity_ingest'),
+    path('export/<str:dataset>/', DatasetExportView.as_view(), name='dataset_export'),
 ]
\ No newline at end of file
@@ -1,11 +1,25 @@
+import csv
+import itertools
+import json
+from datetime import timedelta
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
-from django.db.models import Sum, Count, Avg, Q
-from datetime import timedelta
-from django.utils.timezone import now
-from django.contrib.auth.models import User
-from .models import Product, Sale
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .activity import record_activities
+from .models import SalesAnomaly
+from .cohorts import cohort_retention
+from .distribution import order_distribution
+from .export import DATASETS, arrow_stream
+from .forecasting import predicted_low_stock
+from .inventory import VELOCITY_WINDOWS, inventory_velocity
+from .timeseries import GRANULARITIES, MAX_HOURLY_TIME_PERIOD, MAX_TIME_PERIOD, sales_timeseries
+from .cache import cache_stats, cached_result
+from .metrics import customer_dashboard_metrics, sales_dashboard_metrics
+from .serializers import ActivityEventSerializer
+from .segments import SEGMENT_CHUNK_SIZE, iter_segment_rows, segment_page, segment_users
 
 class AnalyticsDashboard(APIView):
     permission_classes = [IsAuthenticated]
@@ -17,40 +31,12 @@ class AnalyticsDashboard(APIView):
             time_period = int(time_period)
         except ValueError:
             time_period = 30  # Default to 30 days if invalid value is provided
+        # Bounded before it becomes part of the cache key
+        if not 1 <= time_period <= MAX_TIME_PERIOD:
+            return Response({"error": f"time_period must be between 1 and {MAX_TIME_PERIOD} days"}, status=400)
 
-        # Calculate the start date based on the time period
-        start_date = now() - timedelta(days=time_period)
-
-        # Sales Metrics
-        total_revenue = Sale.objects.filter(timestamp__gte=start_date).aggregate(total=Sum('total_price'))['total'] or 0
-        total_goods_sold = Sale.objects.filter(timestamp__gte=start_date).aggregate(total=Sum('quantity'))['total'] or 0
-        total_orders = Sale.objects.filter(timestamp__gte=start_date).count()
-        average_order_value = total_revenue / total_orders if total_orders > 0 else 0
-
-        top_selling_products = Sale.objects.filter(timestamp__gte=start_date).values('product__name').annotate(
-            total_sold=Sum('quantity')
-        ).order_by('-total_sold')[:10]
-
-        recent_sales = Sale.objects.filter(
-            timestamp__gte=now() - timedelta(days=7)
-        ).aggregate(total=Count('id'))['total']
-
-        # Inventory Metrics
-        low_stock_products = list(Product.objects.filter(stock__lte=10).values('name', 'stock'))
-
-        total_sales_quantity = Sale.objects.aggregate(total=Sum('quantity'))['total'] or 0
-        total_inventory = Product.objects.aggregate(total=Sum('stock'))['total'] or 1
-        inventory_turnover_rate = total_sales_quantity / total_inventory
-
-        return Response({
-            "total_revenue": total_revenue,
-            "total_goods_sold": total_goods_sold,
-            "average_order_value": average_order_value,
-            "top_selling_products": top_selling_products,
-            "recent_sales": recent_sales,
-            "low_stock_products": low_stock_products,
-            "inventory_turnover_rate": inventory_turnover_rate,
-        }, status=200)
+        metrics = cached_result("sales_dashboard", time_period, lambda: sales_dashboard_metrics(time_period))
+        return Response(metrics, status=200)
     
 class CustomerDashboard(APIView):
     permission_classes = [IsAuthenticated]
@@ -62,138 +48,251 @@ class CustomerDashboard(APIView):
             time_period = int(time_period)
         except ValueError:
             time_period = 30  # Default to 30 days if invalid value is provided
+        # Bounded before it becomes part of the cache key
+        if not 1 <= time_period <= MAX_TIME_PERIOD:
+            return Response({"error": f"time_period must be between 1 and {MAX_TIME_PERIOD} days"}, status=400)
 
-        # Calculate the start date based on the time period
-        start_date = now() - timedelta(days=time_period)
-
-        # Total Customers
-        total_customers = User.objects.count()
-
-        # Active Customers (customers who made a purchase in the last `time_period` days)
-        active_customers = User.objects.filter(
-            sales__timestamp__gte=start_date
-        ).distinct().count()
-
-        # New Customers (customers who joined in the last `time_period` days)
-        new_customers = User.objects.filter(
-            date_joined__gte=start_date
-        ).count()
-
-        # Retention Rate (percentage of customers who made more than one purchase)
-        repeat_customers = User.objects.annotate(
-            purchase_count=Count('sales')
-        ).filter(purchase_count__gt=1).count()
-
-        retention_rate = (repeat_customers / total_customers * 100) if total_customers > 0 else 0
-
-        # Churn Rate (percentage of customers who haven't made a purchase in the last 90 days)
-        churned_customers = User.objects.filter(
-            sales__timestamp__lte=now() - timedelta(days=90)
-        ).distinct().count()
-
-        churn_rate = (churned_customers / total_customers * 100) if total_customers > 0 else 0
-
-        # Customer Lifetime Value (CLV)
-        total_clv = Sale.objects.aggregate(total_clv=Sum('total_price'))['total_clv'] or 0
-        average_clv = total_clv / total_customers if total_customers > 0 else 0
-
-        top_clv_customers = User.objects.annotate(
-            total_spent=Sum('sales__total_price')
-        ).order_by('-total_spent').values('username', 'total_spent')[:10]
-
-        # Segmentation by Spending
-        high_spenders = User.objects.annotate(
-            total_spent=Sum('sales__total_price')
-        ).filter(total_spent__gte=1000).count()
-
-        moderate_spenders = User.objects.annotate(
-            total_spent=Sum('sales__total_price')
-        ).filter(total_spent__range=(500, 999)).count()
-
-        low_spenders = User.objects.annotate(
-            total_spent=Sum('sales__total_price')
-        ).filter(total_spent__lt=500).count()
-
-        # Segmentation by Activity
-        active_users = User.objects.filter(
-            sales__timestamp__gte=now() - timedelta(days=30)
-        ).distinct().count()
-
-        inactive_users = User.objects.exclude(
-            sales__timestamp__gte=now() - timedelta(days=30)
-        ).count()
-
-        at_risk_users = User.objects.filter(
-            sales__timestamp__gte=now() - timedelta(days=90),
-            sales__timestamp__lte=now() - timedelta(days=30)
-        ).distinct().count()
-
-        # Purchase Behavior
-        repeat_purchase_rate = User.objects.annotate(
-            purchase_count=Count('sales')
-        ).filter(purchase_count__gt=1).count() / total_customers * 100 if total_customers > 0 else 0
-
-        purchase_frequency = Sale.objects.aggregate(avg_purchases=Avg('customer__sales__quantity'))['avg_purchases'] or 0
-
-        # Activity Timeline
-        activity_timeline = Sale.objects.filter(
-            timestamp__gte=start_date
-        ).values('timestamp__date').annotate(total_sales=Count('id')).order_by('timestamp__date')
-
-        return Response({
-            "total_customers": total_customers,
-            "active_customers": active_customers,
-            "new_customers": new_customers,
-            "retention_rate": retention_rate,
-            "churn_rate": churn_rate,
-            "average_clv": average_clv,
-            "top_clv_customers": top_clv_customers,
-            "high_spenders": high_spenders,
-            "moderate_spenders": moderate_spenders,
-            "low_spenders": low_spenders,
-            "active_users": active_users,
-            "inactive_users": inactive_users,
-            "at_risk_users": at_risk_users,
-            "repeat_purchase_rate": repeat_purchase_rate,
-            "purchase_frequency": purchase_frequency,
-            "activity_timeline": list(activity_timeline),
-        }, status=200)
+        metrics = cached_result("customer_dashboard", time_period, lambda: customer_dashboard_metrics(time_period))
+        return Response(metrics, status=200)
     
+class CohortRetentionView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        # Number of most recent signup-month cohorts to return (default 12)
+        try:
+            months = max(1, int(request.query_params.get("months", "12")))
+        except ValueError:
+            months = 12
+
+        matrix = cached_result("customer_cohorts", months, lambda: cohort_retention(months))
+        return Response(matrix, status=200)
+
+class SalesTimeSeriesView(APIView):
+    """
+    Zero-filled revenue / quantity / order-count series.
+    Query params: time_period (days), granularity (hour/day/week/month), max_points.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        granularity = request.query_params.get("granularity", "day")
+        if granularity not in GRANULARITIES:
+            return Response({"error": f"Invalid granularity, use one of: {', '.join(GRANULARITIES)}"}, status=400)
+        try:
+            time_period = int(request.query_params.get("time_period", "30"))
+            max_points = int(request.query_params.get("max_points", "0")) or None
+        except ValueError:
+            return Response({"error": "time_period and max_points must be integers"}, status=400)
+        limit = MAX_HOURLY_TIME_PERIOD if granularity == "hour" else MAX_TIME_PERIOD
+        if not 1 <= time_period <= limit:
+            return Response({"error": f"time_period must be between 1 and {limit} days for {granularity} granularity"}, status=400)
+        if max_points is not None and max_points < 1:
+            return Response({"error": "max_points must be positive"}, status=400)
+
+        params = f"{time_period}:{granularity}:{max_points}"
+        series = cached_result("sales_timeseries", params, lambda: sales_timeseries(time_period, granularity, max_points))
+        return Response(series, status=200)
+
+class OrderDistributionView(APIView):
+    """
+    Order value and basket size percentiles (p50/p90/p99) and histograms.
+    Query params: time_period (days), buckets (order value histogram buckets).
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            time_period = int(request.query_params.get("time_period", "30"))
+            buckets = min(max(1, int(request.query_params.get("buckets", "10"))), 100)
+        except ValueError:
+            return Response({"error": "time_period and buckets must be integers"}, status=400)
+        if not 1 <= time_period <= MAX_TIME_PERIOD:
+            return Response({"error": f"time_period must be between 1 and {MAX_TIME_PERIOD} days"}, status=400)
+
+        distribution = cached_result(
+            "order_distribution", f"{time_period}:{buckets}", lambda: order_distribution(time_period, buckets)
+        )
+        return Response(distribution, status=200)
+
+class SalesAnomalyView(APIView):
+    """
+    Sales anomalies found by the detection job, newest first.
+    Query params: days (default 7), scope (total/category/product), granularity (day/hour),
+    direction (spike/drop), metric (revenue/orders), limit.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            days = int(request.query_params.get("days", "7"))
+            limit = min(max(1, int(request.query_params.get("limit", "100"))), 1000)
+        except ValueError:
+            return Response({"error": "days and limit must be integers"}, status=400)
+        if not 1 <= days <= MAX_TIME_PERIOD:
+            return Response({"error": f"days must be between 1 and {MAX_TIME_PERIOD}"}, status=400)
+
+        anomalies = SalesAnomaly.objects.filter(bucket_start__gte=timezone.now() - timedelta(days=days))
+        for param, choices in (
+            ("scope", SalesAnomaly.SCOPE_CHOICES),
+            ("granularity", SalesAnomaly.GRANULARITY_CHOICES),
+            ("direction", SalesAnomaly.DIRECTION_CHOICES),
+            ("metric", SalesAnomaly.METRIC_CHOICES),
+        ):
+            value = request.query_params.get(param)
+            if value is None:
+                continue
+            if value not in dict(choices):
+                return Response({"error": f"Invalid {param}, use one of: {', '.join(dict(choices))}"}, status=400)
+            anomalies = anomalies.filter(**{param: value})
+
+        rows = anomalies.order_by("-bucket_start", "-z_score").values(
+            "series", "scope", "product_id", "category_id", "label", "granularity", "metric",
+            "bucket_start", "value", "expected", "z_score", "direction", "detected_at",
+        )[:limit]
+        return Response(list(rows), status=200)
+
+class InventoryVelocityView(APIView):
+    """
+    Products ranked by projected stock-out date.
+    Query params: window (7, 30 or 90 days of sales, default 30), limit.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            window = int(request.query_params.get("window", "30"))
+            limit = min(max(1, int(request.query_params.get("limit", "50"))), 500)
+        except ValueError:
+            return Response({"error": "window and limit must be integers"}, status=400)
+        if window not in VELOCITY_WINDOWS:
+            return Response({"error": f"window must be one of {list(VELOCITY_WINDOWS)}"}, status=400)
+
+        products = cached_result("inventory_velocity", f"{window}:{limit}", lambda: inventory_velocity(window, limit))
+        return Response({"window": window, "products": products}, status=200)
+
+class PredictedLowStockView(APIView):
+    """
+    Products forecast to run out within `days` (default ANALYTICS_LOW_STOCK_LEAD_DAYS), soonest first.
+    Reads the nightly demand forecasts; query params: days, limit.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            days = int(request.query_params["days"]) if "days" in request.query_params else None
+            limit = min(max(1, int(request.query_params.get("limit", "50"))), 500)
+        except ValueError:
+            return Response({"error": "days and limit must be integers"}, status=400)
+        if days is not None and not 1 <= days <= MAX_TIME_PERIOD:
+            return Response({"error": f"days must be between 1 and {MAX_TIME_PERIOD}"}, status=400)
+
+        products = cached_result("predicted_low_stock", f"{days}:{limit}", lambda: predicted_low_stock(days, limit))
+        return Response({"products": products}, status=200)
+
+class Echo:
+    """File-like object whose write() just hands back the value, for streaming csv.writer output."""
+    def write(self, value):
+        return value
+
+
+class ActivityIngestView(APIView):
+    """
+    Accept a batch of customer events: {"events": [{"action": "Login", "timestamp": "..."}]} or a bare list.
+    Events are buffered and written in bulk, so they show up in the database within a few seconds.
+    """
+    permission_classes = [IsAuthenticated]
+    max_batch_size = 500
+
+    def post(self, request):
+        events = request.data.get("events") if isinstance(request.data, dict) else request.data
+        # Reject oversized batches before validating every event in them
+        if not isinstance(events, list) or not 0 < len(events) <= self.max_batch_size:
+            return Response({"error": f"Send a list of between 1 and {self.max_batch_size} events"}, status=400)
+        serializer = ActivityEventSerializer(data=events, many=True)
+        serializer.is_valid(raise_exception=True)
+        record_activities(request.user.id, serializer.validated_data)
+        return Response({"accepted": len(serializer.validated_data)}, status=202)
+
 class SegmentUsersView(APIView):
+    """
+    Return the users in a segment.
+
+    By default the whole segment is returned as a list. For large segments use
+    `?export=jsonl` or `?export=csv` to stream it, or `?cursor=<id>&limit=<n>`
+    to page through it with a keyset cursor.
+    """
     permission_classes = [IsAuthenticated]
+    max_page_size = 10000
 
     def get(self, request, segment_name):
-        # Calculate the start date for segmentation (last 30 days for activity-based segments)
-        start_date = now() - timedelta(days=30)
-
-        if segment_name == "high_spenders":
-            users = User.objects.annotate(
-                total_spent=Sum('sales__total_price')
-            ).filter(total_spent__gte=1000)
-        elif segment_name == "moderate_spenders":
-            users = User.objects.annotate(
-                total_spent=Sum('sales__total_price')
-            ).filter(total_spent__range=(500, 999))
-        elif segment_name == "low_spenders":
-            users = User.objects.annotate(
-                total_spent=Sum('sales__total_price')
-            ).filter(total_spent__lt=500)
-        elif segment_name == "active_users":
-            users = User.objects.filter(
-                sales__timestamp__gte=start_date
-            ).distinct()
-        elif segment_name == "inactive_users":
-            users = User.objects.exclude(
-                sales__timestamp__gte=start_date
-            ).distinct()
-        elif segment_name == "at_risk_users":
-            users = User.objects.filter(
-                sales__timestamp__gte=now() - timedelta(days=90),
-                sales__timestamp__lte=start_date
-            ).distinct()
-        else:
+        users = segment_users(segment_name)
+        if users is None:
             return Response({"error": "Invalid segment name"}, status=400)
 
+        export = request.query_params.get("export")
+        if export == "jsonl":
+            rows = (json.dumps(row) + "\n" for row in iter_segment_rows(users))
+            response = StreamingHttpResponse(rows, content_type="application/x-ndjson")
+            response["Content-Disposition"] = f'attachment; filename="{segment_name}.jsonl"'
+            return response
+        if export == "csv":
+            writer = csv.writer(Echo())
+            rows = itertools.chain(
+                [writer.writerow(["id", "email"])],
+                (writer.writerow([row["id"], row["email"]]) for row in iter_segment_rows(users)),
+            )
+            response = StreamingHttpResponse(rows, content_type="text/csv")
+            response["Content-Disposition"] = f'attachment; filename="{segment_name}.csv"'
+            return response
+        if export is not None:
+            return Response({"error": "Invalid export format, use 'jsonl' or 'csv'"}, status=400)
+
+        if "cursor" in request.query_params or "limit" in request.query_params:
+            try:
+                cursor = int(request.query_params.get("cursor", 0))
+                limit = int(request.query_params.get("limit", SEGMENT_CHUNK_SIZE))
+            except ValueError:
+                return Response({"error": "cursor and limit must be integers"}, status=400)
+            limit = max(1, min(limit, self.max_page_size))
+            results, next_cursor = segment_page(users, cursor, limit)
+            return Response({"results": results, "next_cursor": next_cursor}, status=200)
+
         # Return user IDs or email addresses
-        user_data = [{"id": user.id, "email": user.email} for user in users]
-        return Response(user_data, status=200)
\ No newline at end of file
+        user_data = list(users.values("id", "email"))
+        return Response(user_data, status=200)
+
+
+class DashboardCacheStatsView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        return Response(cache_stats(), status=200)
+
+
+class DatasetExportView(APIView):
+    """
+    Stream a dataset (sales, activities, orders, order_items) as an Arrow IPC stream.
+    Optional `since` / `until` ISO timestamps bound the rows exported.
+    Staff only: the datasets include every customer's orders and shipping addresses.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, dataset):
+        if dataset not in DATASETS:
+            return Response({"error": f"Invalid dataset, use one of: {', '.join(DATASETS)}"}, status=400)
+
+        bounds = {}
+        for name in ("since", "until"):
+            value = request.query_params.get(name)
+            if value is not None:
+                try:
+                    bounds[name] = parse_datetime(value)
+                except ValueError:  # Well formed but out of range, e.g. month 13
+                    bounds[name] = None
+                if bounds[name] is None:
+                    return Response({"error": f"Invalid {name} timestamp"}, status=400)
+
+        response = StreamingHttpResponse(arrow_stream(dataset, **bounds), content_type="application/vnd.apache.arrow.stream")
+        response["Content-Disposition"] = f'attachment; filename="{dataset}.arrows"'
+        return response
@@ -0,0 +1,22 @@
+import time
+from django.core.cache import cache
+
+# Bumped on every product or category write; part of every derived catalog cache key
+CATALOG_VERSION_KEY = "ecommerce:catalog:version"
+
+
+def catalog_version():
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        # Seed from the clock so a lost key can never bring back entries from an earlier version
+        cache.add(CATALOG_VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def invalidate_catalog():
+    """Make every cached catalog entry (facet counts) stale."""
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        catalog_version()
@@ -0,0 +1,128 @@
+import hashlib
+import json
+from collections import Counter
+from django.core.cache import cache
+from django.db.models import Case, CharField, Count, Q, Value, When
+from rest_framework.exceptions import ValidationError
+from .cache import catalog_version
+
+# Price bands as (key, lower bound inclusive, upper bound exclusive); None is unbounded
+PRICE_BANDS = [
+    ("0-25", None, 25),
+    ("25-50", 25, 50),
+    ("50-100", 50, 100),
+    ("100-250", 100, 250),
+    ("250+", 250, None),
+]
+FACETS = ("category", "color", "size", "price")
+FACETS_KEY = "ecommerce:facets:{}:{}"
+FACETS_TTL = 60 * 60
+
+
+def _band_condition(lower, upper):
+    condition = Q()
+    if lower is not None:
+        condition &= Q(price__gte=lower)
+    if upper is not None:
+        condition &= Q(price__lt=upper)
+    return condition
+
+
+def parse_selections(params):
+    """
+    Selected facet values from the query string, e.g. ?color=red&color=blue or
+    ?category=1,2. Values of one facet are OR-ed, different facets are AND-ed.
+    """
+    selections = {}
+    for facet in FACETS:
+        values = sorted({value.strip() for raw in params.getlist(facet) for value in raw.split(",") if value.strip()})
+        if not values:
+            continue
+        if facet == "category":
+            if not all(value.isdigit() for value in values):
+                raise ValidationError({"category": "Category ids must be integers."})
+            values = sorted(int(value) for value in values)
+        elif facet == "price":
+            unknown = set(values) - {key for key, _, _ in PRICE_BANDS}
+            if unknown:
+                raise ValidationError({"price": f"Unknown price bands: {', '.join(sorted(unknown))}."})
+        selections[facet] = values
+    return selections
+
+
+def apply_selections(queryset, selections):
+    if "category" in selections:
+        queryset = queryset.filter(category_id__in=selections["category"])
+    if "color" in selections:
+        queryset = queryset.filter(color__in=selections["color"])
+    if "size" in selections:
+        queryset = queryset.filter(size__in=selections["size"])
+    if "price" in selections:
+        condition = Q()
+        for key, lower, upper in PRICE_BANDS:
+            if key in selections["price"]:
+                condition |= _band_condition(lower, upper)
+        queryset = queryset.filter(condition)
+    return queryset
+
+
+def facet_counts(queryset, selections):
+    """
+    Product counts per category, color, size and price band, from one grouped
+    query over `queryset` (the products before any facet is selected).
+
+    Each facet is counted with the selections of the other facets applied but
+    not its own, so picking a color still shows how many products the other
+    colors would add.
+    """
+    band = Case(
+        *[When(_band_condition(lower, upper), then=Value(key)) for key, lower, upper in PRICE_BANDS],
+        output_field=CharField(),
+    )
+    rows = (
+        queryset.order_by()
+        .annotate(price_band=band)
+        .values("category_id", "category__name", "color", "size", "price_band")
+        .annotate(count=Count("id"))
+    )
+    counts = {facet: Counter() for facet in FACETS}
+    labels = {}
+    for row in rows:
+        values = {"category": row["category_id"], "color": row["color"], "size": row["size"], "price": row["price_band"]}
+        if row["category_id"] is not None:
+            labels[row["category_id"]] = row["category__name"]
+        for facet in FACETS:
+            others_match = all(
+                values[other] in selections[other] for other in selections if other != facet
+            )
+            if others_match and values[facet] is not None:
+                counts[facet][values[facet]] += row["count"]
+
+    def listing(facet, label=str):
+        return [
+            {"value": value, "label": label(value), "count": count}
+            for value, count in sorted(counts[facet].items(), key=lambda item: (-item[1], str(item[0])))
+        ]
+
+    band_order = [key for key, _, _ in PRICE_BANDS]
+    return {
+        "category": listing("category", labels.get),
+        "color": listing("color"),
+        "size": listing("size"),
+        # Price bands keep their natural order
+        "price": sorted(listing("price"), key=lambda entry: band_order.index(entry["value"])),
+    }
+
+
+def cached_facet_counts(queryset, selections, params):
+    """
+    facet_counts cached per filter combination until the next product or
+    category write. `params` holds the non-facet filters `queryset` was built from.
+    """
+    combination = json.dumps({"params": params, "selections": selections}, sort_keys=True)
+    key = FACETS_KEY.format(catalog_version(), hashlib.sha1(combination.encode()).hexdigest())
+    facets = cache.get(key)
+    if facets is None:
+        facets = facet_counts(queryset, selections)
+        cache.set(key, facets, timeout=FACETS_TTL)
+    return facets
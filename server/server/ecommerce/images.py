@@ -0,0 +1,49 @@
+import uuid
+from functools import partial
+from pathlib import Path
+from django.conf import settings
+from django.db import transaction
+from .models import ProductImage
+from .utils.storage import get_image_storage
+
+
+def stage_product_images(product, files):
+    """
+    Write uploaded files to the staging directory and attach a pending
+    ProductImage for each. Every image is uploaded by its own Celery task once
+    the transaction commits, so the request never waits for the storage backend.
+    """
+    from .tasks import upload_product_image_task
+
+    staging = Path(settings.ECOMMERCE_IMAGE_STAGING_DIR)
+    staging.mkdir(parents=True, exist_ok=True)
+    images = []
+    for upload in files:
+        path = staging / f"{uuid.uuid4().hex}{Path(upload.name).suffix.lower()}"
+        with open(path, "wb") as staged:
+            for chunk in upload.chunks():
+                staged.write(chunk)
+        images.append(ProductImage(product=product, status="pending", staged_path=str(path)))
+    images = ProductImage.objects.bulk_create(images)
+    for image in images:
+        transaction.on_commit(partial(upload_product_image_task.delay, image.id))
+    return images
+
+
+def upload_staged_image(image_id):
+    """Upload a pending image's staged file and mark it ready. Returns the URL, or None if it isn't pending."""
+    image = ProductImage.objects.filter(pk=image_id, status="pending").first()
+    if image is None:
+        return None
+    url = get_image_storage().upload(image.staged_path)
+    ProductImage.objects.filter(pk=image_id).update(image_url=url, status="ready", staged_path="")
+    Path(image.staged_path).unlink(missing_ok=True)
+    return url
+
+
+def mark_image_failed(image_id):
+    image = ProductImage.objects.filter(pk=image_id, status="pending").first()
+    if image is None:
+        return
+    ProductImage.objects.filter(pk=image_id).update(status="failed", staged_path="")
+    Path(image.staged_path).unlink(missing_ok=True)
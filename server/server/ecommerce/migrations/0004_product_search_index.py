@@ -0,0 +1,48 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    # SQLite: FTS5 table keyed by product id, kept in sync by ecommerce.signals, plus a term
+    # listing for spelling suggestions. PostgreSQL: a generated tsvector column with a GIN index.
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE ecommerce_product_fts USING fts5("
+            "name, description, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE ecommerce_product_fts_vocab USING fts5vocab(ecommerce_product_fts, 'row')"
+        )
+        schema_editor.execute(
+            "INSERT INTO ecommerce_product_fts (rowid, name, description) "
+            "SELECT id, name, description FROM ecommerce_product"
+        )
+    elif vendor == "postgresql":
+        schema_editor.execute(
+            "ALTER TABLE ecommerce_product ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+            "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+            "setweight(to_tsvector('simple', coalesce(description, '')), 'B')) STORED"
+        )
+        schema_editor.execute(
+            "CREATE INDEX ecommerce_product_search_idx ON ecommerce_product USING GIN (search_vector)"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        schema_editor.execute("DROP TABLE IF EXISTS ecommerce_product_fts_vocab")
+        schema_editor.execute("DROP TABLE IF EXISTS ecommerce_product_fts")
+    elif vendor == "postgresql":
+        schema_editor.execute("ALTER TABLE ecommerce_product DROP COLUMN IF EXISTS search_vector")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerce', '0003_productaffinity'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 5.1.5 on 2026-10-18 12:31
+
+import re
+from collections import Counter
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Same tokenizer and term length cap as ecommerce.search at the time of this migration
+TOKEN = re.compile(r"\w+")
+MAX_TERM_LENGTH = 100
+
+
+def trigrams(term):
+    padded = f"  {term} "
+    return {padded[index:index + 3] for index in range(len(padded) - 2)}
+
+
+def backfill_search_terms(apps, schema_editor):
+    Product = apps.get_model('ecommerce', 'Product')
+    SearchTerm = apps.get_model('ecommerce', 'SearchTerm')
+    SearchTrigram = apps.get_model('ecommerce', 'SearchTrigram')
+    counts = Counter()
+    for name, description in Product.objects.values_list('name', 'description').iterator(chunk_size=1000):
+        words = TOKEN.findall((name or '').lower()) + TOKEN.findall((description or '').lower())
+        counts.update({word for word in words if len(word) <= MAX_TERM_LENGTH})
+    SearchTerm.objects.bulk_create(
+        [SearchTerm(term=term, product_count=count) for term, count in counts.items()], batch_size=1000
+    )
+    SearchTrigram.objects.bulk_create(
+        (
+            SearchTrigram(trigram=trigram, term_id=pk)
+            for pk, term in SearchTerm.objects.values_list('id', 'term').iterator()
+            for trigram in trigrams(term)
+        ),
+        batch_size=1000,
+    )
+
+
+def drop_fts_vocabulary(apps, schema_editor):
+    # Spelling corrections now read SearchTerm, nothing queries the FTS5 term listing
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS ecommerce_product_fts_vocab')
+
+
+def create_fts_vocabulary(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE ecommerce_product_fts_vocab USING fts5vocab(ecommerce_product_fts, 'row')"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerce', '0006_product_image_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=100, unique=True)),
+                ('product_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SearchTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(max_length=3)),
+                ('term', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trigrams', to='ecommerce.searchterm')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('trigram', 'term'), name='unique_search_trigram_term')],
+            },
+        ),
+        migrations.RunPython(backfill_search_terms, migrations.RunPython.noop),
+        migrations.RunPython(drop_fts_vocabulary, create_fts_vocabulary),
+    ]
@@ -19,17 +19,69 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Keyset pagination walks (created_at, id)
+            models.Index(fields=['created_at', 'id'], name='product_created_id_idx'),
+        ]
+
     def __str__(self):
         return self.name
     
 class ProductImage(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),  # Staged locally, waiting for the upload task
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    ]
+
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='images')
-    image_url = models.URLField()  # URL of the image stored in cloudinary
+    image_url = models.URLField(blank=True)  # URL of the image in the storage backend, empty until uploaded
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='ready')
+    staged_path = models.CharField(max_length=500, blank=True)  # Local file the upload task reads
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return f"Image for {self.product.name}"
     
+class ProductAffinity(models.Model):
+    """Top-K "frequently bought together" neighbours of a product, written by the affinity job."""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='affinities')
+    related_product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField()  # 1 = strongest neighbour
+    co_purchases = models.PositiveIntegerField()  # Baskets containing both products
+    score = models.FloatField()  # Cosine similarity of the two products' baskets
+    computed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'rank'], name='unique_affinity_rank_per_product'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} -> {self.related_product_id} (#{self.rank})"
+
+class SearchTerm(models.Model):
+    """A word of some product's name or description, the vocabulary search corrects spellings against."""
+    term = models.CharField(max_length=100, unique=True)
+    product_count = models.PositiveIntegerField(default=0)  # Products using the term; dropped at zero
+
+    def __str__(self):
+        return self.term
+
+class SearchTrigram(models.Model):
+    """Three-letter pieces of a search term, so close spellings are an index lookup rather than a scan."""
+    trigram = models.CharField(max_length=3)
+    term = models.ForeignKey(SearchTerm, on_delete=models.CASCADE, related_name='trigrams')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['trigram', 'term'], name='unique_search_trigram_term'),
+        ]
+
+    def __str__(self):
+        return f"{self.trigram} -> {self.term_id}"
+
 class InventoryHistory(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='inventory_history')
     change_type = models.CharField(max_length=50, choices=[('add', 'Add'), ('remove', 'Remove')])
@@ -37,6 +89,11 @@ class InventoryHistory(models.Model):
     reason = models.TextField(blank=True, null=True)
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['timestamp', 'id'], name='inventory_timestamp_id_idx'),
+        ]
+
     def __str__(self):
         return f"{self.product.name} - {self.change_type} - {self.quantity_changed}"
     
@@ -69,6 +126,12 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Orders are always listed per user
+            models.Index(fields=['user', 'created_at', 'id'], name='order_user_created_id_idx'),
+        ]
+
     def __str__(self):
         return f"Order #{self.id} by {self.user.username}"
 
@@ -89,6 +152,11 @@ class Review(models.Model):
     comment = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='review_created_id_idx'),
+        ]
+
     def __str__(self):
         return f"Review by {self.user.username} for {self.product.name}"
     
@@ -0,0 +1,114 @@
+import base64
+import json
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination on a unique (sort field, id) ordering, newest first.
+
+    Each page continues strictly after the last row of the previous one with an
+    index range scan, so deep pages cost the same as the first and rows inserted
+    meanwhile are never skipped or repeated. `?count=false` also skips the
+    COUNT(*) over the whole result set.
+
+    Like DRF's LimitOffsetPagination it is opt-in: only requests that pass a
+    `cursor` (empty for the first page) or a `page_size` get a page; any other
+    request gets the plain, unpaginated list the endpoint always returned.
+    """
+    cursor_query_param = "cursor"
+    count_query_param = "count"
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    # Paired with "id" as the tie breaker; both descending
+    sort_field = "created_at"
+    invalid_cursor_message = "Invalid cursor."
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def encode_cursor(self, row, reverse):
+        value = getattr(row, self.sort_field)
+        position = [value.isoformat() if hasattr(value, "isoformat") else value, row.pk]
+        token = base64.urlsafe_b64encode(json.dumps({"p": position, "r": int(reverse)}).encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def decode_cursor(self, queryset, request):
+        """Return ((sort value, id), reverse) for the requested cursor, or None for the first page."""
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token.encode()))
+            value, pk = payload["p"]
+            field = queryset.model._meta.get_field(self.sort_field)
+            return (field.to_python(value), int(pk)), bool(payload.get("r"))
+        except (TypeError, ValueError, KeyError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not {self.cursor_query_param, self.page_size_query_param} & set(request.query_params):
+            return None
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        self.count = None
+        if request.query_params.get(self.count_query_param, "").lower() not in ("false", "0"):
+            self.count = queryset.count()
+
+        cursor = self.decode_cursor(queryset, request)
+        reverse = cursor is not None and cursor[1]
+        # Forward pages walk newest first; reverse pages walk back towards the newest
+        direction = "gt" if reverse else "lt"
+        if cursor:
+            (value, pk), _ = cursor
+            queryset = queryset.filter(
+                Q(**{f"{self.sort_field}__{direction}": value})
+                | Q(**{self.sort_field: value, f"id__{direction}": pk})
+            )
+        ordering = (self.sort_field, "id") if reverse else (f"-{self.sort_field}", "-id")
+        rows = list(queryset.order_by(*ordering)[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+
+        self.next = self.previous = None
+        if rows:
+            if has_more or reverse:
+                self.next = self.encode_cursor(rows[-1], reverse=False)
+            if (has_more and reverse) or (cursor and not reverse):
+                self.previous = self.encode_cursor(rows[0], reverse=True)
+        return rows
+
+    def get_paginated_response(self, data):
+        response = {"next": self.next, "previous": self.previous, "results": data}
+        if self.count is not None:
+            response = {"count": self.count, **response}
+        return Response(response)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "count": {"type": "integer"},
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+
+class TimestampKeysetPagination(KeysetPagination):
+    sort_field = "timestamp"
@@ -0,0 +1,219 @@
+import difflib
+import re
+from collections import Counter
+from django.db import connection, transaction
+from django.db.models import Case, Count, F, IntegerField, Q, Value, When
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import SearchFilter
+from rest_framework.settings import api_settings
+from .models import Product, SearchTerm, SearchTrigram
+
+# Product names and descriptions are indexed in an FTS5 table on SQLite and in the generated
+# search_vector column (GIN indexed) on PostgreSQL, see migration 0004. Spelling corrections
+# come from the SearchTerm vocabulary and its trigrams, kept current by ecommerce.signals.
+FTS_TABLE = "ecommerce_product_fts"
+# Matches in the name weigh this many times more than matches in the description
+NAME_WEIGHT = 10.0
+# Most ranked products a single search returns
+MAX_RESULTS = 1000
+# Longer tokens (hashes, URLs) are searchable but never offered as corrections
+MAX_TERM_LENGTH = 100
+# Terms shorter than this are only prefix-matched, never spelling-corrected
+MIN_CORRECTION_LENGTH = 4
+MAX_CORRECTIONS = 3
+# Terms sharing the most trigrams with a misspelling that get scored as corrections
+CORRECTION_CANDIDATES = 50
+CORRECTION_CUTOFF = 0.75
+TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text):
+    return TOKEN.findall((text or "").lower())
+
+
+def index_product(product):
+    """(Re)index one product. PostgreSQL keeps its generated column up to date by itself."""
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [product.pk])
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, name, description) VALUES (%s, %s, %s)",
+            [product.pk, product.name, product.description],
+        )
+
+
+def remove_product(product_id):
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [product_id])
+
+
+def product_terms(name, description):
+    """The set of vocabulary terms a product with this name and description contributes."""
+    return {term for term in tokenize(name) + tokenize(description) if len(term) <= MAX_TERM_LENGTH}
+
+
+def trigrams(term):
+    # Padded like pg_trgm, so the first letters weigh as much as the rest of the word
+    padded = f"  {term} "
+    return {padded[index:index + 3] for index in range(len(padded) - 2)}
+
+
+def _trigram_rows(terms):
+    return [SearchTrigram(trigram=trigram, term_id=pk) for pk, term in terms for trigram in trigrams(term)]
+
+
+def update_search_terms(added, removed):
+    """Count the products using `added` terms up and those using `removed` terms down, dropping unused terms."""
+    if added:
+        SearchTerm.objects.bulk_create([SearchTerm(term=term) for term in added], ignore_conflicts=True)
+        SearchTerm.objects.filter(term__in=added).update(product_count=F("product_count") + 1)
+        new_terms = SearchTerm.objects.filter(term__in=added, trigrams__isnull=True).values_list("id", "term")
+        SearchTrigram.objects.bulk_create(_trigram_rows(new_terms), ignore_conflicts=True)
+    if removed:
+        SearchTerm.objects.filter(term__in=removed, product_count__gt=0).update(product_count=F("product_count") - 1)
+        SearchTerm.objects.filter(term__in=removed, product_count=0).delete()
+
+
+def rebuild_search_index(batch_size=1000):
+    """Reindex every product, e.g. after bulk_create, which skips the signals."""
+    if connection.vendor == "sqlite":
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, name, description) "
+                "SELECT id, name, description FROM ecommerce_product"
+            )
+    counts = Counter()
+    for name, description in Product.objects.values_list("name", "description").iterator(chunk_size=batch_size):
+        counts.update(product_terms(name, description))
+    with transaction.atomic():
+        SearchTrigram.objects.all().delete()
+        SearchTerm.objects.all().delete()
+        SearchTerm.objects.bulk_create(
+            [SearchTerm(term=term, product_count=count) for term, count in counts.items()], batch_size=batch_size
+        )
+        SearchTrigram.objects.bulk_create(
+            _trigram_rows(SearchTerm.objects.values_list("id", "term")), batch_size=batch_size
+        )
+
+
+def corrections(term):
+    """
+    Close spellings of `term` from the indexed vocabulary, or nothing when
+    some indexed term already starts with it.
+    """
+    if len(term) < MIN_CORRECTION_LENGTH:
+        return []
+    following = SearchTerm.objects.filter(term__gte=term).order_by("term").values_list("term", flat=True).first()
+    if following is not None and following.startswith(term):
+        return []
+    # Only the terms sharing the most trigrams with `term` are worth scoring
+    candidates = (
+        SearchTrigram.objects.filter(trigram__in=trigrams(term))
+        .values("term__term")
+        .annotate(shared=Count("id"))
+        .order_by("-shared", "term__term")[:CORRECTION_CANDIDATES]
+    )
+    words = [row["term__term"] for row in candidates if abs(len(row["term__term"]) - len(term)) <= 2]
+    return difflib.get_close_matches(term, words, n=MAX_CORRECTIONS, cutoff=CORRECTION_CUTOFF)
+
+
+def _quote(term, quote):
+    return quote + term.replace(quote, quote * 2) + quote
+
+
+def _contains(terms):
+    condition = Q()
+    for term in terms:
+        condition &= Q(name__icontains=term) | Q(description__icontains=term)
+    return condition
+
+
+def _match(terms):
+    """Full-text query for `terms`: each as a prefix, or any of its corrections."""
+    alternatives = [(term, corrections(term)) for term in terms]
+    if connection.vendor == "sqlite":
+        return " AND ".join(
+            "(" + " OR ".join([_quote(term, '"') + "*"] + [_quote(word, '"') for word in words]) + ")"
+            for term, words in alternatives
+        )
+    return " & ".join(
+        "(" + " | ".join([_quote(term, "'") + ":*"] + [_quote(word, "'") for word in words]) + ")"
+        for term, words in alternatives
+    )
+
+
+def search_product_ids(query, queryset=None, limit=MAX_RESULTS):
+    """
+    Ids of the products in `queryset` (every product by default) matching every
+    term of `query`, best match first. Each term matches as a prefix, and
+    misspelt terms also match their closest indexed spellings. The limit
+    applies after narrowing to `queryset`.
+    """
+    terms = tokenize(query)
+    if not terms:
+        return []
+    queryset = Product.objects.all() if queryset is None else queryset
+    if connection.vendor not in ("sqlite", "postgresql"):
+        return list(queryset.filter(_contains(terms)).order_by("id").values_list("id", flat=True)[:limit])
+
+    match = _match(terms)
+    within, params = queryset.order_by().values("id").query.sql_with_params()
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.execute(
+                f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND rowid IN ({within}) "
+                f"ORDER BY bm25({FTS_TABLE}, {NAME_WEIGHT}, 1.0), rowid LIMIT %s",
+                [match, *params, limit],
+            )
+        else:
+            cursor.execute(
+                "SELECT id FROM ecommerce_product, to_tsquery('simple', %s) query "
+                f"WHERE search_vector @@ query AND id IN ({within}) "
+                "ORDER BY ts_rank_cd(search_vector, query) DESC, id LIMIT %s",
+                [match, *params, limit],
+            )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def matching(queryset, query):
+    """Narrow `queryset` to every product matching `query`, keeping its order."""
+    terms = tokenize(query)
+    if connection.vendor == "sqlite":
+        ids = RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [_match(terms)])
+    elif connection.vendor == "postgresql":
+        ids = RawSQL(
+            "SELECT id FROM ecommerce_product WHERE search_vector @@ to_tsquery('simple', %s)", [_match(terms)]
+        )
+    else:
+        return queryset.filter(_contains(terms))
+    return queryset.filter(id__in=ids)
+
+
+def ranked(queryset, query):
+    """Narrow `queryset` to its products matching `query`, best match first."""
+    ids = search_product_ids(query, queryset)
+    if not ids:
+        return queryset.none()
+    order = Case(*[When(id=pk, then=Value(position)) for position, pk in enumerate(ids)], output_field=IntegerField())
+    return queryset.filter(id__in=ids).order_by(order)
+
+
+class ProductSearchFilter(SearchFilter):
+    """
+    `?search=` through the full-text index instead of icontains lookups. Results
+    are ranked unless the request asks for an explicit `ordering`, so this
+    backend must run after OrderingFilter; it also runs after the other filters
+    so the ranking cap applies to the already narrowed products.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, "")
+        if not tokenize(query):
+            return queryset
+        if request.query_params.get(api_settings.ORDERING_PARAM):
+            return matching(queryset, query)
+        return ranked(queryset, query)
@@ -1,9 +1,9 @@
 from rest_framework import serializers
-from .utils.cloudinary_utils import upload_image_to_cloudinary
 from .models import (
     Category,
     Product,
     ProductImage,
+    ProductAffinity,
     InventoryHistory,
     Cart,
     CartItem,
@@ -20,7 +20,7 @@ class CategorySerializer(serializers.ModelSerializer):
 class ProductImageSerializer(serializers.ModelSerializer):
     class Meta:
         model = ProductImage
-        fields = ['id', 'image_url', 'created_at']
+        fields = ['id', 'image_url', 'status', 'created_at']
 
 class ProductSerializer(serializers.ModelSerializer):
     images = ProductImageSerializer(many=True, read_only=True)  # Nested serializer for images
@@ -45,18 +45,16 @@ class ProductSerializer(serializers.ModelSerializer):
             "images",
         ]
 
-    def create(self, validated_data):
-        # Extract images from the request context
-        images = self.context.get('images', [])
-        product = Product.objects.create(**validated_data)
+class RelatedProductSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source="related_product.id", read_only=True)
+    name = serializers.CharField(source="related_product.name", read_only=True)
+    price = serializers.DecimalField(source="related_product.price", max_digits=10, decimal_places=2, coerce_to_string=False, read_only=True)
+    sku = serializers.CharField(source="related_product.sku", read_only=True)
+    category_name = serializers.CharField(source="related_product.category.name", read_only=True, default=None)
 
-        # Upload each image to Cloudinary and save the URLs
-        for image_file in images:
-            image_url = upload_image_to_cloudinary(image_file)
-            if image_url:
-                ProductImage.objects.create(product=product, image_url=image_url)
-
-        return product
+    class Meta:
+        model = ProductAffinity
+        fields = ["id", "name", "price", "sku", "category_name", "rank", "co_purchases", "score"]
 
 class InventoryHistorySerializer(serializers.ModelSerializer):
     product_name = serializers.CharField(source="product.name", read_only=True)
@@ -0,0 +1,46 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from .cache import invalidate_catalog
+from .models import Category, Product
+from .search import index_product, product_terms, remove_product, update_search_terms
+
+SEARCHABLE_FIELDS = {"name", "description"}
+
+
+@receiver(pre_save, sender=Product)
+def remember_searchable_text(sender, instance, update_fields=None, **kwargs):
+    # Keep the stored text so the search vocabulary only changes when the indexed words do
+    instance._previous_search_text = None
+    if instance.pk and (update_fields is None or SEARCHABLE_FIELDS & set(update_fields)):
+        instance._previous_search_text = (
+            Product.objects.filter(pk=instance.pk).values_list("name", "description").first()
+        )
+
+
+@receiver(post_save, sender=Product)
+def index_saved_product(sender, instance, created, update_fields=None, **kwargs):
+    invalidate_catalog()
+    if update_fields is not None and not SEARCHABLE_FIELDS & set(update_fields):
+        return
+    previous = getattr(instance, "_previous_search_text", None)
+    current = (instance.name, instance.description)
+    if previous == current:
+        return
+    index_product(instance)
+    old_terms = product_terms(*previous) if previous else set()
+    new_terms = product_terms(*current)
+    update_search_terms(new_terms - old_terms, old_terms - new_terms)
+
+
+@receiver(post_delete, sender=Product)
+def unindex_deleted_product(sender, instance, **kwargs):
+    remove_product(instance.pk)
+    update_search_terms(set(), product_terms(instance.name, instance.description))
+    invalidate_catalog()
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_catalog_on_category_change(sender, **kwargs):
+    # Facet labels include category names
+    invalidate_catalog()
@@ -0,0 +1,14 @@
+from celery import shared_task
+from .images import mark_image_failed, upload_staged_image
+
+
+@shared_task(bind=True, max_retries=3)
+def upload_product_image_task(self, image_id):
+    try:
+        return upload_staged_image(image_id)
+    except Exception as e:
+        if self.request.retries >= self.max_retries:
+            mark_image_failed(image_id)
+            return None
+        # Retry the upload in case of a transient storage failure
+        self.retry(exc=e, countdown=30)
@@ -1,3 +1,284 @@
-from django.test import TestCase
+import os
+import tempfile
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from .models import Category, Order, Product, ProductImage, SearchTerm
+from .search import rebuild_search_index, search_product_ids
+from .tasks import upload_product_image_task
 
-# Create your tests here.
+
+class ProductCatalogQueryTests(TestCase):
+    """The catalog endpoints must cost a fixed number of queries however many products a page holds."""
+
+    def setUp(self):
+        self.client = APIClient()
+        categories = [Category.objects.create(name=f'Category {index}') for index in range(3)]
+        products = Product.objects.bulk_create([
+            Product(
+                name=f'Product {index}', description='Catalog item', price=Decimal('9.99'),
+                stock=index, sku=f'CAT-{index}', category=categories[index % 3],
+            )
+            for index in range(60)
+        ])
+        ProductImage.objects.bulk_create([
+            ProductImage(product=product, image_url=f'https://images.example.com/{product.id}/{index}.jpg')
+            for product in products
+            for index in range(2)
+        ])
+        self.product = products[0]
+
+    def test_list_query_count_is_constant(self):
+        for page_size in (5, 50):
+            with self.assertNumQueries(3):  # count, products with categories, images
+                response = self.client.get(reverse('product-list'), {'page_size': page_size})
+            self.assertEqual(len(response.data['results']), page_size)
+            first = response.data['results'][0]
+            self.assertEqual(first['category_name'], 'Category 0')
+            self.assertEqual(len(first['images']), 2)
+
+    def test_detail_and_low_stock_query_counts(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('product-detail', args=[self.product.id]))
+        self.assertEqual(len(response.data['images']), 2)
+
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('product-low-stock-products'))
+        self.assertEqual(len(response.data), 11)
+        self.assertTrue(all(len(product['images']) == 2 for product in response.data))
+
+
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.shoes = Product.objects.create(
+            name='Trail running shoes', description='Lightweight shoes for rough terrain',
+            price=Decimal('89.00'), sku='SRCH-1',
+        )
+        self.socks = Product.objects.create(
+            name='Wool socks', description='Warm socks, great with running shoes',
+            price=Decimal('12.00'), sku='SRCH-2',
+        )
+        self.jacket = Product.objects.create(
+            name='Rain jacket', description='Waterproof shell', price=Decimal('120.00'), sku='SRCH-3',
+        )
+
+    def search(self, query, **params):
+        response = self.client.get(reverse('product-search'), {'q': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return [product['id'] for product in response.data['results']]
+
+    def test_ranks_name_matches_first(self):
+        self.assertEqual(self.search('running shoes'), [self.shoes.id, self.socks.id])
+
+    def test_prefix_and_typo_tolerance(self):
+        self.assertEqual(self.search('waterpr'), [self.jacket.id])
+        self.assertEqual(self.search('jakcet'), [self.jacket.id])
+
+    def test_index_follows_product_writes(self):
+        self.jacket.name = 'Rain poncho'
+        self.jacket.save()
+        self.assertEqual(self.search('poncho'), [self.jacket.id])
+        self.assertEqual(self.search('jacket'), [])
+        self.socks.delete()
+        self.assertEqual(self.search('wool'), [])
+
+    def test_list_search_param_uses_index(self):
+        response = self.client.get(reverse('product-list'), {'search': 'shoes'})
+        self.assertEqual([product['id'] for product in response.data['results']], [self.shoes.id, self.socks.id])
+        response = self.client.get(reverse('product-list'), {'search': 'shoes', 'ordering': 'price'})
+        self.assertEqual([product['id'] for product in response.data['results']], [self.socks.id, self.shoes.id])
+
+    def test_query_is_required(self):
+        self.assertEqual(self.client.get(reverse('product-search')).status_code, 400)
+
+    def test_vocabulary_follows_searchable_text_only(self):
+        def vocabulary():
+            return dict(SearchTerm.objects.values_list('term', 'product_count'))
+
+        self.assertEqual(vocabulary()['shoes'], 2)
+        self.jacket.price = Decimal('99.00')
+        with CaptureQueriesContext(connection) as queries:
+            self.jacket.save(update_fields=['price'])
+        self.assertFalse([query for query in queries if 'search' in query['sql'] or '_fts' in query['sql']])
+        self.jacket.name = 'Rain poncho'
+        self.jacket.save()
+        self.assertNotIn('jacket', vocabulary())
+        self.assertEqual(vocabulary()['poncho'], 1)
+        self.socks.delete()
+        self.assertEqual(vocabulary()['shoes'], 1)
+
+        expected = vocabulary()
+        SearchTerm.objects.all().delete()
+        rebuild_search_index()
+        self.assertEqual(vocabulary(), expected)
+        self.assertEqual(self.search('ponhco'), [self.jacket.id])
+
+    def test_limit_applies_after_filtering(self):
+        # Shoes outranks socks for "shoes", but only socks is under 50
+        cheap = Product.objects.filter(price__lt=50)
+        self.assertEqual(search_product_ids('shoes', limit=1), [self.shoes.id])
+        self.assertEqual(search_product_ids('shoes', cheap, limit=1), [self.socks.id])
+
+
+class ProductFacetTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.shirts = Category.objects.create(name='Shirts')
+        self.shoes = Category.objects.create(name='Shoes')
+        for sku, category, color, size, price in [
+            ('F-1', self.shirts, 'red', 'M', '19.00'),
+            ('F-2', self.shirts, 'red', 'L', '30.00'),
+            ('F-3', self.shirts, 'blue', 'M', '45.00'),
+            ('F-4', self.shoes, 'red', '42', '120.00'),
+            ('F-5', self.shoes, 'black', '43', '300.00'),
+        ]:
+            Product.objects.create(
+                name=f'Product {sku}', description='Facet item', sku=sku, category=category,
+                color=color, size=size, price=Decimal(price),
+            )
+
+    def facets(self, **params):
+        response = self.client.get(reverse('product-faceted'), params)
+        self.assertEqual(response.status_code, 200)
+        counts = {
+            facet: {entry['value']: entry['count'] for entry in entries}
+            for facet, entries in response.data['facets'].items()
+        }
+        return response, counts
+
+    def test_counts_every_facet(self):
+        response, counts = self.facets()
+        self.assertEqual(response.data['count'], 5)
+        self.assertEqual(counts['category'], {self.shirts.id: 3, self.shoes.id: 2})
+        self.assertEqual(counts['color'], {'red': 3, 'blue': 1, 'black': 1})
+        self.assertEqual(counts['price'], {'0-25': 1, '25-50': 2, '100-250': 1, '250+': 1})
+        self.assertEqual(response.data['facets']['category'][0]['label'], 'Shirts')
+
+    def test_selected_facet_keeps_its_alternatives(self):
+        response, counts = self.facets(color='red', category=str(self.shirts.id))
+        self.assertEqual(response.data['count'], 2)
+        # Colors are counted within Shirts, categories within red products
+        self.assertEqual(counts['color'], {'red': 2, 'blue': 1})
+        self.assertEqual(counts['category'], {self.shirts.id: 2, self.shoes.id: 1})
+        self.assertEqual(counts['size'], {'M': 1, 'L': 1})
+
+    def test_counts_are_cached_until_a_product_changes(self):
+        self.facets(color='red')
+        with self.assertNumQueries(3):  # count, products, images
+            self.facets(color='red')
+        product = Product.objects.get(sku='F-3')
+        product.color = 'red'
+        product.save()
+        _, counts = self.facets(color='red')
+        self.assertEqual(counts['color'], {'red': 4, 'black': 1})
+
+    def test_rejects_unknown_price_band(self):
+        response = self.client.get(reverse('product-faceted'), {'price': 'cheap'})
+        self.assertEqual(response.status_code, 400)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='buyer', password='pass')
+        self.client.force_authenticate(self.user)
+        orders = [
+            Order.objects.create(user=self.user, total_price=Decimal('10.00'), shipping_address='Street 1')
+            for _ in range(7)
+        ]
+        # Ties on created_at are broken by id
+        Order.objects.filter(id__in=[order.id for order in orders[2:5]]).update(created_at=orders[2].created_at)
+        self.expected = list(Order.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+
+    def test_walks_forward_and_back_without_gaps(self):
+        seen, pages = [], []
+        url = reverse('order-list') + '?page_size=3'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.data['count'], 7)
+            pages.append(response.data)
+            seen.extend(order['id'] for order in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(seen, self.expected)
+        self.assertEqual(len(pages), 3)
+        self.assertIsNone(pages[0]['previous'])
+
+        response = self.client.get(pages[-1]['previous'])
+        self.assertEqual([order['id'] for order in response.data['results']], self.expected[3:6])
+        response = self.client.get(response.data['previous'])
+        self.assertEqual([order['id'] for order in response.data['results']], self.expected[:3])
+        self.assertIsNone(response.data['previous'])
+
+    def test_count_can_be_skipped(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('order-list'), {'count': 'false', 'page_size': 2})
+        self.assertNotIn('count', response.data)
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_plain_list_stays_unpaginated(self):
+        response = self.client.get(reverse('order-list'))
+        self.assertIsInstance(response.data, list)
+        self.assertEqual(sorted(order['id'] for order in response.data), sorted(self.expected))
+        response = self.client.get(reverse('order-list'), {'cursor': ''})
+        self.assertEqual(response.data['count'], 7)
+        self.assertEqual([order['id'] for order in response.data['results']], self.expected)
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get(reverse('order-list'), {'cursor': 'nope'}).status_code, 404)
+
+    def test_products_switch_to_cursor_pages_on_request(self):
+        Product.objects.bulk_create([
+            Product(name=f'Product {index}', description='Item', price=Decimal('1.00'), sku=f'KS-{index}')
+            for index in range(5)
+        ])
+        response = self.client.get(reverse('product-list'), {'page_size': 2})
+        self.assertIn('count', response.data)
+        self.assertTrue(response.data['next'].endswith('page=2&page_size=2'))
+        response = self.client.get(reverse('product-list'), {'cursor': '', 'page_size': 2})
+        newest = list(Product.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual([product['id'] for product in response.data['results']], newest[:2])
+        response = self.client.get(response.data['next'])
+        self.assertEqual([product['id'] for product in response.data['results']], newest[2:4])
+
+
+class ProductImagePipelineTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username='editor', password='pass'))
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        overrides = override_settings(
+            ECOMMERCE_IMAGE_STORAGE='ecommerce.utils.storage.LocalImageStorage',
+            ECOMMERCE_IMAGE_STAGING_DIR=os.path.join(self.tmp.name, 'staged'),
+            ECOMMERCE_IMAGE_LOCAL_ROOT=os.path.join(self.tmp.name, 'uploaded'),
+            ECOMMERCE_IMAGE_LOCAL_URL='https://images.example.com/products/',
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def test_create_returns_pending_images_uploaded_in_background(self):
+        files = [SimpleUploadedFile(f'photo{index}.JPG', b'image-bytes', content_type='image/jpeg') for index in range(2)]
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post(reverse('product-list'), {
+                'name': 'Lamp', 'description': 'Desk lamp', 'price': '25.00', 'sku': 'IMG-1', 'images': files,
+            }, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([image['status'] for image in response.data['images']], ['pending', 'pending'])
+        self.assertEqual(ProductImage.objects.count(), 2)
+        self.assertEqual(len(callbacks), 2)
+
+        for image in ProductImage.objects.all():
+            upload_product_image_task(image.id)
+            image.refresh_from_db()
+            name = os.path.basename(image.image_url)
+            self.assertEqual(image.status, 'ready')
+            self.assertTrue(image.image_url.startswith('https://images.example.com/products/'))
+            self.assertTrue(name.endswith('.jpg'))
+            self.assertTrue(os.path.exists(os.path.join(self.tmp.name, 'uploaded', name)))
+        self.assertEqual(os.listdir(os.path.join(self.tmp.name, 'staged')), [])
@@ -0,0 +1,34 @@
+import shutil
+from pathlib import Path
+from django.conf import settings
+from django.utils.module_loading import import_string
+from .cloudinary_utils import upload_image_to_cloudinary
+
+
+class ImageUploadError(Exception):
+    pass
+
+
+class CloudinaryImageStorage:
+    """Uploads product images to Cloudinary."""
+
+    def upload(self, path):
+        url = upload_image_to_cloudinary(path)
+        if not url:
+            raise ImageUploadError(f"Cloudinary upload of {path} failed")
+        return url
+
+
+class LocalImageStorage:
+    """Copies product images into a local directory, for offline development and tests."""
+
+    def upload(self, path):
+        root = Path(settings.ECOMMERCE_IMAGE_LOCAL_ROOT)
+        root.mkdir(parents=True, exist_ok=True)
+        name = Path(path).name
+        shutil.copyfile(path, root / name)
+        return settings.ECOMMERCE_IMAGE_LOCAL_URL.rstrip("/") + "/" + name
+
+
+def get_image_storage():
+    return import_string(settings.ECOMMERCE_IMAGE_STORAGE)()
@@ -2,14 +2,21 @@ from rest_framework import viewsets, permissions, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_framework.parsers import MultiPartParser, FormParser
-from rest_framework.filters import SearchFilter, OrderingFilter  # for search and ordering
+from rest_framework.filters import OrderingFilter  # for ordering
 from django_filters.rest_framework import DjangoFilterBackend  # for advanced filtering
 from rest_framework.pagination import PageNumberPagination  # for pagination
-from .utils.cloudinary_utils import upload_image_to_cloudinary
-from django.db.models import Sum
+from django.db.models import Prefetch, Sum
+from django.core.cache import cache
+from analytics.affinity import AFFINITY_VERSION_KEY
+from .images import stage_product_images
+from .pagination import KeysetPagination, TimestampKeysetPagination
+from .facets import apply_selections, cached_facet_counts, parse_selections
+from .search import ProductSearchFilter, ranked, tokenize
 from .models import (
     Category,
     Product,
+    ProductImage,
+    ProductAffinity,
     InventoryHistory,
     Cart,
     CartItem,
@@ -20,6 +27,7 @@ from .models import (
 from .serializers import (
     CategorySerializer,
     ProductSerializer,
+    RelatedProductSerializer,
     InventoryHistorySerializer,
     CartSerializer,
     CartItemSerializer,
@@ -28,6 +36,9 @@ from .serializers import (
     ReviewSerializer,
 )
 
+# How long a product's related-products list is cached (the affinity job also refreshes it)
+RELATED_PRODUCTS_CACHE_TTL = 60 * 60
+
 # Custom Pagination Class 
 class StandardResultsSetPagination(PageNumberPagination):
     page_size = 12  # Number of items per page
@@ -39,21 +50,83 @@ class CategoryViewSet(viewsets.ModelViewSet):
     serializer_class = CategorySerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
+def catalog_queryset():
+    """
+    Products with everything ProductSerializer reads loaded up front: the category
+    is joined and the images of a whole page are fetched in one extra query.
+    """
+    return Product.objects.select_related("category").prefetch_related(
+        Prefetch("images", queryset=ProductImage.objects.order_by("id"))
+    )
+
 class ProductViewSet(viewsets.ModelViewSet):
-    queryset = Product.objects.all()
+    """
+    Query plan per action, independent of page size (pinned by ecommerce.tests):
+    list: count + products + images = 3, retrieve and low-stock: products + images = 2.
+
+    Lists are page-numbered unless a `cursor` parameter is given (empty for the
+    first page): cursor pages are keyset paginated newest first and ignore `ordering`.
+    """
+    queryset = catalog_queryset()
     serializer_class = ProductSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     parser_classes = [MultiPartParser, FormParser]  # Enable file uploads
-    filter_backends = [SearchFilter, OrderingFilter, DjangoFilterBackend]  # Added filters
-    search_fields = ['name', 'description']  # Fields to search by
+    # Search runs last so it can rank the already filtered and ordered results
+    filter_backends = [OrderingFilter, DjangoFilterBackend, ProductSearchFilter]
     ordering_fields = ['price', 'stock', 'created_at']  # Fields to order by
     ordering = ['id']  # Default ordering
     pagination_class = StandardResultsSetPagination  # Added pagination
 
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            use_cursor = self.request is not None and KeysetPagination.cursor_query_param in self.request.query_params
+            self._paginator = KeysetPagination() if use_cursor else self.pagination_class()
+        return self._paginator
+
+    @action(detail=True, methods=["get"], url_path="related", url_name="related")
+    def related_products(self, request, pk=None):
+        """Return the products most often bought together with this one."""
+        key = f"ecommerce:related:{cache.get(AFFINITY_VERSION_KEY)}:{pk}"
+        data = cache.get(key)
+        if data is None:
+            affinities = ProductAffinity.objects.filter(product_id=pk).select_related(
+                "related_product__category"
+            ).order_by("rank")
+            data = RelatedProductSerializer(affinities, many=True).data
+            if not data and not Product.objects.filter(pk=pk).exists():
+                return Response({"error": "Product not found."}, status=status.HTTP_404_NOT_FOUND)
+            cache.set(key, data, timeout=RELATED_PRODUCTS_CACHE_TTL)
+        return Response(data)
+
+    @action(detail=False, methods=["get"], url_path="search")
+    def search(self, request):
+        """Full-text search over product names and descriptions (`q`), best match first."""
+        query = request.query_params.get("q", "")
+        if not tokenize(query):
+            return Response({"error": "Query parameter 'q' is required."}, status=status.HTTP_400_BAD_REQUEST)
+        page = self.paginate_queryset(ranked(self.get_queryset(), query))
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=["get"], url_path="facets")
+    def faceted(self, request):
+        """
+        A page of products narrowed by the selected category, color, size and
+        price facets, with the counts of every facet value alongside.
+        """
+        selections = parse_selections(request.query_params)
+        queryset = self.filter_queryset(self.get_queryset())
+        facets = cached_facet_counts(queryset, selections, {"search": request.query_params.get("search", "")})
+        page = self.paginate_queryset(apply_selections(queryset, selections))
+        response = self.get_paginated_response(self.get_serializer(page, many=True).data)
+        response.data["facets"] = facets
+        return response
+
     @action(detail=False, methods=["get"], url_path="low-stock")
     def low_stock_products(self, request):
         """Return products with stock less than or equal to 10."""
-        low_stock_products = Product.objects.filter(stock__lte=10)
+        low_stock_products = self.get_queryset().filter(stock__lte=10).order_by("id")
         serializer = self.get_serializer(low_stock_products, many=True)
         return Response(serializer.data)
 
@@ -80,36 +153,31 @@ class ProductViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(instance, data=request.data, partial=True, context={'images': images})
         serializer.is_valid(raise_exception=True)
         self.perform_update(serializer)
+        if getattr(instance, '_prefetched_objects_cache', None):
+            # The prefetched images don't include the ones just staged
+            instance._prefetched_objects_cache = {}
         return Response(serializer.data)
 
     def perform_create(self, serializer):
         """
-        Save the product and upload images to Cloudinary.
+        Save the product and stage its images; they are uploaded in the background
+        and returned as pending until then.
         """
-        images = serializer.context.get('images', [])
         product = serializer.save()
-        # Upload each image to Cloudinary and save the URLs
-        for image_file in images:
-            image_url = upload_image_to_cloudinary(image_file)
-            if image_url:
-                product.images.create(image_url=image_url)  # Create ProductImage objects
+        stage_product_images(product, serializer.context.get('images', []))
 
     def perform_update(self, serializer):
         """
-        Update the product and optionally add new images.
+        Update the product and stage any new images for background upload.
         """
-        images = serializer.context.get('images', [])
         product = serializer.save()
-        # Upload new images to Cloudinary and save the URLs
-        for image_file in images:
-            image_url = upload_image_to_cloudinary(image_file)
-            if image_url:
-                product.images.create(image_url=image_url)  # Create ProductImage objects
+        stage_product_images(product, serializer.context.get('images', []))
 
 class InventoryHistoryViewSet(viewsets.ModelViewSet):
     queryset = InventoryHistory.objects.all()
     serializer_class = InventoryHistorySerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = TimestampKeysetPagination
 
 class CartViewSet(viewsets.ModelViewSet):
     queryset = Cart.objects.all()
@@ -186,6 +254,7 @@ class OrderViewSet(viewsets.ModelViewSet):
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         """Ensure users can only access their own orders."""
@@ -208,6 +277,7 @@ class ReviewViewSet(viewsets.ModelViewSet):
     queryset = Review.objects.all()
     serializer_class = ReviewSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def perform_create(self, serializer):
         """Automatically set the user when creating a review."""
@@ -7,11 +7,10 @@ from .serializers import CampaignSerializer, CampaignPerformanceSerializer, Disc
 from rest_framework import status
 from django.conf import settings
 from .utils.email_utils import send_email
-from datetime import timedelta
 from django.utils.timezone import now
-from django.db.models import Sum
 from django.contrib.auth.models import User
 from .tasks import send_campaign_emails
+from analytics.segments import segment_users
 
 class CampaignListView(APIView):
     permission_classes = [IsAuthenticated]
@@ -29,39 +28,11 @@ class CampaignListView(APIView):
             # Fetch users based on selected segments
             audience_emails = []
             for segment_name in request.data.get("segments", []):
-                if segment_name == "high_spenders":
-                    users = User.objects.annotate(
-                        total_spent=Sum('sales__total_price', distinct=True)
-                    ).filter(total_spent__gte=1000, sales__isnull=False)
-                elif segment_name == "moderate_spenders":
-                    users = User.objects.annotate(
-                        total_spent=Sum('sales__total_price', distinct=True)
-                    ).filter(total_spent__range=(500, 999), sales__isnull=False)
-                elif segment_name == "low_spenders":
-                    users = User.objects.annotate(
-                        total_spent=Sum('sales__total_price', distinct=True)
-                    ).filter(total_spent__lt=500, sales__isnull=False)
-
-                    print(f"Resolved {users.count()} users for segment 'low_spenders'")
-                    for user in users:
-                        print(user.id, user.total_spent)
-                elif segment_name == "active_users":
-                    users = User.objects.filter(
-                        sales__timestamp__gte=now() - timedelta(days=30)
-                    ).distinct()
-                elif segment_name == "inactive_users":
-                    users = User.objects.exclude(
-                        sales__timestamp__gte=now() - timedelta(days=30)
-                    ).distinct()
-                elif segment_name == "at_risk_users":
-                    users = User.objects.filter(
-                        sales__timestamp__gte=now() - timedelta(days=90),
-                        sales__timestamp__lte=now() - timedelta(days=30)
-                    ).distinct()
-                else:
+                users = segment_users(segment_name)
+                if users is None:
                     return Response({"error": f"Invalid segment: {segment_name}"}, status=400)
 
-                audience_emails.extend([user.email.lower() for user in users])
+                audience_emails.extend(email.lower() for email in users.values_list('email', flat=True))
 
             # Check if there are any audience emails
             if not audience_emails:
@@ -3,12 +3,17 @@ from django.core.asgi import get_asgi_application
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
 from channels.layers import get_channel_layer
-from inbox.routing import websocket_urlpatterns
+from inbox.routing import websocket_urlpatterns as inbox_websocket_urlpatterns
 from inbox.middleware import JWTAuthMiddleware
-from call_center.routing import websocket_urlpatterns
+from call_center.routing import websocket_urlpatterns as call_center_websocket_urlpatterns
+from analytics.routing import websocket_urlpatterns as analytics_websocket_urlpatterns
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'server.settings')
 
+websocket_urlpatterns = (
+    inbox_websocket_urlpatterns + call_center_websocket_urlpatterns + analytics_websocket_urlpatterns
+)
+
 application = ProtocolTypeRouter({
     "http": get_asgi_application(),
     "websocket": JWTAuthMiddleware(
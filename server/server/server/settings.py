@@ -1,4 +1,5 @@
 from datetime import timedelta
+from celery.schedules import crontab
 from pathlib import Path
 from decouple import config
 import cloudinary
@@ -132,6 +133,54 @@ DATABASES = {
 }
 
 
+# Cache
+# Shared Redis cache when REDIS_CACHE_URL is set, otherwise a per-process memory cache
+REDIS_CACHE_URL = config('REDIS_CACHE_URL', default='')
+
+if REDIS_CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_CACHE_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Seconds a cached analytics dashboard may be served before it is recomputed
+ANALYTICS_CACHE_TTL = config('ANALYTICS_CACHE_TTL', default=300, cast=int)
+# Run independent dashboard queries concurrently; each worker holds its own database connection
+ANALYTICS_PARALLEL_QUERIES = config('ANALYTICS_PARALLEL_QUERIES', default=True, cast=bool)
+ANALYTICS_QUERY_WORKERS = config('ANALYTICS_QUERY_WORKERS', default=4, cast=int)
+# Seconds between batched live dashboard deltas pushed over the analytics WebSocket
+ANALYTICS_LIVE_INTERVAL = config('ANALYTICS_LIVE_INTERVAL', default=1.0, cast=float)
+# Customer activity ingestion: events are buffered (in Redis when a URL is set, otherwise in process memory)
+# and bulk-written once the buffer reaches FLUSH_SIZE events or its oldest event is FLUSH_INTERVAL seconds old
+ANALYTICS_ACTIVITY_BUFFER_URL = config('ANALYTICS_ACTIVITY_BUFFER_URL', default=REDIS_CACHE_URL)
+ANALYTICS_ACTIVITY_FLUSH_SIZE = config('ANALYTICS_ACTIVITY_FLUSH_SIZE', default=500, cast=int)
+ANALYTICS_ACTIVITY_FLUSH_INTERVAL = config('ANALYTICS_ACTIVITY_FLUSH_INTERVAL', default=5, cast=int)
+# Raw events older than this are downsampled into daily per-customer counts
+ANALYTICS_ACTIVITY_RETENTION_DAYS = config('ANALYTICS_ACTIVITY_RETENTION_DAYS', default=90, cast=int)
+# Restock lead time: products forecast to run out within this many days count as predicted low stock
+ANALYTICS_LOW_STOCK_LEAD_DAYS = config('ANALYTICS_LOW_STOCK_LEAD_DAYS', default=14, cast=int)
+# Robust z-score beyond which a sales bucket is recorded as an anomaly
+ANALYTICS_ANOMALY_Z_THRESHOLD = config('ANALYTICS_ANOMALY_Z_THRESHOLD', default=3.5, cast=float)
+# PostgreSQL only: monthly sales partitions kept ready ahead of time, and months of raw sales kept attached
+# (unset keeps everything; older partitions are moved to the analytics_archive schema)
+ANALYTICS_SALE_PARTITIONS_AHEAD = config('ANALYTICS_SALE_PARTITIONS_AHEAD', default=3, cast=int)
+ANALYTICS_SALE_RETENTION_MONTHS = config('ANALYTICS_SALE_RETENTION_MONTHS', default=None, cast=lambda value: int(value) if value else None)
+# Product image uploads are staged here until a Celery worker on the same host uploads them
+ECOMMERCE_IMAGE_STAGING_DIR = config('ECOMMERCE_IMAGE_STAGING_DIR', default=str(BASE_DIR / 'media' / 'staged_images'))
+# Storage backend for product images; LocalImageStorage keeps them on disk for offline development and tests
+ECOMMERCE_IMAGE_STORAGE = config('ECOMMERCE_IMAGE_STORAGE', default='ecommerce.utils.storage.CloudinaryImageStorage')
+ECOMMERCE_IMAGE_LOCAL_ROOT = config('ECOMMERCE_IMAGE_LOCAL_ROOT', default=str(BASE_DIR / 'media' / 'product_images'))
+ECOMMERCE_IMAGE_LOCAL_URL = config('ECOMMERCE_IMAGE_LOCAL_URL', default='http://localhost:8000/media/product_images/')
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -217,4 +266,42 @@ CELERY_RESULT_BACKEND = 'redis://localhost:6379/0'
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
-CELERY_TIMEZONE = 'UTC'
\ No newline at end of file
+CELERY_TIMEZONE = 'UTC'
+CELERY_BEAT_SCHEDULE = {
+    'reconcile-customer-stats': {
+        'task': 'analytics.tasks.reconcile_customer_stats_task',
+        'schedule': crontab(hour=3, minute=0),
+    },
+    'score-customers-rfm': {
+        'task': 'analytics.tasks.score_customers_rfm_task',
+        'schedule': crontab(hour=3, minute=30),
+    },
+    'compute-product-affinity': {
+        'task': 'analytics.tasks.compute_product_affinity_task',
+        'schedule': crontab(hour=4, minute=0),
+    },
+    'refresh-stock-velocity': {
+        'task': 'analytics.tasks.refresh_stock_velocity_task',
+        'schedule': crontab(hour=0, minute=5),
+    },
+    'forecast-demand': {
+        'task': 'analytics.tasks.forecast_demand_task',
+        'schedule': crontab(hour=0, minute=15),
+    },
+    'flush-activity-buffer': {
+        'task': 'analytics.tasks.flush_activity_buffer_task',
+        'schedule': 10.0,
+    },
+    'manage-sale-partitions': {
+        'task': 'analytics.tasks.manage_sale_partitions_task',
+        'schedule': crontab(hour=1, minute=0),
+    },
+    'detect-sales-anomalies': {
+        'task': 'analytics.tasks.detect_sales_anomalies_task',
+        'schedule': crontab(minute=5),
+    },
+    'downsample-activities': {
+        'task': 'analytics.tasks.downsample_activities_task',
+        'schedule': crontab(hour=2, minute=30),
+    },
+}